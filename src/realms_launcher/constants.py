@@ -10,6 +10,15 @@ MOD_INFO_URL = "https://realmsinexile.s3.us-east-005.backblazeb2.com/version.jso
 # The canonical file currently lives under dev fixtures.
 NEWS_URL = "https://raw.githubusercontent.com/hansnery/Realms-Launcher/main/dev/fixtures/news.html"
 
+# Metadata cache (services/http_cache.py): within max-age the cached copy is used
+# without any request; after that a conditional GET revalidates it (304 = no body).
+VERSION_INFO_MAX_AGE_S = 0
+NEWS_MAX_AGE_S = 600
+
+# In-process memo of the parsed version info: callers within the TTL share one
+# result and concurrent callers share one request (services/version_service.py).
+VERSION_INFO_TTL_S = 60
+
 # Mod versions / packages
 BASE_MOD_VERSION = "0.8.6"
 BASE_MOD_ZIP_URL = "https://f005.backblazeb2.com/file/RealmsInExile/realms.zip"
@@ -18,9 +27,88 @@ FULL_MOD_ZIP_URL = (
     "https://f005.backblazeb2.com/file/RealmsInExile/realms_full.zip"
 )
 
+# Shared HTTP client (services/http_client.py)
+HTTP_POOL_SIZE = 10  # keep-alive connections per host
+HTTP_MAX_RETRIES = 3
+HTTP_CONNECT_TIMEOUT_S = 10.0
+HTTP_READ_TIMEOUT_S = 30.0
+
+# Pre-warm pooled connections to the package hosts while the main screen is idle,
+# keeping them open for this long; optionally probe the likely next package too.
+HTTP_KEEP_WARM_S = 600.0
+PREWARM_PROBE_NEXT_PACKAGE = True
+
+# Network event loop (services/net_loop.py): max concurrent network jobs
+NET_MAX_CONCURRENCY = 6
+
+# Parallel HTTP Range connections per package download (1 = single stream)
+DOWNLOAD_SEGMENTS = 4
+
+# Download scheduler (services/download_scheduler.py): concurrent jobs overall
+# and per host. Interactive installs preempt background jobs.
+DOWNLOAD_MAX_ACTIVE = 2
+DOWNLOAD_MAX_PER_HOST = 2
+
+# Bandwidth caps in bytes/s, 0 = unlimited (e.g. for LAN events). Adjustable at
+# runtime: bandwidth.set_global_limit() and download_scheduler.set_limits().
+BANDWIDTH_LIMIT_BPS = 0  # all downloads together
+DOWNLOAD_LIMIT_BPS = 0  # each download
+BACKGROUND_LIMIT_BPS = 256 << 10  # background jobs while an interactive one runs
+
+# Stall watchdog: a connection averaging less than this over the window is
+# dropped and reopened (on the next mirror, if any) from the byte it reached.
+DOWNLOAD_MIN_THROUGHPUT_BPS = 8 << 10
+DOWNLOAD_STALL_WINDOW_S = 20.0
+
+# If True, mod packages are extracted member-by-member while they download
+# (needs Range support; otherwise falls back to download-then-extract).
+STREAM_EXTRACT_PACKAGES = False
+
+# Equivalent endpoints of the same Backblaze bucket. A package URL under one base
+# is also tried under the others; the fastest healthy one is used and downloads
+# fail over between them (services/mirror_service.py).
+PACKAGE_MIRROR_BASES = (
+    "https://f005.backblazeb2.com/file/RealmsInExile/",
+    "https://realmsinexile.s3.us-east-005.backblazeb2.com/",
+)
+MIRROR_PROBE_TTL_S = 600
+
+# Spread the ranges of one download across all mirrors serving the same object
+# (connections that finish early take over half of the slowest remaining range).
+DOWNLOAD_SWARM = True
+
+# Update existing installs through the binary delta packages published in
+# version.json ("deltas") when a chain leads to the new version; files whose
+# local copy does not match are fetched whole (services/delta_service.py).
+DELTA_UPDATES = True
+
+# Otherwise sync existing installs file by file against the manifest published
+# in version.json ("manifests"), fetching only missing or changed files with
+# this many concurrent downloads (services/manifest_service.py).
+MANIFEST_SYNC = True
+MANIFEST_SYNC_WORKERS = 6
+
+# During a manifest sync, large files with published block sums ("zsync") are
+# rebuilt from the matching blocks of the local copy plus Range requests for the
+# rest (services/zsync_service.py).
+ZSYNC_UPDATES = True
+
+# Downloaded packages are kept (content-addressed, least recently used evicted
+# first) so repairs and reinstalls can skip the download. 0 disables the cache.
+PACKAGE_CACHE_MAX_BYTES = 8 << 30
+
+# Start downloading a detected mod update in the background (one connection,
+# resumable across restarts) so "Download Update" only has to apply it.
+PRESTAGE_UPDATES = False
+
 # Launcher self-update
 LAUNCHER_ZIP_URL = "https://f005.backblazeb2.com/file/RealmsInExile/realms_launcher.zip"  # beta: realms_launcher_beta.zip
 LAUNCHER_VERSION = "1.1.3"
 
+# When version.json publishes a ``launcher_manifest``, download only the launcher
+# files that differ from it and let the updater copy just those; the full zip is
+# the fallback.
+LAUNCHER_DIFF_UPDATES = True
+
 # Settings storage
 REG_PATH = r"SOFTWARE\REALMS_Launcher"
@@ -0,0 +1 @@
+"""Publishing tools: build the server-side artifacts of a release (``python -m realms_launcher.publisher``)."""
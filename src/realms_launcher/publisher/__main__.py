@@ -0,0 +1,61 @@
+"""Publisher entrypoint: `python -m realms_launcher.publisher NEW_DIR --version X --out DIR`."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+
+from .publish import PublishOptions, publish
+
+
+def parse_args(argv: list[str] | None = None) -> PublishOptions:
+    defaults = PublishOptions(new_dir="", version="", out_dir="")
+    parser = argparse.ArgumentParser(
+        prog="python -m realms_launcher.publisher",
+        description="Build manifests, objects, block sums, a delta package and version.json for a release.",
+    )
+    parser.add_argument("new_dir", help="release tree, laid out like realms/")
+    parser.add_argument("--version", required=True, help="version of the release")
+    parser.add_argument("--out", required=True, dest="out_dir", help="output folder (uploaded as-is)")
+    parser.add_argument("--old", dest="old_dir", help="previous release tree, to build a delta package from")
+    parser.add_argument("--old-version", help="version of the previous release")
+    parser.add_argument("--metadata", dest="metadata_path", help="version.json to extend")
+    parser.add_argument("--base-url", default=defaults.base_url, help="URL the output folder is served from")
+    parser.add_argument(
+        "--package",
+        action="append",
+        default=[],
+        dest="packages",
+        help="package zip to list with size and digest (repeatable)",
+    )
+    parser.add_argument("--launcher", dest="launcher_dir", help="launcher build folder to publish a manifest for")
+    parser.add_argument("--launcher-version", help="version of the launcher build")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="worker processes")
+    parser.add_argument(
+        "--zsync-min-size",
+        type=int,
+        default=defaults.zsync_min_size,
+        help="write block sums for files of at least this many bytes (0: none)",
+    )
+    args = parser.parse_args(argv)
+    if (args.old_dir is None) != (args.old_version is None):
+        parser.error("--old and --old-version go together")
+    if (args.launcher_dir is None) != (args.launcher_version is None):
+        parser.error("--launcher and --launcher-version go together")
+    return PublishOptions(**{**vars(args), "packages": tuple(args.packages)})
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    options = parse_args(argv)
+    try:
+        publish(options)
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).error("Publishing failed: %s", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""Server-side artifacts of a release: objects, block sums, manifests, delta packages, version.json.
+
+Output layout (relative to the output folder, uploaded as-is under the base URL):
+
+    objects/ab/abcdef...         file contents by SHA-256 (manifest sync)
+    objects/ab/abcdef....zsync   block sums of large files (zsync updates)
+    manifests/realms_<version>.json
+    manifests/launcher_<version>.json
+    deltas/realms_<from>_to_<to>.zip
+    version.json
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import Executor, as_completed
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from ..services import delta_service, zsync_service
+from ..services.file_hashes import sha256_file
+from ..services.manifest_service import Manifest, ManifestFile
+from .tree import TreeFile, local_path
+
+
+log = logging.getLogger(__name__)
+
+OBJECTS_DIR = "objects"
+MANIFESTS_DIR = "manifests"
+DELTAS_DIR = "deltas"
+ZSYNC_SUFFIX = ".zsync"
+
+
+def object_path(sha256: str) -> str:
+    return f"{OBJECTS_DIR}/{sha256[:2]}/{sha256}"
+
+
+def write_objects(root: str, files: dict[str, TreeFile], out_dir: str, pool: Executor) -> int:
+    """Copy every distinct file of root into out_dir's object store; returns the number written.
+
+    Objects already present with the right size are kept, so out_dir can be a
+    local copy of the bucket that grows release by release.
+    """
+    jobs: dict[str, tuple[str, str]] = {}
+    for f in files.values():
+        dest = local_path(out_dir, object_path(f.sha256))
+        if f.sha256 not in jobs and _size_or_none(dest) != f.size:
+            jobs[f.sha256] = (local_path(root, f.path), dest)
+    if jobs:
+        sources, dests = zip(*jobs.values())
+        list(pool.map(_copy_file, sources, dests, chunksize=16))
+    return len(jobs)
+
+
+def write_block_sums(
+    root: str,
+    files: dict[str, TreeFile],
+    out_dir: str,
+    pool: Executor,
+    *,
+    min_size: int,
+    block_size: int = zsync_service.DEFAULT_BLOCK_SIZE,
+) -> set[str]:
+    """Block sums next to the object of every file of at least min_size bytes; returns their digests."""
+    large = {f.sha256: f for f in files.values() if f.size >= min_size}
+    futures = [
+        pool.submit(
+            _write_block_sums,
+            local_path(root, f.path),
+            local_path(out_dir, object_path(digest) + ZSYNC_SUFFIX),
+            block_size,
+        )
+        for digest, f in large.items()
+        if not os.path.exists(local_path(out_dir, object_path(digest) + ZSYNC_SUFFIX))
+    ]
+    for future in as_completed(futures):
+        future.result()
+    return set(large)
+
+
+def write_manifest(
+    version: str,
+    files: dict[str, TreeFile],
+    out_dir: str,
+    *,
+    base_url: str,
+    zsync: set[str] = frozenset(),
+    name: str = "realms",
+) -> str:
+    """Write the manifest_service manifest of a release; returns its path relative to out_dir."""
+    manifest = Manifest(
+        version,
+        {
+            f.path: ManifestFile(
+                f.path,
+                f.size,
+                f.sha256,
+                zsync=base_url + object_path(f.sha256) + ZSYNC_SUFFIX if f.sha256 in zsync else None,
+            )
+            for f in files.values()
+        },
+        base_url + OBJECTS_DIR + "/",
+    )
+    rel = f"{MANIFESTS_DIR}/{name}_{version}.json"
+    write_json(local_path(out_dir, rel), manifest.to_json(), indent=None)  # tens of thousands of entries
+    return rel
+
+
+def build_delta_package(
+    old_root: str,
+    old_files: dict[str, TreeFile],
+    new_root: str,
+    new_files: dict[str, TreeFile],
+    from_version: str,
+    to_version: str,
+    out_dir: str,
+    pool: Executor,
+    *,
+    block_size: int = delta_service.DEFAULT_BLOCK_SIZE,
+) -> str:
+    """Write the delta_service package turning old_root into new_root; returns its path relative to out_dir.
+
+    Changed files are diffed on pool's workers, largest first; a file whose
+    patch is not worth it (see ``delta_service.diff_file``) is stored whole.
+    """
+    rel = f"{DELTAS_DIR}/realms_{from_version}_to_{to_version}.zip"
+    zip_path = local_path(out_dir, rel)
+    work_dir = zip_path + ".work"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        changed = [
+            f
+            for f in new_files.values()
+            if f.path in old_files and old_files[f.path].sha256 != f.sha256 and old_files[f.path].size > 0
+        ]
+        changed.sort(key=lambda f: f.size, reverse=True)
+        futures = {
+            pool.submit(
+                _diff_file,
+                local_path(old_root, f.path),
+                local_path(new_root, f.path),
+                os.path.join(work_dir, str(i)),
+                block_size,
+            ): f.path
+            for i, f in enumerate(changed)
+        }
+        patches: dict[str, str] = {}
+        for future in as_completed(futures):
+            patch = future.result()
+            if patch is not None:
+                patches[futures[future]] = patch
+
+        entries: list[dict] = []
+        tmp = zip_path + ".tmp"
+        with ZipFile(tmp, "w", ZIP_DEFLATED) as zf:
+            for i, f in enumerate(sorted(new_files.values(), key=lambda f: f.path)):
+                old = old_files.get(f.path)
+                if old is not None and old.sha256 == f.sha256:
+                    continue
+                entry = {"path": f.path, "size": f.size, "sha256": f.sha256}
+                if f.path in patches:
+                    entry.update(action="patch", member=f"patches/{i}", base_size=old.size)
+                    zf.write(patches[f.path], entry["member"])
+                else:
+                    entry.update(action="file", member=f"files/{i}")
+                    zf.write(local_path(new_root, f.path), entry["member"])
+                entries.append(entry)
+            entries.extend({"path": p, "action": "delete"} for p in sorted(old_files.keys() - new_files.keys()))
+            manifest = {"format": delta_service.DELTA_FORMAT, "from": from_version, "to": to_version, "files": entries}
+            zf.writestr(delta_service.MANIFEST_NAME, json.dumps(manifest, indent=1))
+        os.replace(tmp, zip_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    log.info(
+        "Delta %s -> %s: %d patched, %d whole, %d deleted",
+        from_version,
+        to_version,
+        len(patches),
+        sum(1 for e in entries if e["action"] == "file"),
+        sum(1 for e in entries if e["action"] == "delete"),
+    )
+    return rel
+
+
+def artifact_info(out_dir: str, rel: str, base_url: str) -> dict:
+    """``url``/``size``/``sha256`` of an artifact, as version.json lists it."""
+    path = local_path(out_dir, rel)
+    return {"url": base_url + rel, "size": os.path.getsize(path), "sha256": sha256_file(path)}
+
+
+def extend_version_metadata(
+    metadata: dict,
+    *,
+    version: str,
+    manifests: dict[str, dict],
+    delta: dict | None = None,
+    packages: dict[str, dict] | None = None,
+    launcher_version: str | None = None,
+    launcher_manifest: dict | None = None,
+) -> dict:
+    """Copy of a version.json document announcing version with the given manifests, delta and packages.
+
+    ``delta`` (``from``/``to`` plus ``artifact_info``) replaces any published
+    delta between the same versions; other fields are kept as they are.
+    """
+    data = dict(metadata)
+    data["version"] = version
+    data["manifests"] = {**(data.get("manifests") or {}), **manifests}
+    if delta is not None:
+        deltas = [d for d in data.get("deltas") or () if (d.get("from"), d.get("to")) != (delta["from"], delta["to"])]
+        data["deltas"] = deltas + [delta]
+    if packages:
+        data["packages"] = {**(data.get("packages") or {}), **packages}
+    if launcher_version is not None:
+        data["launcher_version"] = launcher_version
+    if launcher_manifest is not None:
+        data["launcher_manifest"] = launcher_manifest
+    return data
+
+
+def package_info(path: str) -> dict:
+    """``packages`` entry of version.json for a package zip."""
+    return {"size": os.path.getsize(path), "sha256": sha256_file(path)}
+
+
+def write_json(path: str, data: dict, *, indent: int | None = 2) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def _size_or_none(path: str) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+# Worker-process entry points (module level so they pickle).
+
+
+def _copy_file(src: str, dest: str) -> None:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    shutil.copyfile(src, dest + ".tmp")
+    os.replace(dest + ".tmp", dest)
+
+
+def _write_block_sums(src: str, dest: str, block_size: int) -> None:
+    data = zsync_service.dump_block_sums(zsync_service.compute_block_sums(src, block_size=block_size))
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(dest + ".tmp", dest)
+
+
+def _diff_file(base: str, new: str, patch: str, block_size: int) -> str | None:
+    with open(patch, "wb") as out:
+        worth_it = delta_service.diff_file(base, new, out, block_size=block_size)
+    if worth_it:
+        return patch
+    os.remove(patch)
+    return None
@@ -0,0 +1,132 @@
+"""Build every artifact of one release into an output folder ready to upload."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from ..constants import PACKAGE_MIRROR_BASES
+from ..services.manifest_service import LARGE_FILE_BYTES
+from . import builders
+from .tree import hash_tree
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PublishOptions:
+    new_dir: str  # release tree, laid out like realms/
+    version: str
+    out_dir: str
+    old_dir: str | None = None  # previous release tree, for the delta package
+    old_version: str | None = None
+    metadata_path: str | None = None  # version.json to extend (e.g. server_metadata/version.json)
+    base_url: str = PACKAGE_MIRROR_BASES[0]  # where out_dir is uploaded
+    packages: tuple[str, ...] = ()  # package zips to list in ``packages`` with size and digest
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    zsync_min_size: int = LARGE_FILE_BYTES  # 0 disables block sums
+    launcher_dir: str | None = None  # launcher build folder, for differential launcher updates
+    launcher_version: str | None = None
+
+
+def publish(options: PublishOptions) -> dict:
+    """Write objects, block sums, manifests, the delta package and version.json; returns version.json.
+
+    Hashing, copying, block sums and diffs run on ``workers`` processes.
+    Everything is written below ``out_dir``; nothing is uploaded. With
+    ``launcher_dir`` the launcher build gets a manifest (and objects) too,
+    published as ``launcher_manifest`` for differential launcher updates.
+    """
+    if (options.old_dir is None) != (options.old_version is None):
+        raise ValueError("old_dir and old_version go together")
+    if (options.launcher_dir is None) != (options.launcher_version is None):
+        raise ValueError("launcher_dir and launcher_version go together")
+    base_url = options.base_url if options.base_url.endswith("/") else options.base_url + "/"
+    out_dir = options.out_dir
+    os.makedirs(out_dir, exist_ok=True)
+    metadata: dict = {}
+    if options.metadata_path:
+        with open(options.metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, options.workers)) as pool:
+        new_files = hash_tree(options.new_dir, pool)
+        old_files = hash_tree(options.old_dir, pool) if options.old_dir else {}
+        log.info("Hashed %d + %d files in %.1fs", len(new_files), len(old_files), time.monotonic() - started)
+
+        copied = builders.write_objects(options.new_dir, new_files, out_dir, pool)
+        zsync: set[str] = set()
+        if options.zsync_min_size > 0:
+            zsync = builders.write_block_sums(
+                options.new_dir,
+                new_files,
+                out_dir,
+                pool,
+                min_size=options.zsync_min_size,
+            )
+        log.info("Wrote %d new object(s), block sums for %d large file(s)", copied, len(zsync))
+
+        rel = builders.write_manifest(options.version, new_files, out_dir, base_url=base_url, zsync=zsync)
+        manifests = {options.version: builders.artifact_info(out_dir, rel, base_url)}
+        if options.old_version and options.old_version not in (metadata.get("manifests") or {}):
+            # The previous version's manifest tells clients which files the new one drops.
+            rel = builders.write_manifest(options.old_version, old_files, out_dir, base_url=base_url)
+            manifests[options.old_version] = builders.artifact_info(out_dir, rel, base_url)
+
+        delta = None
+        if options.old_dir and options.old_version != options.version:
+            rel = builders.build_delta_package(
+                options.old_dir,
+                old_files,
+                options.new_dir,
+                new_files,
+                options.old_version,
+                options.version,
+                out_dir,
+                pool,
+            )
+            info = builders.artifact_info(out_dir, rel, base_url)
+            delta = {"from": options.old_version, "to": options.version, **info}
+
+        launcher_manifest = None
+        if options.launcher_dir and options.launcher_version:
+            launcher_files = hash_tree(options.launcher_dir, pool)
+            builders.write_objects(options.launcher_dir, launcher_files, out_dir, pool)
+            launcher_zsync: set[str] = set()
+            if options.zsync_min_size > 0:
+                launcher_zsync = builders.write_block_sums(
+                    options.launcher_dir,
+                    launcher_files,
+                    out_dir,
+                    pool,
+                    min_size=options.zsync_min_size,
+                )
+            rel = builders.write_manifest(
+                options.launcher_version,
+                launcher_files,
+                out_dir,
+                base_url=base_url,
+                zsync=launcher_zsync,
+                name="launcher",
+            )
+            launcher_manifest = builders.artifact_info(out_dir, rel, base_url)
+
+    packages = {os.path.basename(p): builders.package_info(p) for p in options.packages}
+    data = builders.extend_version_metadata(
+        metadata,
+        version=options.version,
+        manifests=manifests,
+        delta=delta,
+        packages=packages,
+        launcher_version=options.launcher_version,
+        launcher_manifest=launcher_manifest,
+    )
+    builders.write_json(os.path.join(out_dir, "version.json"), data)
+    log.info("Published %s to %s in %.1fs", options.version, out_dir, time.monotonic() - started)
+    return data
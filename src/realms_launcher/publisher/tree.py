@@ -0,0 +1,51 @@
+"""List and hash release trees across worker processes."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import Executor
+from dataclasses import dataclass
+
+from ..services.file_hashes import sha256_file
+from ..services.manifest_service import LOCAL_MANIFEST_NAME
+
+
+# Launcher bookkeeping that ends up in a tree published from an installed realms/.
+IGNORED_NAMES = frozenset({LOCAL_MANIFEST_NAME, "realms_version.json"})
+
+# Files per task sent to a worker; amortizes pickling for trees of small files.
+HASH_CHUNK = 64
+
+
+@dataclass(frozen=True)
+class TreeFile:
+    path: str  # relative to the tree root, "/"-separated
+    size: int
+    sha256: str
+
+
+def list_files(root: str) -> list[str]:
+    """Relative "/"-separated paths of the files under root, sorted."""
+    paths: list[str] = []
+    for dirpath, _dirnames, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        for name in filenames:
+            path = name if rel == "." else f"{rel}/{name}"
+            if path not in IGNORED_NAMES:
+                paths.append(path)
+    return sorted(paths)
+
+
+def local_path(root: str, path: str) -> str:
+    return os.path.join(root, *path.split("/"))
+
+
+def hash_tree(root: str, pool: Executor) -> dict[str, TreeFile]:
+    """TreeFile for every file under root, keyed by relative path; hashed on pool's workers."""
+    paths = list_files(root)
+    results = pool.map(_hash_file, [local_path(root, p) for p in paths], chunksize=HASH_CHUNK)
+    return {p: TreeFile(p, size, digest) for p, (size, digest) in zip(paths, results)}
+
+
+def _hash_file(path: str) -> tuple[int, str]:
+    return os.path.getsize(path), sha256_file(path)
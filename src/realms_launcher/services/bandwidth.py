@@ -0,0 +1,88 @@
+"""Token-bucket bandwidth caps for downloads (global and per download)."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from ..constants import BANDWIDTH_LIMIT_BPS
+
+
+# Longest single sleep, so a raised or removed cap takes effect quickly.
+MAX_SLEEP_S = 0.25
+
+
+class TokenBucket:
+    """Thread-safe byte-rate limiter; a rate of 0 means unlimited.
+
+    ``consume()`` lets a chunk through immediately while the bucket has tokens
+    and otherwise sleeps until the debt is paid off at the current rate. The rate
+    can be changed at any time from any thread.
+    """
+
+    def __init__(self, rate_bps: float = 0.0, burst_bytes: int | None = None):
+        self._lock = threading.Lock()
+        self._rate = 0.0
+        self._burst = 0.0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self.set_rate(rate_bps, burst_bytes)
+
+    @property
+    def rate_bps(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate_bps: float, burst_bytes: int | None = None) -> None:
+        with self._lock:
+            self._refill()
+            self._rate = max(0.0, float(rate_bps))
+            # Default burst: a quarter second of traffic, at least 64 KiB.
+            self._burst = float(burst_bytes if burst_bytes is not None else max(64 << 10, self._rate / 4))
+            self._tokens = min(self._tokens, self._burst)
+
+    def consume(self, nbytes: int) -> float:
+        """Account for nbytes, sleeping as needed; returns the seconds slept."""
+        with self._lock:
+            if self._rate <= 0:
+                return 0.0
+            self._refill()
+            self._tokens -= nbytes
+        slept = 0.0
+        while True:
+            with self._lock:
+                if self._rate <= 0:
+                    self._tokens = max(self._tokens, 0.0)
+                    return slept
+                self._refill()
+                if self._tokens >= 0:
+                    return slept
+                wait = min(-self._tokens / self._rate, MAX_SLEEP_S)
+            time.sleep(wait)
+            slept += wait
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self._rate)
+        self._stamp = now
+
+
+_global = TokenBucket(BANDWIDTH_LIMIT_BPS)
+
+
+def set_global_limit(rate_bps: float) -> None:
+    """Cap all downloads together (bytes/s, 0 = unlimited); applies to running transfers."""
+    _global.set_rate(rate_bps)
+
+
+def global_limit() -> float:
+    return _global.rate_bps
+
+
+def throttle(nbytes: int, limiter: TokenBucket | None = None) -> float:
+    """Charge nbytes to the per-download limiter (if any) and the global one."""
+    slept = limiter.consume(nbytes) if limiter is not None else 0.0
+    return slept + _global.consume(nbytes)
+
+
+def is_limited(limiter: TokenBucket | None = None) -> bool:
+    return _global.rate_bps > 0 or (limiter is not None and limiter.rate_bps > 0)
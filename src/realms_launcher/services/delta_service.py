@@ -0,0 +1,443 @@
+"""Binary delta packages: patch the files in realms/ from one mod version to the next.
+
+A delta package is a zip holding ``delta.json`` and one member per changed file:
+
+    {"format": 1, "from": "0.8.5", "to": "0.8.6", "files": [
+        {"path": "data/ini.big", "action": "patch", "member": "patches/0",
+         "base_size": 123, "size": 125, "sha256": "..."},
+        {"path": "lang/new.str", "action": "file", "member": "files/1", "size": 9, "sha256": "..."},
+        {"path": "old.txt", "action": "delete"}]}
+
+Patches are copy/insert streams (see ``diff_file`` / ``apply_patch``): ranges of
+the local file are copied and new bytes inserted, so a few changed KB in a large
+archive cost a few KB to download.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import struct
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import BinaryIO
+from zipfile import ZipFile
+
+from ..util.errors import InstallError, IntegrityError, PatchError
+from . import download, download_scheduler, file_hashes, install_service, mirror_service
+from .rolling_checksum import RollingChecksum, map_file, strong_hash, weak_checksum
+from .version_service import DeltaInfo
+
+
+log = logging.getLogger(__name__)
+
+StatusCallback = Callable[[str], None]
+ProgressCallback = Callable[[int, int], None]  # received, total
+
+MANIFEST_NAME = "delta.json"
+DELTA_FORMAT = 1
+PATCH_MAGIC = b"RLDPATCH1\n"
+DEFAULT_BLOCK_SIZE = 8 << 10
+
+# As in zsync_service: past this many bytes rolled one at a time, diff_file only
+# tests block-sized steps, so a heavily rewritten file is not scanned for minutes.
+MAX_ROLL_BYTES = 4 << 20
+
+# Patched files are written next to the original, then swapped in per package.
+NEW_SUFFIX = ".delta-new"
+
+# Download target of the delta being applied (next to the install folder).
+DELTA_ZIP_NAME = "delta_update.zip"
+
+_COPY, _INSERT, _END = b"C", b"I", b"E"
+_OP = struct.Struct("<cQQ")  # opcode, then (offset, length) for copy or (length, 0) for insert
+_IO_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class DeltaEntry:
+    path: str  # relative to realms/, "/"-separated
+    action: str  # "patch" | "file" | "delete"
+    member: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    base_size: int | None = None
+
+
+@dataclass(frozen=True)
+class DeltaManifest:
+    from_version: str
+    to_version: str
+    entries: tuple[DeltaEntry, ...]
+
+
+def diff_file(
+    base_path: str,
+    new_path: str,
+    out: BinaryIO,
+    *,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    max_literal_ratio: float = 0.5,
+    max_roll_bytes: int = MAX_ROLL_BYTES,
+) -> bool:
+    """Write a patch that turns base_path into new_path; False if it is not worth it.
+
+    Blocks of the base file are indexed by weak and strong checksum and the new
+    file is scanned with a rolling checksum, so inserted or removed bytes do not
+    shift every later match. Matched runs are extended block by block with plain
+    comparisons; after ``max_roll_bytes`` rolled bytes unmatched regions are only
+    tested a block at a time. Gives up (returning False, with ``out`` partly
+    written) once the literal bytes exceed ``max_literal_ratio`` of the new file.
+    """
+    with map_file(base_path) as base, map_file(new_path) as new:
+        return _diff(base, new, out, block_size, int(len(new) * max_literal_ratio), max_roll_bytes)
+
+
+def apply_patch(base: BinaryIO, patch: BinaryIO, out: BinaryIO) -> int:
+    """Stream a patch: copy ranges of base and literal bytes from patch into out.
+
+    Returns the number of bytes written. Raises ``PatchError`` for a malformed
+    patch or one that reads past the end of base.
+    """
+    if _read_exact(patch, len(PATCH_MAGIC)) != PATCH_MAGIC:
+        raise PatchError("Not a delta patch")
+    base_size = base.seek(0, os.SEEK_END)
+    written = 0
+    while True:
+        op, a, b = _OP.unpack(_read_exact(patch, _OP.size))
+        if op == _END:
+            return written
+        if op == _COPY:
+            if a + b > base_size:
+                raise PatchError(f"Patch copies bytes {a}-{a + b} of a {base_size} byte file")
+            base.seek(a)
+            _copy_exact(base, out, b)
+            written += b
+        elif op == _INSERT:
+            _copy_exact(patch, out, a)
+            written += a
+        else:
+            raise PatchError(f"Unknown patch operation {op!r}")
+
+
+def read_manifest(zf: ZipFile) -> DeltaManifest:
+    try:
+        data = json.loads(zf.read(MANIFEST_NAME))
+    except (KeyError, ValueError) as e:
+        raise InstallError(f"Invalid delta package: {e}") from e
+    if data.get("format") != DELTA_FORMAT:
+        raise InstallError(f"Unsupported delta package format {data.get('format')!r}")
+    entries = []
+    for raw in data.get("files") or ():
+        action = raw.get("action")
+        if action not in ("patch", "file", "delete") or not raw.get("path"):
+            raise InstallError(f"Invalid delta entry: {raw!r}")
+        if action != "delete" and not (raw.get("member") and raw.get("sha256")):
+            raise InstallError(f"Delta entry without data or digest: {raw['path']}")
+        entries.append(
+            DeltaEntry(
+                path=str(raw["path"]),
+                action=action,
+                member=raw.get("member"),
+                size=raw.get("size"),
+                sha256=raw.get("sha256"),
+                base_size=raw.get("base_size"),
+            )
+        )
+    return DeltaManifest(str(data.get("from", "")), str(data.get("to", "")), tuple(entries))
+
+
+def apply_delta_package(
+    zip_path: str,
+    realms_folder: str,
+    stale: set[str],
+    *,
+    skip: Sequence[str] = (),
+) -> DeltaManifest:
+    """Apply one delta package to realms_folder.
+
+    Every new file is written next to its target and verified against the
+    published size and SHA-256; only when the whole package has applied are the
+    files swapped in and the dropped ones deleted. A patch whose local base does
+    not match is skipped and its path added to ``stale`` (later packages skip it
+    too) so the caller can fetch the file whole; a full file or delete in a later
+    package takes it off the set again. Entries under a ``skip`` prefix (folders
+    the installer removes) are dropped from the returned manifest.
+    """
+    staged: list[tuple[str, str]] = []
+    with ZipFile(zip_path) as zf:
+        manifest = _without_skipped(read_manifest(zf), skip)
+        try:
+            for entry in manifest.entries:
+                if entry.action == "delete":
+                    continue
+                target = _target_path(realms_folder, entry.path)
+                tmp = target + NEW_SUFFIX
+                if entry.action == "patch":
+                    if entry.path in stale:
+                        continue
+                    try:
+                        _patch_file(zf, entry, target, tmp)
+                    except (PatchError, OSError) as e:
+                        log.info("Cannot patch %s (%s); it will be downloaded whole", entry.path, e)
+                        _remove_quietly(tmp)
+                        stale.add(entry.path)
+                        continue
+                else:
+                    _extract_file(zf, entry, tmp)
+                staged.append((tmp, target))
+                stale.discard(entry.path)
+        except BaseException:
+            for tmp, _target in staged:
+                _remove_quietly(tmp)
+            raise
+
+    for tmp, target in staged:
+        _make_writable(target)
+        os.replace(tmp, target)
+    for entry in manifest.entries:
+        if entry.action == "delete":
+            target = _target_path(realms_folder, entry.path)
+            if os.path.isfile(target):
+                _make_writable(target)
+                os.remove(target)
+            stale.discard(entry.path)
+    log.info("Applied delta %s -> %s (%d files)", manifest.from_version, manifest.to_version, len(manifest.entries))
+    return manifest
+
+
+def install_delta_chain(
+    realms_folder: str,
+    chain: Sequence[DeltaInfo],
+    *,
+    full_file_url: str | None,
+    work_dir: str,
+    skip: Sequence[str] = (),
+    on_step: Callable[[DeltaInfo], None] | None = None,
+    on_status: StatusCallback | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> None:
+    """Download and apply each delta in chain, then fetch unpatchable files whole.
+
+    Files whose local copy did not match a patch are extracted from
+    ``full_file_url`` (the cumulative update zip, so only when chain ends at its
+    version) with Range requests and checked against the digest the last delta
+    published for them; without it they raise ``PatchError``. ``on_step`` is called
+    after each delta while no file is pending, so the caller can record progress.
+    Paths under a ``skip`` prefix are left alone (see ``apply_delta_package``).
+    Raises on any failure; the caller then installs the full update instead.
+    """
+    stale: set[str] = set()
+    expected: dict[str, DeltaEntry] = {}
+    zip_path = os.path.join(work_dir, DELTA_ZIP_NAME)
+    for delta in chain:
+        if on_status:
+            on_status(f"Downloading patch {delta.from_version} -> {delta.to_version}...")
+
+        def _apply(job: download_scheduler.DownloadJob, delta: DeltaInfo = delta) -> DeltaManifest:
+            download.download_segmented(
+                delta.url,
+                zip_path,
+                resumable=True,
+                expected_digest=delta.expected_digest,
+                mirrors=mirror_service.ranked_urls(delta.url, delta.mirrors),
+                limiter=job.limiter,
+                on_progress=job.wrap(on_progress),
+            )
+            if on_status:
+                on_status(f"Applying patch {delta.from_version} -> {delta.to_version}...")
+            try:
+                return apply_delta_package(zip_path, realms_folder, stale, skip=skip)
+            finally:
+                _remove_quietly(zip_path)
+
+        manifest = download_scheduler.run(_apply, url=delta.url, label=f"delta {delta.to_version}")
+        expected.update((e.path, e) for e in manifest.entries)
+        if not stale and on_step is not None:
+            on_step(delta)
+
+    if not stale:
+        return
+    names = sorted(stale)
+    if full_file_url is None:
+        raise PatchError(f"{len(names)} file(s) could not be patched, e.g. {names[0]}")
+    if on_status:
+        on_status(f"Downloading {len(names)} file(s) that could not be patched...")
+    install_service.extract_remote_members(full_file_url, realms_folder, names, prefer_folder="realms")
+    for name in names:
+        entry = expected[name]
+        if file_hashes.sha256_file(_target_path(realms_folder, name)) != (entry.sha256 or "").lower():
+            raise IntegrityError(f"{name} from {full_file_url} does not match the patched version")
+
+
+def _without_skipped(manifest: DeltaManifest, skip: Sequence[str]) -> DeltaManifest:
+    skip = tuple(p.lower() for p in skip)
+    if not skip:
+        return manifest
+    entries = tuple(e for e in manifest.entries if not e.path.lower().startswith(skip))
+    if len(entries) != len(manifest.entries):
+        log.info(
+            "Delta %s -> %s: skipping %d file(s) in removed folders",
+            manifest.from_version,
+            manifest.to_version,
+            len(manifest.entries) - len(entries),
+        )
+    return DeltaManifest(manifest.from_version, manifest.to_version, entries)
+
+
+def _diff(base, new, out: BinaryIO, block: int, budget: int, max_roll: int) -> bool:
+    index: dict[int, dict[bytes, int]] = {}
+    for off in range(0, len(base) - block + 1, block):
+        chunk = base[off : off + block]
+        index.setdefault(weak_checksum(chunk), {}).setdefault(strong_hash(chunk), off)
+
+    writer = _PatchWriter(out)
+    n, base_len = len(new), len(base)
+    pos = lit = literal = rolled = 0
+    roll: RollingChecksum | None = None
+    value = 0
+    while pos + block <= n:
+        if roll is None:
+            roll = RollingChecksum(new[pos : pos + block])
+            value = roll.value
+        candidates = index.get(value)
+        off = candidates.get(strong_hash(new[pos : pos + block])) if candidates else None
+        if off is not None:
+            literal += pos - lit
+            if literal > budget:
+                return False
+            writer.insert(new[lit:pos])
+            length = block
+            while (
+                pos + length + block <= n
+                and off + length + block <= base_len
+                and new[pos + length : pos + length + block] == base[off + length : off + length + block]
+            ):
+                length += block
+            writer.copy(off, length)
+            pos += length
+            lit = pos
+            roll = None
+            continue
+        if rolled >= max_roll:
+            pos += block
+            roll = None
+        else:
+            if pos + block >= n:
+                break
+            value = roll.roll(new[pos], new[pos + block])
+            pos += 1
+            rolled += 1
+        if literal + pos - lit > budget:
+            return False
+    if literal + n - lit > budget:
+        return False
+    writer.insert(new[lit:n])
+    writer.end()
+    return True
+
+
+class _PatchWriter:
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.pending: tuple[int, int] | None = None
+        out.write(PATCH_MAGIC)
+
+    def copy(self, offset: int, length: int) -> None:
+        if self.pending is not None and sum(self.pending) == offset:
+            self.pending = (self.pending[0], self.pending[1] + length)
+            return
+        self._flush()
+        self.pending = (offset, length)
+
+    def insert(self, data: bytes) -> None:
+        if not data:
+            return
+        self._flush()
+        self.out.write(_OP.pack(_INSERT, len(data), 0))
+        self.out.write(data)
+
+    def end(self) -> None:
+        self._flush()
+        self.out.write(_OP.pack(_END, 0, 0))
+
+    def _flush(self) -> None:
+        if self.pending is not None:
+            self.out.write(_OP.pack(_COPY, *self.pending))
+            self.pending = None
+
+
+class _HashingWriter:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+def _patch_file(zf: ZipFile, entry: DeltaEntry, target: str, tmp: str) -> None:
+    if not os.path.isfile(target):
+        raise PatchError("local file is missing")
+    if entry.base_size is not None and os.path.getsize(target) != entry.base_size:
+        raise PatchError("local file has a different size")
+    with open(target, "rb") as base, zf.open(entry.member) as patch, open(tmp, "wb") as f:
+        out = _HashingWriter(f)
+        size = apply_patch(base, patch, out)
+    if (entry.size is not None and size != entry.size) or out.sha256.hexdigest() != entry.sha256.lower():
+        raise PatchError("patched file does not match the published digest")
+
+
+def _extract_file(zf: ZipFile, entry: DeltaEntry, tmp: str) -> None:
+    os.makedirs(os.path.dirname(tmp), exist_ok=True)
+    with zf.open(entry.member) as src, open(tmp, "wb") as f:
+        out = _HashingWriter(f)
+        while chunk := src.read(_IO_CHUNK):
+            out.write(chunk)
+    if out.sha256.hexdigest() != entry.sha256.lower():
+        _remove_quietly(tmp)
+        raise IntegrityError(f"{entry.path} in the delta package does not match its digest")
+
+
+def _target_path(realms_folder: str, rel: str) -> str:
+    root = os.path.abspath(realms_folder)
+    target = os.path.abspath(os.path.join(root, *rel.split("/")))
+    if os.path.commonpath([root, target]) != root or target == root:
+        raise InstallError(f"Unsafe path in delta package: {rel}")
+    return target
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise PatchError("Truncated delta patch")
+    return data
+
+
+def _copy_exact(src: BinaryIO, dst, n: int) -> None:
+    while n > 0:
+        chunk = src.read(min(n, _IO_CHUNK))
+        if not chunk:
+            raise PatchError("Truncated delta patch")
+        dst.write(chunk)
+        n -= len(chunk)
+
+
+def _make_writable(path: str) -> None:
+    """Clear a read-only flag (Windows) so the file can be replaced or removed."""
+    if os.path.exists(path) and not os.access(path, os.W_OK):
+        try:
+            os.chmod(path, stat.S_IWRITE)
+        except OSError:
+            pass
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,12 +1,264 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import BinaryIO
 
 import requests
 
+from ..constants import DOWNLOAD_MIN_THROUGHPUT_BPS, DOWNLOAD_STALL_WINDOW_S, DOWNLOAD_SWARM
+from ..util.errors import DownloadError, IntegrityError, StallError
+from . import bandwidth, http_client, net_loop
+from .bandwidth import TokenBucket
+
 
 ProgressCallback = Callable[[int, int], None]  # (bytes_received, total_bytes)
 
+log = logging.getLogger(__name__)
+
+# Segments smaller than this are not worth a dedicated connection.
+MIN_SEGMENT_SIZE = 4 << 20
+
+# A connection that runs out of work takes over half of the largest remaining
+# range, unless that would leave pieces smaller than this.
+MIN_STEAL_SIZE = 1 << 20
+
+# Resumable downloads write to <dest>.part and record progress in <dest>.part.json
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".json"
+CHECKPOINT_INTERVAL_S = 1.0
+
+# A probe made ahead of time (see ``probe_in_background``) is reused by the
+# download that starts within this many seconds.
+PROBE_REUSE_S = 120.0
+
+
+@dataclass(frozen=True)
+class RemoteFileInfo:
+    url: str
+    size: int
+    accepts_ranges: bool
+    etag: str | None = None
+    last_modified: str | None = None
+    content_sha1: str | None = None  # Backblaze x-bz-content-sha1, when reported
+
+    @property
+    def validator(self) -> str | None:
+        """Strong validator usable in ``If-Range`` (ETag preferred)."""
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def same_object(self, other: RemoteFileInfo) -> bool:
+        """Best-effort check that two URLs (mirrors) serve identical bytes.
+
+        Sizes must match; content hashes and ETags are compared only when both
+        sides report one, since the Backblaze S3 and native endpoints do not
+        always expose the same headers.
+        """
+        if self.size != other.size:
+            return False
+        if self.content_sha1 and other.content_sha1 and self.content_sha1 != other.content_sha1:
+            return False
+        if self.etag and other.etag and self.etag != other.etag:
+            return False
+        return True
+
+    def identical_to(self, other: RemoteFileInfo) -> bool:
+        """Strict ``same_object``: a shared content hash or strong ETag proves the bytes are equal."""
+        if not self.same_object(other):
+            return False
+        if self.content_sha1 and self.content_sha1 == other.content_sha1:
+            return True
+        return bool(self.etag) and not self.etag.startswith("W/") and self.etag == other.etag
+
+
+@dataclass(frozen=True)
+class ExpectedDigest:
+    algorithm: str  # hashlib name, e.g. "sha256" or "blake2b"
+    hexdigest: str
+
+
+@dataclass(frozen=True)
+class StallEvent:
+    url: str
+    offset: int  # absolute byte position the connection had reached
+    throughput_bps: float  # average over the window
+    window_s: float
+    at: float  # time.time()
+
+
+_stalls: deque[StallEvent] = deque(maxlen=100)
+
+
+def recent_stalls() -> list[StallEvent]:
+    """Stall watchdog events (oldest first), for diagnostics."""
+    return list(_stalls)
+
+
+class _ThroughputWatchdog:
+    """Raise ``StallError`` when a connection's moving-window throughput stays under the floor.
+
+    A connection that delivers nothing at all is caught by the read timeout
+    instead, since ``iter_content`` only returns when data arrives. While a
+    bandwidth cap applies the floor is not enforced, since slowness is intended.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        min_bps: float = DOWNLOAD_MIN_THROUGHPUT_BPS,
+        window_s: float = DOWNLOAD_STALL_WINDOW_S,
+        limiter: TokenBucket | None = None,
+    ):
+        self.url = url
+        self.limiter = limiter
+        self.min_bps = min_bps
+        self.window_s = window_s
+        self.started = time.monotonic()
+        self.samples: deque[tuple[float, int]] = deque()
+        self.in_window = 0
+
+    def feed(self, nbytes: int, offset: int) -> None:
+        if self.min_bps <= 0:
+            return
+        now = time.monotonic()
+        self.samples.append((now, nbytes))
+        self.in_window += nbytes
+        while self.samples and self.samples[0][0] < now - self.window_s:
+            self.in_window -= self.samples.popleft()[1]
+        if now - self.started < self.window_s or bandwidth.is_limited(self.limiter):
+            return
+        rate = self.in_window / self.window_s
+        if rate < self.min_bps:
+            event = StallEvent(self.url, offset, rate, self.window_s, time.time())
+            _stalls.append(event)
+            log.warning(
+                "Stalled: %s at byte %d averaged %.1f KiB/s over %.0f s", self.url, offset, rate / 1024, self.window_s
+            )
+            raise StallError(f"Transfer from {self.url} stalled at {rate / 1024:.1f} KiB/s")
+
+
+class _RemoteChanged(DownloadError):
+    """The server object changed while a partial download was in progress."""
+
+
+class _ClosedEarly(DownloadError):
+    """A stream ended before its announced length."""
+
+
+@dataclass
+class _Segment:
+    start: int
+    end: int  # inclusive
+    done: int = 0
+    source: int = 0  # index into the transfer's mirror list
+    reserved: int = 0  # bytes of the chunk being written past ``done``
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    @property
+    def complete(self) -> bool:
+        return self.done >= self.length
+
+
+_probe_lock = threading.Lock()
+_probes: dict[str, tuple[float, RemoteFileInfo]] = {}  # url -> (monotonic time, info)
+
+
+def probe_url(url: str, *, timeout_s: float = 30.0, max_age_s: float = 0.0) -> RemoteFileInfo:
+    """Ask the server for size and Range support with a one-byte ranged GET.
+
+    A ranged GET is used instead of HEAD because both Backblaze endpoints answer
+    it consistently, and a 206 reply is the only reliable proof of Range support.
+    A previous result younger than ``max_age_s`` is returned without a request.
+    """
+    if max_age_s > 0:
+        with _probe_lock:
+            cached = _probes.get(url)
+        if cached is not None and time.monotonic() - cached[0] < max_age_s:
+            return cached[1]
+    info = _probe_url(url, timeout_s)
+    with _probe_lock:
+        _probes[url] = (time.monotonic(), info)
+    return info
+
+
+def probe_in_background(urls: Sequence[str], *, timeout_s: float = 30.0) -> threading.Thread:
+    """Probe urls off the calling thread so a download starting soon can skip it."""
+
+    def _run() -> None:
+        for u in dict.fromkeys(urls):
+            try:
+                probe_url(u, timeout_s=timeout_s)
+            except requests.RequestException as e:
+                log.info("Background probe of %s failed: %s", u, e)
+
+    t = threading.Thread(target=_run, name="download-probe", daemon=True)
+    t.start()
+    return t
+
+
+def _probe_url(url: str, timeout_s: float) -> RemoteFileInfo:
+    with http_client.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout_s) as r:
+        r.raise_for_status()
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        sha1 = (r.headers.get("x-bz-content-sha1") or "").removeprefix("unverified:")
+        sha1 = sha1 if sha1 and sha1 != "none" else None
+        if r.status_code == 206:
+            size = _total_from_content_range(r.headers.get("Content-Range", ""))
+            if size is not None:
+                return RemoteFileInfo(url, size, True, etag, last_modified, sha1)
+        size = int(r.headers.get("content-length", 0) or 0)
+        return RemoteFileInfo(url, size, False, etag, last_modified, sha1)
+
+
+def probe_sources(urls: Sequence[str], *, timeout_s: float = 30.0, max_age_s: float = 0.0) -> list[RemoteFileInfo]:
+    """Probe mirror URLs in order and keep the healthy ones serving the same object.
+
+    The first reachable URL defines the object; later mirrors that disagree on
+    size/ETag/hash are dropped. Raises the first error if none is reachable.
+    """
+    sources: list[RemoteFileInfo] = []
+    first_error: Exception | None = None
+    for u in dict.fromkeys(urls):
+        try:
+            info = probe_url(u, timeout_s=timeout_s, max_age_s=max_age_s)
+        except requests.RequestException as e:
+            log.warning("Mirror %s unavailable: %s", u, e)
+            first_error = first_error or e
+            continue
+        if sources and not (info.accepts_ranges and sources[0].same_object(info)):
+            log.warning("Mirror %s serves a different object; not using it", u)
+            continue
+        sources.append(info)
+    if not sources:
+        if first_error is not None:
+            raise first_error
+        raise DownloadError("No download URL given")
+    return sources
+
+
+def _total_from_content_range(value: str) -> int | None:
+    """Parse the total size out of ``bytes 0-0/12345``."""
+    try:
+        total = value.rsplit("/", 1)[1].strip()
+        return int(total) if total != "*" else None
+    except (IndexError, ValueError):
+        return None
+
 
 def download_to_file(
     url: str,
@@ -14,21 +266,742 @@ def download_to_file(
     *,
     chunk_size: int = 1 << 14,
     timeout_s: float = 30.0,
+    expected_digest: ExpectedDigest | None = None,
+    mirrors: Sequence[str] = (),
+    max_retries: int = 3,
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> None:
+    """Stream-download a URL to dest_path with optional progress callback.
+
+    With ``expected_digest`` the chunks are hashed as they stream through and
+    ``IntegrityError`` is raised (and dest_path removed) on a mismatch.
+
+    Every chunk is charged to ``limiter`` and the global cap (``bandwidth``).
+    Stalls and dropped connections are retried as in ``download_to_fileobj``.
+    """
+    try:
+        with open(dest_path, "wb") as f:
+            download_to_fileobj(
+                url,
+                f,
+                chunk_size=chunk_size,
+                timeout_s=timeout_s,
+                expected_digest=expected_digest,
+                mirrors=mirrors,
+                max_retries=max_retries,
+                limiter=limiter,
+                on_progress=on_progress,
+            )
+    except IntegrityError:
+        _remove_quietly(dest_path)
+        raise
+
+
+def download_to_fileobj(
+    url: str,
+    f: BinaryIO,
+    *,
+    chunk_size: int = 1 << 14,
+    timeout_s: float = 30.0,
+    expected_digest: ExpectedDigest | None = None,
+    mirrors: Sequence[str] = (),
+    max_retries: int = 3,
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> int:
+    """Stream url into an open binary file object (e.g. a ``SpooledTemporaryFile``).
+
+    Same hashing, watchdog and bandwidth rules as ``download_to_file``; returns
+    the number of bytes written.
+
+    A stalled or dropped connection is retried, moving through ``mirrors`` (url
+    when empty) in turn and backing off after each full round; every mirror gets
+    a chance before the ``max_retries`` budget runs out. When the server honours
+    ``Range`` with ``If-Range`` the retry continues from the bytes already
+    received, otherwise f is rewound and the download starts over.
+    """
+    urls = list(dict.fromkeys(mirrors)) or [url]
+    stream = _Stream(f, expected_digest)
+    attempt = 0
+    budget = max_retries + len(urls) - 1
+    while True:
+        u = urls[attempt % len(urls)]
+        try:
+            stream.fetch(u, chunk_size=chunk_size, timeout_s=timeout_s, limiter=limiter, on_progress=on_progress)
+            break
+        except (requests.RequestException, StallError, _ClosedEarly) as e:
+            if _is_client_error(e) or attempt >= budget:
+                raise
+            attempt += 1
+            log.warning("Download of %s failed at byte %d (%s); retry %d/%d", u, stream.received, e, attempt, budget)
+            if attempt % len(urls) == 0:
+                time.sleep(min(2 ** (attempt // len(urls)), 10))
+
+    if stream.hasher is not None:
+        stream.hasher.verify(url)
+    return stream.received
+
+
+class _Stream:
+    """One file object filled by successive GETs, resuming with ``Range`` where the server allows it."""
+
+    def __init__(self, f: BinaryIO, expected_digest: ExpectedDigest | None):
+        self.f = f
+        self.base = f.tell()
+        self.expected_digest = expected_digest
+        self.hasher = _StreamingHasher(expected_digest) if expected_digest else None
+        self.received = 0
+        self.total = 0
+        self.validator: str | None = None
+
+    def fetch(
+        self,
+        url: str,
+        *,
+        chunk_size: int,
+        timeout_s: float,
+        limiter: TokenBucket | None,
+        on_progress: ProgressCallback | None,
+    ) -> None:
+        headers = {}
+        if self.received and self.validator:
+            headers = {"Range": f"bytes={self.received}-", "If-Range": self.validator}
+        with http_client.get(url, headers=headers, stream=True, timeout=timeout_s) as r:
+            r.raise_for_status()
+            if not (r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {self.received}-")):
+                self._restart(url, r.headers)
+            elif self.received:
+                log.info("Resuming %s at byte %d", url, self.received)
+
+            watchdog = _ThroughputWatchdog(url, limiter=limiter)
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                watchdog.feed(len(chunk), self.received)
+                bandwidth.throttle(len(chunk), limiter)
+                self.f.write(chunk)
+                if self.hasher is not None:
+                    self.hasher.feed(self.received, chunk)
+                self.received += len(chunk)
+                if on_progress is not None:
+                    on_progress(self.received, self.total)
+        if self.total and self.received < self.total:
+            raise _ClosedEarly(f"Connection to {url} closed early at byte {self.received} of {self.total}")
+
+    def _restart(self, url: str, headers) -> None:
+        if self.received:
+            log.info("%s cannot resume at byte %d; starting over", url, self.received)
+            self.f.seek(self.base)
+            self.f.truncate()
+            self.received = 0
+            self.hasher = _StreamingHasher(self.expected_digest) if self.expected_digest else None
+        self.total = int(headers.get("content-length", 0) or 0)
+        info = RemoteFileInfo(
+            url,
+            self.total,
+            headers.get("Accept-Ranges", "").lower() == "bytes",
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+        )
+        self.validator = info.validator if info.accepts_ranges else None
+
+
+def _is_client_error(e: Exception) -> bool:
+    """A 4xx reply (e.g. 404) is final; retrying or switching mirrors will not fix it."""
+    response = getattr(e, "response", None)
+    return isinstance(e, requests.HTTPError) and response is not None and 400 <= response.status_code < 500
+
+
+def download_segmented(
+    url: str,
+    dest_path: str,
+    *,
+    segments: int = 4,
+    min_segment_size: int = MIN_SEGMENT_SIZE,
+    max_retries: int = 3,
+    chunk_size: int = 1 << 16,
+    timeout_s: float = 30.0,
+    resumable: bool = False,
+    expected_digest: ExpectedDigest | None = None,
+    mirrors: Sequence[str] = (),
+    swarm: bool = DOWNLOAD_SWARM,
+    limiter: TokenBucket | None = None,
     on_progress: ProgressCallback | None = None,
 ) -> None:
-    """Stream-download a URL to dest_path with optional progress callback."""
-    r = requests.get(url, stream=True, timeout=timeout_s)
-    r.raise_for_status()
+    """Download url into dest_path over several concurrent HTTP Range requests.
 
-    total = int(r.headers.get("content-length", 0) or 0)
-    received = 0
+    The file is preallocated and each byte range is fetched on its own worker and
+    retried independently from where it stopped. Falls back to a single stream
+    when the server does not support ranges or the file is too small to split.
 
+    With ``resumable=True`` the data goes to ``dest_path + ".part"`` and progress is
+    checkpointed to a JSON sidecar, so a later call continues where a crashed or
+    failed run stopped (see ``_download_resumable``).
+
+    With ``expected_digest`` the file is hashed while it downloads (no separate
+    read pass) and ``IntegrityError`` is raised before the caller can use it.
+
+    ``mirrors`` lists equivalent URLs in order of preference (url identifies the
+    download and is used when the list is empty). Ranges start on the first
+    healthy mirror and a failing range moves to the next mirror, continuing from
+    the byte where it stopped.
+
+    With ``swarm`` the ranges are spread over every mirror proven to serve the
+    same bytes (see ``_swarm_sources``), at least one connection per mirror. A
+    connection that finishes takes over half of the largest range still left,
+    so faster mirrors end up serving more of the file.
+
+    ``limiter`` caps this download's rate (all segments together) on top of the
+    global ``bandwidth`` cap; both can be changed while it runs.
+
+    ``on_progress`` is always invoked from the calling thread, so UI callbacks
+    stay safe to use.
+    """
+    opts = dict(
+        max_retries=max_retries,
+        chunk_size=chunk_size,
+        timeout_s=timeout_s,
+        expected_digest=expected_digest,
+        swarm=swarm,
+        limiter=limiter,
+    )
+    urls = list(mirrors) or [url]
+    if resumable:
+        _download_resumable(
+            url,
+            dest_path,
+            urls,
+            segments=segments,
+            min_segment_size=min_segment_size,
+            on_progress=on_progress,
+            **opts,
+        )
+        return
+
+    sources = probe_sources(urls, timeout_s=timeout_s, max_age_s=PROBE_REUSE_S)
+    info = sources[0]
+    count = _segment_count(info, segments, min_segment_size, _swarm_width(sources, expected_digest, swarm))
+    if count <= 1:
+        download_to_file(
+            info.url,
+            dest_path,
+            timeout_s=timeout_s,
+            expected_digest=expected_digest,
+            mirrors=[s.url for s in sources],
+            max_retries=max_retries,
+            limiter=limiter,
+            on_progress=on_progress,
+        )
+        return
+
+    parts = _split_ranges(info.size, count)
     with open(dest_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=chunk_size):
-            if not chunk:
-                continue
-            f.write(chunk)
-            received += len(chunk)
-            if on_progress is not None:
-                on_progress(received, total)
+        f.truncate(info.size)
+
+    try:
+        _SegmentedTransfer(sources, dest_path, parts, **opts).run(on_progress=on_progress)
+    except IntegrityError:
+        _remove_quietly(dest_path)
+        raise
+
+
+async def download_segmented_async(url: str, dest_path: str, **kwargs) -> None:
+    """Awaitable ``download_segmented``; runs on the network loop's bounded executor.
+
+    ``on_progress`` is then called from that executor thread, not the caller's.
+    """
+    await net_loop.to_thread(download_segmented, url, dest_path, **kwargs)
+
+
+def download_ranges(
+    url: str,
+    dest_path: str,
+    ranges: Sequence[tuple[int, int]],
+    *,
+    expected_size: int | None = None,
+    connections: int = 4,
+    max_retries: int = 3,
+    chunk_size: int = 1 << 16,
+    timeout_s: float = 30.0,
+    mirrors: Sequence[str] = (),
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> None:
+    """Fetch only the given byte ranges (inclusive) of url into the same offsets of dest_path.
+
+    dest_path must already exist (e.g. preallocated and partly filled from local
+    data). Ranges are fetched over up to ``connections`` concurrent requests with
+    the retry, mirror failover, stall and bandwidth rules of ``download_segmented``,
+    and ``If-Range`` guards against the object changing midway. ``expected_size``
+    rejects a server object of a different size up front. Progress counts the
+    requested bytes only.
+    """
+    sources = probe_sources(list(mirrors) or [url], timeout_s=timeout_s, max_age_s=PROBE_REUSE_S)
+    info = sources[0]
+    if not info.accepts_ranges:
+        raise DownloadError(f"{info.url} does not support Range requests")
+    if expected_size is not None and info.size != expected_size:
+        raise DownloadError(f"{info.url} is {info.size} bytes, expected {expected_size}")
+    parts = [_Segment(start, end) for start, end in ranges if end >= start]
+    if not parts:
+        return
+    transfer = _SegmentedTransfer(
+        sources,
+        dest_path,
+        parts,
+        max_retries=max_retries,
+        chunk_size=chunk_size,
+        timeout_s=timeout_s,
+        if_range=True,
+        connections=connections,
+        limiter=limiter,
+    )
+    transfer.run(on_progress=on_progress)
+
+
+def _download_resumable(
+    url: str,
+    dest_path: str,
+    urls: list[str],
+    *,
+    segments: int,
+    min_segment_size: int,
+    on_progress: ProgressCallback | None,
+    **opts,
+) -> None:
+    """Crash-safe download via ``<dest>.part`` and a ``<dest>.part.json`` sidecar.
+
+    The sidecar records the URL, size, ETag/Last-Modified (per mirror) and the
+    bytes committed per segment. A stored partial is only reused when the server
+    still reports the same object; range requests also carry ``If-Range`` so a
+    change that happens mid-transfer is detected and the download restarts from zero.
+    """
+    part_path = dest_path + PART_SUFFIX
+    state_path = part_path + STATE_SUFFIX
+
+    for attempt in range(2):
+        # After a remote change, never trust an earlier probe.
+        sources = probe_sources(urls, timeout_s=opts["timeout_s"], max_age_s=PROBE_REUSE_S if attempt == 0 else 0.0)
+        info = sources[0]
+        width = _swarm_width(sources, opts["expected_digest"], opts["swarm"])
+        count = _segment_count(info, segments, min_segment_size, width)
+        if not info.accepts_ranges or info.size <= 0 or not info.validator:
+            # Nothing to resume against; still write via .part so a crash never
+            # leaves a truncated file under the final name.
+            discard_partial(dest_path)
+            download_to_file(
+                info.url,
+                part_path,
+                timeout_s=opts["timeout_s"],
+                expected_digest=opts["expected_digest"],
+                mirrors=[s.url for s in sources],
+                max_retries=opts["max_retries"],
+                limiter=opts["limiter"],
+                on_progress=on_progress,
+            )
+            os.replace(part_path, dest_path)
+            return
+
+        parts = _load_partial(state_path, part_path, url, sources)
+        if parts is None:
+            discard_partial(dest_path)
+            parts = _split_ranges(info.size, max(1, count))
+            with open(part_path, "wb") as f:
+                f.truncate(info.size)
+        else:
+            log.info("Resuming %s at %d of %d bytes", url, sum(p.done for p in parts), info.size)
+
+        def _checkpoint(snapshot: list[tuple[int, int, int]]) -> None:
+            _save_partial(state_path, url, sources, snapshot)
+
+        try:
+            transfer = _SegmentedTransfer(sources, part_path, parts, if_range=True, **opts)
+            transfer.run(on_progress=on_progress, on_checkpoint=_checkpoint)
+        except _RemoteChanged:
+            log.warning("Remote file %s changed during download; restarting", url)
+            discard_partial(dest_path)
+            continue
+        except IntegrityError:
+            # The bytes on disk are wrong; never resume from them.
+            discard_partial(dest_path)
+            raise
+
+        os.replace(part_path, dest_path)
+        _remove_quietly(state_path)
+        return
+
+    raise DownloadError(f"Remote file kept changing during download: {url}")
+
+
+def discard_partial(dest_path: str) -> None:
+    """Remove the ``.part`` file and sidecar of a resumable download, if any."""
+    part_path = dest_path + PART_SUFFIX
+    _remove_quietly(part_path)
+    _remove_quietly(part_path + STATE_SUFFIX)
+
+
+def _load_partial(
+    state_path: str,
+    part_path: str,
+    url: str,
+    sources: list[RemoteFileInfo],
+) -> list[_Segment] | None:
+    """Return saved segments if the sidecar still describes the remote object."""
+    info = sources[0]
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f) or {}
+        if os.path.getsize(part_path) != info.size:
+            return None
+    except (OSError, ValueError):
+        return None
+
+    # Mirrors may be ranked differently than last time, so validators are kept
+    # per mirror URL; every mirror recorded before must still match, and at
+    # least one current mirror must have been seen before.
+    recorded = state.get("sources") or {}
+    seen = [src for src in sources if src.url in recorded]
+    same_object = (
+        state.get("url") == url
+        and state.get("size") == info.size
+        and bool(seen)
+        and all(
+            recorded[src.url].get("etag") == src.etag and recorded[src.url].get("last_modified") == src.last_modified
+            for src in seen
+        )
+    )
+    if not same_object:
+        log.info("Discarding partial download of %s: remote object changed", url)
+        return None
+
+    try:
+        parts = [_Segment(int(a), int(b), int(d)) for a, b, d in state.get("segments") or []]
+    except (TypeError, ValueError):
+        return None
+    if not parts or parts[0].start != 0 or parts[-1].end != info.size - 1:
+        return None
+    return parts
+
+
+def _save_partial(
+    state_path: str,
+    url: str,
+    sources: list[RemoteFileInfo],
+    snapshot: list[tuple[int, int, int]],
+) -> None:
+    info = sources[0]
+    state = {
+        "url": url,
+        "size": info.size,
+        "etag": info.etag,
+        "last_modified": info.last_modified,
+        "sources": {src.url: {"etag": src.etag, "last_modified": src.last_modified} for src in sources},
+        "committed": sum(d for _a, _b, d in snapshot),
+        "segments": [list(s) for s in snapshot],
+    }
+    tmp_path = state_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    except OSError as e:
+        log.warning("Could not save download state %s: %s", state_path, e)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _segment_count(info: RemoteFileInfo, segments: int, min_segment_size: int, sources: int = 1) -> int:
+    """Connections for a download: ``segments``, raised to one per swarm source."""
+    if not info.accepts_ranges or info.size <= 0:
+        return 1
+    return min(max(1, segments, sources), max(1, info.size // max(1, min_segment_size)))
+
+
+def _swarm_sources(sources: list[RemoteFileInfo], expected_digest: ExpectedDigest | None) -> list[RemoteFileInfo]:
+    """Mirrors whose bytes may be mixed into one file with those of ``sources[0]``.
+
+    ``probe_sources`` only proves that sizes match (the endpoints do not always
+    report the same headers), so a mirror joins the swarm when it shares a
+    content hash or strong ETag with the first source, or when the published
+    digest will verify the assembled file anyway.
+    """
+    first = sources[0]
+    if not first.accepts_ranges:
+        return [first]
+    return [first] + [s for s in sources[1:] if expected_digest is not None or first.identical_to(s)]
+
+
+def _swarm_width(sources: list[RemoteFileInfo], expected_digest: ExpectedDigest | None, swarm: bool) -> int:
+    return len(_swarm_sources(sources, expected_digest)) if swarm else 1
+
+
+def _split_ranges(size: int, count: int) -> list[_Segment]:
+    step = size // count
+    parts = []
+    for i in range(count):
+        start = i * step
+        end = size - 1 if i == count - 1 else start + step - 1
+        parts.append(_Segment(start, end))
+    return parts
+
+
+def _remaining(seg: _Segment) -> int:
+    return seg.length - seg.done - seg.reserved
+
+
+class _StreamingHasher:
+    """Hash a file in byte order while its segments arrive out of order.
+
+    Chunks that land exactly at the hashed position are hashed from memory by the
+    worker that received them. Bytes that arrived ahead of that position (later
+    segments, or data already on disk from a resumed run) are caught up from the
+    freshly written file, which the OS still has cached.
+    """
+
+    CATCH_UP_STEP = 16 << 20
+
+    def __init__(self, expected: ExpectedDigest):
+        self.expected = expected
+        self.pos = 0
+        self._h = hashlib.new(expected.algorithm)
+
+    def feed(self, offset: int, data: bytes) -> None:
+        if offset == self.pos:
+            self._h.update(data)
+            self.pos += len(data)
+
+    def catch_up(self, path: str, available: int) -> None:
+        """Hash file bytes from the current position up to ``available``."""
+        if available <= self.pos:
+            return
+        with open(path, "rb") as f:
+            f.seek(self.pos)
+            while self.pos < available:
+                data = f.read(min(1 << 20, available - self.pos))
+                if not data:
+                    break
+                self._h.update(data)
+                self.pos += len(data)
+
+    def verify(self, url: str) -> None:
+        actual = self._h.hexdigest()
+        if actual.lower() != self.expected.hexdigest.lower():
+            raise IntegrityError(
+                f"{self.expected.algorithm} mismatch for {url}: expected {self.expected.hexdigest}, got {actual}"
+            )
+
+
+class _SegmentedTransfer:
+    """Fetch the byte ranges of one remote file concurrently into dest_path.
+
+    ``sources`` are equivalent mirrors of the file; every range starts on the
+    first one (or, with ``swarm``, round-robin over the mirrors that may be
+    mixed) and moves to the next mirror when it fails. A worker whose range is
+    done steals the back half of the largest unfinished range.
+    """
+
+    def __init__(
+        self,
+        sources: list[RemoteFileInfo],
+        dest_path: str,
+        parts: list[_Segment],
+        *,
+        max_retries: int,
+        chunk_size: int,
+        timeout_s: float,
+        if_range: bool = False,
+        expected_digest: ExpectedDigest | None = None,
+        swarm: bool = False,
+        connections: int | None = None,
+        limiter: TokenBucket | None = None,
+    ):
+        if swarm:
+            mixed = _swarm_sources(sources, expected_digest)
+            # Mirrors that may not be mixed stay available for failover only.
+            sources = mixed + [s for s in sources if s not in mixed]
+            for i, p in enumerate(q for q in parts if not q.complete):
+                p.source = i % len(mixed)
+        self.sources = sources
+        self.info = sources[0]
+        self.dest_path = dest_path
+        self.parts = parts
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self.timeout_s = timeout_s
+        self.if_range = if_range
+        self.hasher = _StreamingHasher(expected_digest) if expected_digest else None
+        self.limiter = limiter
+        self.connections = connections or len(parts)
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.by_source = [0] * len(sources)
+
+    def received(self) -> int:
+        with self.lock:
+            return sum(p.done for p in self.parts)
+
+    def snapshot(self) -> list[tuple[int, int, int]]:
+        with self.lock:
+            return [(p.start, p.end, p.done) for p in self.parts]
+
+    def run(
+        self,
+        *,
+        on_progress: ProgressCallback | None,
+        on_checkpoint: Callable[[list[tuple[int, int, int]]], None] | None = None,
+    ) -> None:
+        total = sum(p.length for p in self.parts)
+        last_reported = -1
+        last_checkpoint = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, self.connections), thread_name_prefix="download") as pool:
+            futures = [pool.submit(self._worker, p) for p in self.parts if not p.complete]
+            try:
+                pending = set(futures)
+                while pending:
+                    _done, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                    for fut in _done:
+                        fut.result()
+                    self._hash_catch_up(_StreamingHasher.CATCH_UP_STEP)
+                    received = self.received()
+                    if on_progress is not None and received != last_reported:
+                        last_reported = received
+                        on_progress(received, total)
+                    if on_checkpoint is not None and time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_S:
+                        last_checkpoint = time.monotonic()
+                        on_checkpoint(self.snapshot())
+            except BaseException:
+                self.stop.set()
+                raise
+            finally:
+                pool.shutdown(wait=True)
+                if on_checkpoint is not None:
+                    on_checkpoint(self.snapshot())
+
+        received = self.received()
+        if received != total:
+            raise DownloadError(f"Incomplete download: {received} of {total} bytes")
+        if on_progress is not None and received != last_reported:
+            on_progress(received, total)
+        if self.hasher is not None:
+            self._hash_catch_up(total)
+            if self.hasher.pos != total:
+                raise DownloadError(f"Hashed {self.hasher.pos} of {total} bytes of {self.info.url}")
+            self.hasher.verify(self.info.url)
+        if sum(1 for n in self.by_source if n) > 1:
+            log.info(
+                "Fetched %s from %s",
+                self.info.url,
+                ", ".join(f"{src.url}: {n} bytes" for src, n in zip(self.sources, self.by_source) if n),
+            )
+
+    def _hash_catch_up(self, limit: int) -> None:
+        """Advance the hasher over bytes that arrived ahead of it (at most ``limit``)."""
+        if self.hasher is None:
+            return
+        with self.lock:
+            stop_at = self.hasher.pos + limit
+            while self.hasher.pos < stop_at:
+                pos = self.hasher.pos
+                seg = next((p for p in self.parts if p.start <= pos <= p.end), None)
+                if seg is None:
+                    return
+                self.hasher.catch_up(self.dest_path, min(seg.start + seg.done, stop_at))
+                if self.hasher.pos == pos:
+                    return
+
+    def _steal(self, source: int) -> _Segment | None:
+        """Split off the back half of the largest unfinished range for an idle worker."""
+        with self.lock:
+            victim = max((p for p in self.parts if not p.complete), key=_remaining, default=None)
+            if victim is None or _remaining(victim) < 2 * MIN_STEAL_SIZE:
+                return None
+            start = victim.end - _remaining(victim) // 2 + 1
+            seg = _Segment(start, victim.end, source=source)
+            victim.end = start - 1
+            self.parts.insert(self.parts.index(victim) + 1, seg)
+        log.debug("Range %d-%d taken over by mirror %s", seg.start, seg.end, self.sources[source].url)
+        return seg
+
+    def _worker(self, seg: _Segment) -> None:
+        while seg is not None:
+            self._work(seg)
+            if self.stop.is_set():
+                return
+            seg = self._steal(seg.source)
+
+    def _work(self, seg: _Segment) -> None:
+        attempt = 0
+        # Every mirror gets a chance before the retry budget is exhausted.
+        budget = self.max_retries + len(self.sources) - 1
+        while not seg.complete:
+            if self.stop.is_set():
+                return
+            try:
+                self._fetch_range(seg)
+            except _RemoteChanged:
+                raise
+            except (requests.RequestException, DownloadError, OSError) as e:
+                attempt += 1
+                if attempt > budget:
+                    raise DownloadError(f"Segment {seg.start}-{seg.end} failed after {budget} retries: {e}") from e
+                log.warning("Segment %d-%d failed (%s); retry %d/%d", seg.start, seg.end, e, attempt, budget)
+                if len(self.sources) > 1:
+                    seg.source = (seg.source + 1) % len(self.sources)
+                    log.info("Segment %d-%d switching to mirror %s", seg.start, seg.end, self.sources[seg.source].url)
+                # Back off once every mirror has failed in turn, so a brief outage does not use up the budget.
+                if attempt % len(self.sources) == 0:
+                    time.sleep(min(2 ** (attempt // len(self.sources)), 10))
 
+    def _fetch_range(self, seg: _Segment) -> None:
+        info = self.sources[seg.source]
+        validator = info.validator if self.if_range else None
+        offset = seg.start + seg.done
+        headers = {"Range": f"bytes={offset}-{seg.end}"}
+        if validator:
+            headers["If-Range"] = validator
+        with http_client.get(info.url, headers=headers, stream=True, timeout=self.timeout_s) as r:
+            r.raise_for_status()
+            content_range = r.headers.get("Content-Range", "")
+            if validator and (r.status_code == 200 or _total_from_content_range(content_range) != info.size):
+                raise _RemoteChanged(f"{info.url} no longer matches {validator}")
+            if r.status_code != 206 or not content_range.startswith(f"bytes {offset}-"):
+                raise DownloadError(f"Server ignored range request for bytes {offset}-{seg.end}")
+            watchdog = _ThroughputWatchdog(info.url, limiter=self.limiter)
+            with open(self.dest_path, "r+b") as f:
+                f.seek(offset)
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if self.stop.is_set():
+                        return
+                    if not chunk:
+                        continue
+                    # The range may have been shortened by _steal(); reserve the
+                    # bytes written next so a later split starts past them.
+                    with self.lock:
+                        chunk = chunk[: seg.length - seg.done]
+                        seg.reserved = len(chunk)
+                    try:
+                        # Raising here keeps seg.done, so the retry resumes from this byte.
+                        watchdog.feed(len(chunk), seg.start + seg.done)
+                        bandwidth.throttle(len(chunk), self.limiter)
+                        f.write(chunk)
+                        f.flush()
+                    except BaseException:
+                        with self.lock:
+                            seg.reserved = 0
+                        raise
+                    with self.lock:
+                        if self.hasher is not None:
+                            self.hasher.feed(seg.start + seg.done, chunk)
+                        seg.done += len(chunk)
+                        seg.reserved = 0
+                        self.by_source[seg.source] += len(chunk)
+                    if seg.complete:
+                        return
+        if not seg.complete:
+            raise DownloadError(f"Connection closed early at byte {seg.start + seg.done}")
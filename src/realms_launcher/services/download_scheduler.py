@@ -0,0 +1,252 @@
+"""Central download scheduler: priorities, preemption and concurrency caps."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import IntEnum
+from urllib.parse import urlsplit
+
+from ..constants import BACKGROUND_LIMIT_BPS, DOWNLOAD_LIMIT_BPS, DOWNLOAD_MAX_ACTIVE, DOWNLOAD_MAX_PER_HOST
+from ..util.errors import DownloadError
+from .bandwidth import TokenBucket
+
+
+ProgressCallback = Callable[[int, int], None]  # received, total
+
+log = logging.getLogger(__name__)
+
+# Throughput in status() is averaged over this many seconds.
+THROUGHPUT_WINDOW_S = 5.0
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # the user is waiting on it (install / update button)
+    BACKGROUND = 10  # pre-staging, launcher self-update
+
+
+class Preempted(DownloadError):
+    """A background job gave up its slot to a higher-priority one; it is requeued."""
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    id: int
+    label: str
+    url: str
+    host: str
+    priority: Priority
+    state: str  # "queued" | "active"
+    received: int
+    total: int
+    throughput_bps: float
+    limit_bps: float  # 0 = uncapped (the global cap may still apply)
+    queued_at: float
+
+
+class DownloadJob:
+    """Handle passed to a scheduled download; report progress through it.
+
+    ``limiter`` is the job's own bandwidth cap; pass it to the download function.
+    """
+
+    def __init__(self, job_id: int, url: str, label: str, priority: Priority, preemptible: bool):
+        self.id = job_id
+        self.url = url
+        self.host = urlsplit(url).netloc.lower()
+        self.label = label
+        self.priority = priority
+        self.preemptible = preemptible
+        self.state = "queued"
+        self.received = 0
+        self.total = 0
+        self.queued_at = time.time()
+        self.limiter = TokenBucket(_download_limit)
+        self._samples: deque[tuple[float, int]] = deque()
+        self._preempt = threading.Event()
+
+    def progress(self, received: int, total: int) -> None:
+        """Record progress; raises ``Preempted`` when the job should yield its slot."""
+        now = time.monotonic()
+        self.received, self.total = received, total
+        self._samples.append((now, received))
+        while len(self._samples) > 2 and self._samples[0][0] < now - THROUGHPUT_WINDOW_S:
+            self._samples.popleft()
+        if self._preempt.is_set():
+            raise Preempted(f"{self.label} paused for a higher-priority download")
+
+    def wrap(self, on_progress: ProgressCallback | None) -> ProgressCallback:
+        """Progress callback that records into the job, then forwards to on_progress."""
+
+        def _cb(received: int, total: int) -> None:
+            self.progress(received, total)
+            if on_progress is not None:
+                on_progress(received, total)
+
+        return _cb
+
+    @property
+    def throughput_bps(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        return (b1 - b0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def status(self) -> JobStatus:
+        return JobStatus(
+            self.id,
+            self.label,
+            self.url,
+            self.host,
+            self.priority,
+            self.state,
+            self.received,
+            self.total,
+            self.throughput_bps,
+            self.limiter.rate_bps,
+            self.queued_at,
+        )
+
+
+_cond = threading.Condition()
+_ids = itertools.count(1)
+_waiting: list[DownloadJob] = []
+_active: list[DownloadJob] = []
+_max_active = DOWNLOAD_MAX_ACTIVE
+_max_per_host = DOWNLOAD_MAX_PER_HOST
+_download_limit: float = DOWNLOAD_LIMIT_BPS
+_background_limit: float = BACKGROUND_LIMIT_BPS
+
+
+def configure(*, max_active: int | None = None, max_per_host: int | None = None) -> None:
+    """Change the global / per-host caps; waiting jobs are re-evaluated immediately."""
+    global _max_active, _max_per_host
+    with _cond:
+        if max_active is not None:
+            _max_active = max(1, max_active)
+        if max_per_host is not None:
+            _max_per_host = max(1, max_per_host)
+        _cond.notify_all()
+
+
+def set_limits(*, per_download_bps: float | None = None, background_bps: float | None = None) -> None:
+    """Change the per-download and background bandwidth caps (bytes/s, 0 = none); running jobs adapt."""
+    global _download_limit, _background_limit
+    with _cond:
+        if per_download_bps is not None:
+            _download_limit = max(0.0, per_download_bps)
+        if background_bps is not None:
+            _background_limit = max(0.0, background_bps)
+        _apply_limits()
+
+
+def run[T](
+    fn: Callable[[DownloadJob], T],
+    *,
+    url: str,
+    label: str = "",
+    priority: Priority = Priority.INTERACTIVE,
+    preemptible: bool = False,
+) -> T:
+    """Run fn(job) on the calling thread once the scheduler grants it a slot.
+
+    Jobs start in priority order within the global and per-host caps, and no job
+    starts while one of higher priority is active or waiting. Submitting a job
+    preempts active ``preemptible`` jobs of lower priority: their next
+    ``job.progress()`` call raises ``Preempted``, and ``run`` then waits for a slot
+    again and calls fn once more, which must continue where it stopped (e.g. a
+    resumable download). Nothing starts until preempted jobs have returned.
+
+    Running fn on the caller's thread keeps progress callbacks on that thread.
+    """
+    job = DownloadJob(next(_ids), url, label or url.rsplit("/", 1)[-1], priority, preemptible)
+    while True:
+        _acquire(job)
+        try:
+            return fn(job)
+        except Preempted:
+            log.info("Download job %d (%s) preempted; requeued", job.id, job.label)
+        finally:
+            _release(job)
+
+
+def status() -> list[JobStatus]:
+    """Active jobs first, then queued jobs in the order they would start."""
+    with _cond:
+        jobs = list(_active) + sorted(_waiting, key=_order)
+    return [j.status() for j in jobs]
+
+
+def _order(job: DownloadJob) -> tuple[int, int]:
+    return (int(job.priority), job.id)
+
+
+def _acquire(job: DownloadJob) -> None:
+    with _cond:
+        job.state = "queued"
+        job._preempt.clear()
+        _waiting.append(job)
+        _preempt_lower(job.priority)
+        _cond.notify_all()
+        try:
+            while not _can_start(job):
+                _cond.wait()
+        finally:
+            _waiting.remove(job)
+        job.state = "active"
+        _active.append(job)
+        log.debug("Download job %d (%s) started", job.id, job.label)
+        _apply_limits()
+        _cond.notify_all()
+
+
+def _release(job: DownloadJob) -> None:
+    with _cond:
+        if job in _active:
+            _active.remove(job)
+        _apply_limits()
+        _cond.notify_all()
+
+
+def _apply_limits() -> None:
+    """Throttle jobs that run alongside a higher-priority one; others get the per-download cap."""
+    top = min((j.priority for j in _active), default=None)
+    for j in _active:
+        rate = _download_limit
+        if top is not None and j.priority > top and _background_limit > 0:
+            rate = min(rate, _background_limit) if rate > 0 else _background_limit
+        if j.limiter.rate_bps != rate:
+            j.limiter.set_rate(rate)
+
+
+def _can_start(job: DownloadJob) -> bool:
+    if len(_active) >= _max_active:
+        return False
+    if sum(1 for j in _active if j.host == job.host) >= _max_per_host:
+        return False
+    if any(j.priority < job.priority for j in _active):
+        return False
+    # A preempted job is still stopping (and may share files with this one).
+    if any(j._preempt.is_set() for j in _active):
+        return False
+    # Earlier-queued or higher-priority waiters go first, unless their host is full.
+    for other in sorted(_waiting, key=_order):
+        if other is job:
+            return True
+        if other.priority < job.priority:
+            return False
+        if sum(1 for j in _active if j.host == other.host) < _max_per_host:
+            return False
+    return True
+
+
+def _preempt_lower(priority: Priority) -> None:
+    for j in _active:
+        if j.preemptible and j.priority > priority and not j._preempt.is_set():
+            log.info("Preempting download job %d (%s)", j.id, j.label)
+            j._preempt.set()
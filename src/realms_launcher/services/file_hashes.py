@@ -0,0 +1,109 @@
+"""SHA-256 of local files, cached by (size, mtime) so unchanged files are not re-read."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from ..util.runtime import app_data_dir
+
+
+log = logging.getLogger(__name__)
+
+# hashlib releases the GIL on large buffers, so threads hash files in parallel.
+HASH_WORKERS = 4
+_CHUNK = 1 << 20
+
+_lock = threading.Lock()
+_cache: dict[str, list] | None = None  # abs path -> [size, mtime_ns, sha256]
+_dirty = False
+
+
+def cache_path() -> str:
+    return os.path.join(app_data_dir(), "cache", "file_hashes.json")
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sha256_of(path: str) -> str:
+    """Hash of path, reusing the cached value while its size and mtime are unchanged."""
+    global _dirty
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _lock:
+        entry = _entries().get(path)
+    if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+        return entry[2]
+    digest = sha256_file(path)
+    with _lock:
+        _entries()[path] = [st.st_size, st.st_mtime_ns, digest]
+        _dirty = True
+    return digest
+
+
+def hash_files(paths: Iterable[str], *, workers: int = HASH_WORKERS) -> dict[str, str]:
+    """sha256_of for many files concurrently; missing files are left out. Saves the cache."""
+    paths = list(paths)
+
+    def _one(p: str) -> tuple[str, str | None]:
+        try:
+            return p, sha256_of(p)
+        except OSError:
+            return p, None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hash") as pool:
+        results = {p: d for p, d in pool.map(_one, paths) if d is not None}
+    save()
+    return results
+
+
+def remember(path: str, digest: str) -> None:
+    """Record the hash of a file just written and verified, so it is not re-read later."""
+    global _dirty
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _lock:
+        _entries()[path] = [st.st_size, st.st_mtime_ns, digest]
+        _dirty = True
+
+
+def save() -> None:
+    global _dirty
+    with _lock:
+        if not _dirty or _cache is None:
+            return
+        # Drop entries for files that no longer exist.
+        data = {p: e for p, e in _cache.items() if os.path.exists(p)}
+        _dirty = False
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Could not save file hash cache: %s", e)
+
+
+def _entries() -> dict[str, list]:
+    global _cache
+    if _cache is None:
+        try:
+            with open(cache_path(), encoding="utf-8") as f:
+                loaded = json.load(f)
+            _cache = loaded if isinstance(loaded, dict) else {}
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
@@ -0,0 +1,151 @@
+"""On-disk conditional-GET cache for small metadata documents (version.json, news)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+from ..util.runtime import app_data_dir
+from . import http_client
+
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    encoding: str | None = None
+    from_cache: bool = False  # served without downloading the body (fresh hit or 304)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode(self.encoding or "utf-8"))
+
+
+def cache_dir() -> str:
+    return os.path.join(app_data_dir(), "cache", "http")
+
+
+def fetch(
+    url: str,
+    *,
+    max_age_s: float = 0.0,
+    timeout_s: float = 15.0,
+    allow_stale_on_error: bool = False,
+) -> CachedResponse:
+    """GET url, revalidating a cached copy with If-None-Match / If-Modified-Since.
+
+    A cached copy younger than ``max_age_s`` is returned without any request.
+    Otherwise a conditional GET is sent and a 304 serves the cached body. HTTP
+    errors raise ``requests.HTTPError``; with ``allow_stale_on_error`` a cached
+    body is returned instead when the server cannot be reached.
+    """
+    meta_path, body_path = _entry_paths(url)
+    meta = _load_meta(meta_path, url)
+    body = _read_body(body_path) if meta else None
+    if body is None:
+        meta = None
+
+    if meta and max_age_s > 0 and time.time() - float(meta.get("fetched_at", 0)) < max_age_s:
+        return CachedResponse(body, meta.get("encoding"), from_cache=True)
+
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        r = http_client.get(url, headers=headers, timeout=timeout_s)
+        if r.status_code == 304 and meta:
+            meta["fetched_at"] = time.time()
+            _store(meta_path, None, meta, None)
+            return CachedResponse(body, meta.get("encoding"), from_cache=True)
+        r.raise_for_status()
+    except requests.RequestException as e:
+        if allow_stale_on_error and meta and not isinstance(e, requests.HTTPError):
+            log.warning("Serving cached %s after error: %s", url, e)
+            return CachedResponse(body, meta.get("encoding"), from_cache=True)
+        raise
+
+    result = CachedResponse(r.content, r.encoding)
+    new_meta = {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "encoding": r.encoding,
+        "fetched_at": time.time(),
+    }
+    if new_meta["etag"] or new_meta["last_modified"] or max_age_s > 0:
+        _store(meta_path, body_path, new_meta, r.content)
+    return result
+
+
+def clear() -> None:
+    """Drop every cached entry."""
+    with _lock:
+        try:
+            names = os.listdir(cache_dir())
+        except OSError:
+            return
+        for name in names:
+            try:
+                os.remove(os.path.join(cache_dir(), name))
+            except OSError:
+                pass
+
+
+def _entry_paths(url: str) -> tuple[str, str]:
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    base = os.path.join(cache_dir(), key)
+    return base + ".json", base + ".body"
+
+
+def _load_meta(meta_path: str, url: str) -> dict | None:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f) or {}
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("url") == url else None
+
+
+def _read_body(body_path: str) -> bytes | None:
+    try:
+        with open(body_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _store(meta_path: str, body_path: str | None, meta: dict, body: bytes | None) -> None:
+    with _lock:
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            # Body first: a meta file never points at a missing or older body.
+            if body_path is not None and body is not None:
+                _write_atomic(body_path, body)
+            _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            log.warning("Could not cache %s: %s", meta.get("url"), e)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,183 @@
+"""Shared, thread-safe HTTP client with keep-alive pooling for all services."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..constants import HTTP_CONNECT_TIMEOUT_S, HTTP_MAX_RETRIES, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT_S
+
+
+log = logging.getLogger(__name__)
+
+Timeout = float | tuple[float, float]
+
+
+@dataclass(frozen=True)
+class HttpConfig:
+    pool_connections: int = 8  # number of hosts kept in the pool cache
+    pool_maxsize: int = HTTP_POOL_SIZE  # keep-alive connections per host
+    max_retries: int = HTTP_MAX_RETRIES
+    backoff_factor: float = 0.5
+    connect_timeout_s: float = HTTP_CONNECT_TIMEOUT_S
+    read_timeout_s: float = HTTP_READ_TIMEOUT_S
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self.connect_timeout_s, self.read_timeout_s)
+
+
+@dataclass(frozen=True)
+class RequestTiming:
+    method: str
+    url: str
+    status: int | None
+    elapsed_s: float  # until response headers were received
+    error: str | None = None
+
+
+_lock = threading.Lock()
+_config = HttpConfig()
+_session: requests.Session | None = None
+_timings: deque[RequestTiming] = deque(maxlen=200)
+_prewarm_stop = threading.Event()
+
+
+def configure(config: HttpConfig) -> None:
+    """Replace the pool settings; the next request builds a fresh session."""
+    global _config, _session
+    with _lock:
+        old, _session, _config = _session, None, config
+    if old is not None:
+        old.close()
+
+
+def get_config() -> HttpConfig:
+    return _config
+
+
+def session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build_session(_config)
+        return _session
+
+
+def _build_session(config: HttpConfig) -> requests.Session:
+    retry = Retry(
+        total=config.max_retries,
+        connect=config.max_retries,
+        read=config.max_retries,
+        status=config.max_retries,
+        backoff_factor=config.backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=retry,
+    )
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers["User-Agent"] = "RealmsLauncher"
+    return s
+
+
+def request(method: str, url: str, *, timeout: Timeout | None = None, **kwargs) -> requests.Response:
+    """Issue a request on the shared session with default timeouts and timing."""
+    start = time.perf_counter()
+    try:
+        r = session().request(method, url, timeout=timeout or _config.timeout, **kwargs)
+    except requests.RequestException as e:
+        _record(RequestTiming(method, url, None, time.perf_counter() - start, str(e)))
+        raise
+    _record(RequestTiming(method, url, r.status_code, time.perf_counter() - start))
+    return r
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("allow_redirects", True)
+    return request("HEAD", url, **kwargs)
+
+
+def _record(timing: RequestTiming) -> None:
+    _timings.append(timing)
+    log.debug(
+        "%s %s -> %s in %.0f ms%s",
+        timing.method,
+        timing.url,
+        timing.status,
+        timing.elapsed_s * 1000,
+        f" ({timing.error})" if timing.error else "",
+    )
+
+
+def prewarm(
+    urls: Iterable[str],
+    *,
+    connections: int = 1,
+    keep_warm_s: float = 0.0,
+    refresh_s: float = 30.0,
+) -> threading.Thread:
+    """Open ``connections`` pooled keep-alive connections to each URL's host in the background.
+
+    Each connection is established with a concurrent ``HEAD`` (DNS, TCP and TLS
+    happen now rather than on the first download request). With ``keep_warm_s``
+    the connections are refreshed every ``refresh_s`` seconds for that long, so
+    servers do not close them as idle. ``stop_prewarm()`` ends the refreshing.
+    """
+    by_host: dict[str, str] = {}
+    for url in urls:
+        by_host.setdefault(urlsplit(url).netloc.lower(), url)
+    targets = [u for u in by_host.values() for _ in range(max(1, min(connections, _config.pool_maxsize)))]
+    _prewarm_stop.clear()
+
+    def _run() -> None:
+        deadline = time.monotonic() + keep_warm_s
+        with ThreadPoolExecutor(max_workers=max(1, len(targets)), thread_name_prefix="http-prewarm") as pool:
+            while True:
+                list(pool.map(_touch, targets))
+                if time.monotonic() + refresh_s > deadline or _prewarm_stop.wait(refresh_s):
+                    return
+
+    t = threading.Thread(target=_run, name="http-prewarm", daemon=True)
+    t.start()
+    return t
+
+
+def stop_prewarm() -> None:
+    _prewarm_stop.set()
+
+
+def _touch(url: str) -> None:
+    try:
+        head(url, timeout=_config.timeout).close()
+    except requests.RequestException as e:
+        log.debug("Pre-warming %s failed: %s", url, e)
+
+
+def recent_timings(host: str | None = None) -> list[RequestTiming]:
+    """Most recent request timings (oldest first), optionally for one host."""
+    items = list(_timings)
+    if host is None:
+        return items
+    return [t for t in items if urlsplit(t.url).hostname == host]
@@ -1,17 +1,26 @@
 from __future__ import annotations
 
+import logging
 import os
 import stat
 import shutil
-from collections.abc import Callable
-from zipfile import ZipFile
+from collections.abc import Callable, Sequence
+from zipfile import BadZipFile, ZipFile, ZipInfo
 
-import requests
+from ..constants import DOWNLOAD_SEGMENTS
+from ..util.errors import InstallError
+from . import download, download_scheduler, package_cache, remote_zip, zip_stream
+from .download_scheduler import Priority
 
 
+log = logging.getLogger(__name__)
+
 StatusCallback = Callable[[str], None]
 ProgressCallback = Callable[[int, int], None]  # received, total
 
+# Byte spans of selected members closer than this are fetched as one request.
+REMOTE_COALESCE_GAP = 64 << 10
+
 
 def _remove_readonly(func, path, _exc_info):
     """Error handler for shutil.rmtree: clear read-only flag and retry."""
@@ -50,29 +59,202 @@ def download_and_install_zip(
     zip_path: str,
     temp_extract_dir: str,
     prefer_folder: str | None = None,
+    segments: int = DOWNLOAD_SEGMENTS,
+    resumable: bool = False,
+    streaming: bool = False,
+    expected_digest: download.ExpectedDigest | None = None,
+    mirrors: Sequence[str] = (),
+    use_cache: bool = False,
+    priority: Priority = Priority.INTERACTIVE,
     on_status: StatusCallback | None = None,
     on_progress: ProgressCallback | None = None,
 ) -> None:
-    """Download a zip and overlay its contents into dest_dir."""
-    if on_status:
-        on_status("Downloading package...")
-
-    r = requests.get(download_url, stream=True)
-    r.raise_for_status()
-    total = int(r.headers.get("content-length", 0) or 0)
-    received = 0
-    with open(zip_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=1024):
-            if not chunk:
-                continue
-            f.write(chunk)
-            received += len(chunk)
-            if on_progress:
-                on_progress(received, total)
-
-    if on_status:
-        on_status("Extracting package...")
+    """Download a zip and overlay its contents into dest_dir.
+
+    The download is split into ``segments`` parallel Range requests when the
+    server supports it (see ``download.download_segmented``). With ``resumable``
+    a failed download keeps ``zip_path + ".part"`` and its sidecar so the next
+    call continues from the bytes already on disk.
+
+    With ``streaming`` members are extracted straight into dest_dir while the
+    archive is still downloading (see ``zip_stream.stream_install_zip``); servers
+    without Range support fall back to the regular download-then-extract path.
+
+    ``expected_digest`` (from the published package metadata) is verified while
+    downloading; a mismatch raises ``IntegrityError`` before extraction starts.
+
+    ``mirrors`` is the ordered list of equivalent URLs to download from (see
+    ``mirror_service.ranked_urls``); the streaming mode uses the first one.
+
+    With ``use_cache`` a copy in ``package_cache`` that still matches the server
+    is extracted instead of downloading, and a fresh download is kept in the
+    cache after a successful install rather than deleted.
+
+    The transfer runs as a ``download_scheduler`` job at ``priority``; resumable
+    background downloads give way to interactive ones and continue afterwards.
+    """
+    cached = package_cache.lookup(download_url, expected_digest=expected_digest) if use_cache else None
+    if cached is not None:
+        if on_status:
+            on_status("Using cached package...")
+        try:
+            _extract_and_overlay(cached, dest_dir, temp_extract_dir, prefer_folder)
+        except BadZipFile:
+            # Corrupt cache entry: forget it and download normally.
+            package_cache.discard(cached)
+        else:
+            return
+
+    def _finish(succeeded: bool) -> None:
+        if not os.path.exists(zip_path):
+            return
+        if succeeded and use_cache:
+            package_cache.store(zip_path, download_url, expected_digest=expected_digest)
+            return
+        try:
+            os.remove(zip_path)
+        except Exception:
+            pass
+
+    def _install(job: download_scheduler.DownloadJob) -> None:
+        if streaming:
+            if on_status:
+                on_status("Downloading and extracting package...")
+            try:
+                streamed = zip_stream.stream_install_zip(
+                    mirrors[0] if mirrors else download_url,
+                    zip_path,
+                    dest_dir,
+                    prefer_folder=prefer_folder,
+                    expected_digest=expected_digest,
+                    limiter=job.limiter,
+                    on_progress=job.wrap(on_progress),
+                )
+            except BaseException:
+                _finish(False)
+                raise
+            if streamed:
+                _finish(True)
+                return
+
+        if on_status:
+            on_status("Downloading package...")
+
+        try:
+            download.download_segmented(
+                download_url,
+                zip_path,
+                segments=segments,
+                resumable=resumable,
+                expected_digest=expected_digest,
+                mirrors=mirrors,
+                limiter=job.limiter,
+                on_progress=job.wrap(on_progress),
+            )
+        except BaseException:
+            # A non-resumable download preallocates zip_path to the full size;
+            # resumable ones keep their progress in zip_path + ".part".
+            _finish(False)
+            raise
+
+        if on_status:
+            on_status("Extracting package...")
+
+        succeeded = False
+        try:
+            _extract_and_overlay(zip_path, dest_dir, temp_extract_dir, prefer_folder)
+            succeeded = True
+        finally:
+            _finish(succeeded)
+
+    # The slot is held until the zip is extracted and cached, so a preempted
+    # background job for the same package finds it in the cache when it resumes.
+    download_scheduler.run(_install, url=download_url, priority=priority, preemptible=resumable and not streaming)
 
+
+def list_remote_zip(url: str, *, timeout_s: float = 30.0) -> list[ZipInfo]:
+    """Read a remote package's directory via Range requests, without downloading it."""
+    with ZipFile(remote_zip.RemoteFile(url, timeout_s=timeout_s)) as zf:
+        return zf.infolist()
+
+
+def extract_remote_members(
+    url: str,
+    dest_dir: str,
+    names: Sequence[str],
+    *,
+    prefer_folder: str | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+    on_status: StatusCallback | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> list[str]:
+    """Extract only the given members of a remote zip into dest_dir; returns what was written.
+
+    ``names`` are paths relative to the folder ``download_and_install_zip`` would
+    overlay (same ``prefer_folder`` rules); a name ending in "/" selects that whole
+    subtree. Only the central directory and the selected members' bytes are
+    fetched, with nearby members coalesced into single Range requests. Raises
+    ``DownloadError`` if the server cannot serve ranges.
+    """
+
+    def _extract(job: download_scheduler.DownloadJob) -> list[str]:
+        if on_status:
+            on_status("Reading package index...")
+        remote = remote_zip.RemoteFile(url, limiter=job.limiter)
+        with ZipFile(remote) as zf:
+            infos = zf.infolist()
+            root = zip_stream.member_root([i.filename for i in infos], prefer_folder)
+            selected = [i for i in infos if _selects(i.filename, root, names)]
+            missing = [n for n in names if not any(_selects(i.filename, root, [n]) for i in infos)]
+            if missing:
+                raise InstallError(f"Not in package: {', '.join(missing)}")
+
+            if on_status:
+                on_status("Extracting package files...")
+            total = sum(i.compress_size for i in selected)
+            done = 0
+            report = job.wrap(on_progress)
+            for start, end in _member_spans(infos, selected, zf.start_dir):
+                remote.prefetch(start, end)
+            for info in selected:
+                zip_stream.extract_member(zf, info, root, dest_dir)
+                done += info.compress_size
+                report(done, total)
+        log.info(
+            "Extracted %d members of %s with %d range requests (%d of %d bytes)",
+            len(selected),
+            url,
+            remote.requests,
+            remote.bytes_fetched,
+            remote.size,
+        )
+        return [i.filename[len(root) :] for i in selected]
+
+    return download_scheduler.run(_extract, url=url, priority=priority)
+
+
+def _selects(filename: str, root: str, names: Sequence[str]) -> bool:
+    if not filename.startswith(root):
+        return False
+    rel = filename[len(root) :]
+    return any(rel == n or (n.endswith("/") and rel.startswith(n)) for n in names)
+
+
+def _member_spans(infos: list[ZipInfo], selected: list[ZipInfo], start_dir: int) -> list[tuple[int, int]]:
+    """Byte ranges covering the selected members (local header + data), merged when close."""
+    offsets = sorted({i.header_offset for i in infos} | {start_dir})
+    following = dict(zip(offsets, offsets[1:]))
+    spans: list[tuple[int, int]] = []
+    for info in sorted(selected, key=lambda i: i.header_offset):
+        start, end = info.header_offset, following.get(info.header_offset, start_dir)
+        if spans and start - spans[-1][1] < REMOTE_COALESCE_GAP:
+            spans[-1] = (spans[-1][0], max(end, spans[-1][1]))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _extract_and_overlay(zip_path: str, dest_dir: str, temp_extract_dir: str, prefer_folder: str | None) -> None:
     robust_rmtree(temp_extract_dir)
     os.makedirs(temp_extract_dir, exist_ok=True)
 
@@ -112,9 +294,4 @@ def download_and_install_zip(
             robust_rmtree(temp_extract_dir)
         except Exception:
             pass
-        try:
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-        except Exception:
-            pass
 
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import logging
 import os
-import pathlib
+import posixpath
 import tempfile
 import time
 from collections.abc import Callable
+from typing import BinaryIO
 from zipfile import ZipFile
 
 import ctypes
+import requests
 
-from ..constants import USE_ELEVATED_UPDATER
+from ..constants import LAUNCHER_DIFF_UPDATES, LAUNCHER_ZIP_URL, USE_ELEVATED_UPDATER
 from ..util.runtime import (
     can_write_to_dir,
     is_frozen,
@@ -17,84 +20,263 @@ from ..util.runtime import (
     launcher_path,
     start_detached,
 )
+from . import download, download_scheduler, file_hashes, manifest_service, mirror_service, zip_stream
 from .updater_scripts import write_updater_cmd, write_updater_ps1
+from .version_service import ManifestInfo, RemoteVersionInfo
 
 
 StatusCallback = Callable[[str], None]
 ProgressCallback = Callable[[float], None]  # 0-100
 
+log = logging.getLogger(__name__)
+
+# Launcher zips up to this size are downloaded and indexed in memory.
+SPOOL_MAX_BYTES = 64 << 20
+
+# Written next to the staging folder by a differential update: the files the
+# updater copies, relative to launcher_dir(), one per line.
+FILE_LIST_NAME = "update_files.txt"
+
+
+def _download_cache_dir() -> str:
+    """Stable folder for the launcher zip so an interrupted download can resume."""
+    path = os.path.join(tempfile.gettempdir(), "realms_launcher_downloads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def stage_launcher_update(
+    info: RemoteVersionInfo | None,
+    *,
+    on_status: StatusCallback | None = None,
+    on_progress_pct: ProgressCallback | None = None,
+) -> tuple[str, str | None] | None:
+    """Stage the launcher update; returns (staged_dir, file_list) for ``spawn_updater_and_quit``.
+
+    Stages only the changed files when a launcher manifest is published
+    (``stage_changed_files``), else or if that fails the whole launcher zip
+    (``file_list`` is then None). Returns None when the manifest shows the
+    launcher files already match, so there is nothing to hand to the updater.
+    """
+    manifest = info.launcher_manifest if info is not None and LAUNCHER_DIFF_UPDATES else None
+    if manifest is not None:
+        try:
+            return stage_changed_files(manifest, on_status=on_status, on_progress_pct=on_progress_pct)
+        except Exception as e:
+            log.warning("Differential launcher update failed (%s); downloading the full launcher", e)
+    staged_dir = download_and_stage_zip(
+        LAUNCHER_ZIP_URL,
+        expected_digest=info.expected_digest(LAUNCHER_ZIP_URL) if info else None,
+        mirrors=info.mirrors_for(LAUNCHER_ZIP_URL) if info else (),
+        on_status=on_status,
+        on_progress_pct=on_progress_pct,
+    )
+    return staged_dir, None
+
+
+def stage_changed_files(
+    info: ManifestInfo,
+    *,
+    target_dir: str | None = None,
+    on_status: StatusCallback | None = None,
+    on_progress_pct: ProgressCallback | None = None,
+) -> tuple[str, str] | None:
+    """Download the launcher files that differ from the published manifest into a staging folder.
+
+    target_dir (default ``launcher_dir()``) is compared file by file with the
+    manifest (hashes cached in ``file_hashes``); files it does not list are left
+    alone. Large files are rebuilt from their local copy where block sums are
+    published. Returns (staged_dir, file_list) where file_list names the staged
+    files, so the updater copies exactly those, or None when no file differs.
+    """
+    target_dir = target_dir or launcher_dir()
+    if on_status:
+        on_status("Checking launcher files...")
+    manifest = manifest_service.fetch_manifest(info)
+    plan = manifest_service.plan_sync(target_dir, manifest)
+    if not plan.fetch:
+        log.info("Launcher files already match manifest %s", manifest.version)
+        return None
+    log.info("Launcher update %s: %s", manifest.version, plan.summary())
+
+    temp_root = tempfile.mkdtemp(prefix="realms_launcher_update_")
+    staged_dir = os.path.join(temp_root, "staged", "launcher")
+    total = plan.fetch_bytes
+
+    def _fetch(job: download_scheduler.DownloadJob) -> None:
+        # Called again after a preemption: files staged by the earlier run are kept.
+        done = 0
+        for f in plan.fetch:
+
+            def _progress(got: int, _total: int, done: int = done) -> None:
+                if on_progress_pct and total:
+                    on_progress_pct((done + got) * 100 / total)
+
+            rel = f.path.split("/")
+            dest = os.path.join(staged_dir, *rel)
+            if not _is_staged(dest, f):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                manifest_service.fetch_file(manifest, f, os.path.join(target_dir, *rel), dest, job, job.wrap(_progress))
+                file_hashes.remember(dest, f.sha256)
+            done += f.size
+
+    if on_status:
+        on_status(f"Downloading {len(plan.fetch)} changed launcher file(s)...")
+    if on_progress_pct:
+        on_progress_pct(0)
+    download_scheduler.run(
+        _fetch,
+        url=manifest.url_for(plan.fetch[0]),
+        label="launcher update",
+        priority=download_scheduler.Priority.BACKGROUND,
+        preemptible=True,
+    )
+
+    file_list = os.path.join(temp_root, FILE_LIST_NAME)
+    with open(file_list, "w", encoding="utf-8") as fh:
+        fh.writelines(f.path.replace("/", os.sep) + "\n" for f in plan.fetch)
+    return staged_dir, file_list
+
 
 def download_and_stage_zip(
     url: str,
     *,
+    expected_digest: download.ExpectedDigest | None = None,
+    mirrors: tuple[str, ...] = (),
     on_status: StatusCallback | None = None,
     on_progress_pct: ProgressCallback | None = None,
 ) -> str:
     """Download and extract update zip into a staging folder.
 
-    Returns the folder that contains the launcher files to copy.
+    Returns the folder that contains the launcher files to copy. When
+    ``expected_digest`` is given the zip is verified while it downloads and
+    nothing is staged on a mismatch.
+
+    Zips up to ``SPOOL_MAX_BYTES`` are downloaded into memory; larger ones (or
+    when the size is unknown) go through the resumable on-disk download. Either
+    way only the members in the folder holding the launcher exe are extracted.
     """
     temp_root = tempfile.mkdtemp(prefix="realms_launcher_update_")
-    zip_path = os.path.join(temp_root, "update.zip")
+    staged_dir = os.path.join(temp_root, "staged", "launcher")
+    zip_path = os.path.join(_download_cache_dir(), "update.zip")
+    exe_basename = os.path.basename(launcher_path()) if is_frozen() else "realms_launcher.exe"
 
     if on_status:
         on_status("Downloading launcher update...")
     if on_progress_pct:
         on_progress_pct(0)
 
-    import requests
-
-    r = requests.get(url, stream=True)
-    r.raise_for_status()
-    total = int(r.headers.get("content-length", 0) or 0)
-    got = 0
-    with open(zip_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=1 << 14):
-            if not chunk:
-                continue
-            f.write(chunk)
-            got += len(chunk)
-            if on_progress_pct and total:
-                on_progress_pct(got * 100 / total)
+    def _on_progress(got: int, total: int) -> None:
+        if on_progress_pct and total:
+            on_progress_pct(got * 100 / total)
 
-    if on_status:
-        on_status("Staging launcher update...")
+    ranked = mirror_service.ranked_urls(url, mirrors)
 
-    staged_dir = os.path.join(temp_root, "staged")
-    os.makedirs(staged_dir, exist_ok=True)
-    with ZipFile(zip_path, "r") as zf:
-        zf.extractall(staged_dir)
+    def _fetch(job: download_scheduler.DownloadJob) -> None:
+        try:
+            size = download.probe_url(ranked[0], max_age_s=download.PROBE_REUSE_S).size
+        except requests.RequestException:
+            size = 0
+        if 0 < size <= SPOOL_MAX_BYTES:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as buf:
+                _download_spooled(ranked, buf, expected_digest, job, _on_progress)
+                if on_status:
+                    on_status("Staging launcher update...")
+                with ZipFile(buf, "r") as zf:
+                    _extract_launcher_files(zf, staged_dir, exe_basename)
+            return
 
-    # If zip contains a top-level folder, descend into it
-    entries = list(pathlib.Path(staged_dir).iterdir())
-    if len(entries) == 1 and entries[0].is_dir():
-        staged_dir = str(entries[0])
-
-    # If update zip contains nested folders, find folder containing the exe
-    try:
-        exe_basename = (
-            os.path.basename(launcher_path()) if is_frozen() else "realms_launcher.exe"
+        # Resumable: a failed or interrupted download leaves update.zip.part behind
+        # in the stable cache dir and the next attempt continues from there (which
+        # also lets a mod install preempt it).
+        download.download_segmented(
+            url,
+            zip_path,
+            segments=1,
+            resumable=True,
+            expected_digest=expected_digest,
+            mirrors=ranked,
+            limiter=job.limiter,
+            on_progress=job.wrap(_on_progress),
         )
-        found_parent = None
-        for root, _dirs, files in os.walk(staged_dir):
-            if exe_basename in files:
-                found_parent = root
-                break
-        if found_parent and os.path.normpath(found_parent) != os.path.normpath(staged_dir):
-            staged_dir = found_parent
-    except Exception:
-        pass
+        if on_status:
+            on_status("Staging launcher update...")
+        try:
+            with ZipFile(zip_path, "r") as zf:
+                _extract_launcher_files(zf, staged_dir, exe_basename)
+        finally:
+            try:
+                os.remove(zip_path)
+            except OSError:
+                pass
 
+    download_scheduler.run(
+        _fetch,
+        url=url,
+        label="launcher update",
+        priority=download_scheduler.Priority.BACKGROUND,
+        preemptible=True,
+    )
     return staged_dir
 
 
+def _download_spooled(
+    urls: list[str],
+    buf: BinaryIO,
+    expected_digest: download.ExpectedDigest | None,
+    job: download_scheduler.DownloadJob,
+    on_progress: Callable[[int, int], None],
+) -> None:
+    """Download into buf, resuming on the next mirror when a connection fails."""
+    buf.seek(0)
+    buf.truncate()
+    download.download_to_fileobj(
+        urls[0],
+        buf,
+        expected_digest=expected_digest,
+        mirrors=urls,
+        limiter=job.limiter,
+        on_progress=job.wrap(on_progress),
+    )
+    buf.seek(0)
+
+
+def _extract_launcher_files(zf: ZipFile, dest_dir: str, exe_basename: str) -> None:
+    """Extract the folder holding exe_basename (found via the zip index) into dest_dir.
+
+    Without the exe, a single top-level folder is descended into, as before.
+    """
+    names = zf.namelist()
+    exes = sorted((n for n in names if posixpath.basename(n) == exe_basename), key=lambda n: n.count("/"))
+    if exes:
+        root = posixpath.dirname(exes[0])
+        root = root + "/" if root else ""
+    else:
+        root = zip_stream.member_root(names, None)
+    os.makedirs(dest_dir, exist_ok=True)
+    for member in zf.infolist():
+        zip_stream.extract_member(zf, member, root, dest_dir)
+
+
+def _is_staged(path: str, f: manifest_service.ManifestFile) -> bool:
+    try:
+        return os.path.getsize(path) == f.size and file_hashes.sha256_of(path) == f.sha256
+    except OSError:
+        return False
+
+
 def spawn_updater_and_quit(
     *,
     staged_dir: str,
     quit_callback: Callable[[], None],
+    file_list: str | None = None,
     on_status: StatusCallback | None = None,
 ) -> None:
-    """Write updater scripts, launch updater (elevated if needed), then quit."""
+    """Write updater scripts, launch updater (elevated if needed), then quit.
+
+    With ``file_list`` (see ``stage_changed_files``) the updater copies only the
+    listed files instead of mirroring the whole staging folder.
+    """
     temp_root = os.path.dirname(os.path.dirname(staged_dir))  # parent of 'staged'
     ps1_path = os.path.join(temp_root, "do_update.ps1")
     cmd_path = os.path.join(temp_root, "do_update.cmd")
@@ -132,6 +314,7 @@ def spawn_updater_and_quit(
         relaunch_args,
         relaunch_cwd,
         log_path,
+        file_list or "",
     ]
 
     def _quote_arg(arg: str) -> str:
@@ -0,0 +1,375 @@
+"""Per-file manifest sync: bring realms/ to a published version by fetching only what changed.
+
+A manifest lists every file of one mod version:
+
+    {"format": 1, "version": "0.8.6", "objects": "https://.../objects/",
+     "files": [{"path": "data/ini.big", "size": 123, "sha256": "..."}, ...]}
+
+Files are downloaded from ``objects`` by content hash (``<objects>ab/abcdef...``)
+unless an entry carries its own ``url``. An entry may also name a ``zsync``
+block-sums URL, letting a changed large file be rebuilt from its local copy.
+``plan_sync`` compares a manifest with the local tree and returns a ``SyncPlan``
+that can be inspected before ``apply_sync`` downloads and deletes anything.
+The ``publisher`` package writes these manifests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import requests
+
+from ..constants import MANIFEST_SYNC_WORKERS, ZSYNC_UPDATES
+from ..util.errors import DownloadError, InstallError, IntegrityError
+from . import download, download_scheduler, file_hashes, http_cache, mirror_service, zsync_service
+from .download import ExpectedDigest
+from .version_service import ManifestInfo
+
+
+log = logging.getLogger(__name__)
+
+StatusCallback = Callable[[str], None]
+ProgressCallback = Callable[[int, int], None]  # received, total
+
+MANIFEST_FORMAT = 1
+
+# The manifest last applied is kept in realms/, so the next sync knows which
+# files that version owned (and may delete when a later version drops them).
+LOCAL_MANIFEST_NAME = "realms_manifest.json"
+
+# Downloads land next to their target and are swapped in once all are verified.
+NEW_SUFFIX = ".sync-new"
+
+# Files at least this large are fetched with segmented, resumable downloads.
+LARGE_FILE_BYTES = 2 * download.MIN_SEGMENT_SIZE
+
+
+@dataclass(frozen=True)
+class ManifestFile:
+    path: str  # relative to realms/, "/"-separated
+    size: int
+    sha256: str
+    url: str | None = None
+    zsync: str | None = None  # block sums URL (see zsync_service)
+
+
+@dataclass(frozen=True)
+class Manifest:
+    version: str
+    files: dict[str, ManifestFile]
+    objects_url: str = ""
+
+    def url_for(self, f: ManifestFile) -> str:
+        if f.url:
+            return f.url
+        if not self.objects_url:
+            raise InstallError(f"Manifest {self.version} has no download location for {f.path}")
+        return f"{self.objects_url}{f.sha256[:2]}/{f.sha256}"
+
+    def to_json(self) -> dict:
+        return {
+            "format": MANIFEST_FORMAT,
+            "version": self.version,
+            "objects": self.objects_url,
+            "files": [
+                {
+                    "path": f.path,
+                    "size": f.size,
+                    "sha256": f.sha256,
+                    **({"url": f.url} if f.url else {}),
+                    **({"zsync": f.zsync} if f.zsync else {}),
+                }
+                for f in self.files.values()
+            ],
+        }
+
+
+@dataclass(frozen=True)
+class SyncPlan:
+    """What ``apply_sync`` would do; nothing has been changed yet."""
+
+    version: str
+    fetch: tuple[ManifestFile, ...]
+    delete: tuple[str, ...]
+    unchanged: int
+
+    @property
+    def fetch_bytes(self) -> int:
+        return sum(f.size for f in self.fetch)
+
+    @property
+    def empty(self) -> bool:
+        return not self.fetch and not self.delete
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.fetch)} file(s) to download ({self.fetch_bytes / (1 << 20):.1f} MiB), "
+            f"{len(self.delete)} to delete, {self.unchanged} unchanged"
+        )
+
+
+def parse_manifest(data: dict) -> Manifest:
+    if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+        raise InstallError("Unsupported manifest format")
+    files: dict[str, ManifestFile] = {}
+    for raw in data.get("files") or ():
+        try:
+            f = ManifestFile(
+                str(raw["path"]),
+                int(raw["size"]),
+                str(raw["sha256"]).lower(),
+                raw.get("url") or None,
+                raw.get("zsync") or None,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise InstallError(f"Invalid manifest entry: {raw!r}") from e
+        files[f.path] = f
+    objects = str(data.get("objects") or "")
+    if objects and not objects.endswith("/"):
+        objects += "/"
+    return Manifest(str(data.get("version", "")), files, objects)
+
+
+def fetch_manifest(info: ManifestInfo, *, timeout_s: float = 30.0) -> Manifest:
+    """Download (or revalidate a cached copy of) a published manifest and check its digest."""
+    r = http_cache.fetch(info.url, timeout_s=timeout_s)
+    if info.sha256:
+        actual = hashlib.sha256(r.body).hexdigest()
+        if actual != info.sha256.lower():
+            raise IntegrityError(f"sha256 mismatch for {info.url}: expected {info.sha256}, got {actual}")
+    return parse_manifest(r.json())
+
+
+def load_local_manifest(realms_folder: str) -> Manifest | None:
+    try:
+        with open(os.path.join(realms_folder, LOCAL_MANIFEST_NAME), encoding="utf-8") as f:
+            return parse_manifest(json.load(f))
+    except (OSError, ValueError, InstallError):
+        return None
+
+
+def plan_sync(
+    realms_folder: str,
+    target: Manifest,
+    *,
+    previous: Manifest | None = None,
+    skip: Sequence[str] = (),
+    verify: bool = False,
+) -> SyncPlan:
+    """Compare realms_folder with target and list the files to fetch and delete.
+
+    Missing files and files of a different size are fetched. Same-size files are
+    hashed (cached by size and mtime in ``file_hashes``), except that without
+    ``verify`` a file the ``previous`` manifest already listed with the same
+    digest is trusted. Files ``previous`` lists that target dropped are deleted;
+    without a previous manifest nothing is deleted, since unknown files may be
+    the user's. Paths under a ``skip`` prefix are ignored entirely.
+    """
+    skip = tuple(p.lower() for p in skip)
+    fetch: list[ManifestFile] = []
+    to_hash: dict[str, ManifestFile] = {}
+    unchanged = 0
+    for f in target.files.values():
+        if f.path.lower().startswith(skip):
+            continue
+        local = _target_path(realms_folder, f.path)
+        try:
+            size = os.path.getsize(local)
+        except OSError:
+            fetch.append(f)
+            continue
+        if size != f.size:
+            fetch.append(f)
+        elif not verify and previous is not None and _same_digest(previous, f):
+            unchanged += 1
+        else:
+            to_hash[local] = f
+
+    hashes = file_hashes.hash_files(to_hash)
+    for local, f in to_hash.items():
+        if hashes.get(local) == f.sha256:
+            unchanged += 1
+        else:
+            fetch.append(f)
+
+    delete: list[str] = []
+    if previous is not None:
+        for path in previous.files:
+            if path in target.files or path.lower().startswith(skip):
+                continue
+            if os.path.isfile(_target_path(realms_folder, path)):
+                delete.append(path)
+
+    fetch.sort(key=lambda f: f.path)
+    return SyncPlan(target.version, tuple(fetch), tuple(sorted(delete)), unchanged)
+
+
+def apply_sync(
+    realms_folder: str,
+    target: Manifest,
+    plan: SyncPlan,
+    *,
+    workers: int = MANIFEST_SYNC_WORKERS,
+    on_status: StatusCallback | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> None:
+    """Download the planned files concurrently, then swap them in and delete the dropped ones.
+
+    Every file is checked against its manifest digest while it downloads, and no
+    file in realms_folder changes until all downloads succeeded; verified
+    downloads are kept next to their target, so a retry after a failure only
+    fetches what is still missing. Finally target is saved as the local manifest.
+    """
+
+    def _sync(job: download_scheduler.DownloadJob) -> list[tuple[str, str, ManifestFile]]:
+        total = plan.fetch_bytes
+        received: dict[str, int] = {}
+        lock = threading.Lock()
+
+        def _fetch(f: ManifestFile) -> tuple[str, str, ManifestFile]:
+            final = _target_path(realms_folder, f.path)
+            tmp = final + NEW_SUFFIX
+
+            def _progress(n: int, _total: int) -> None:
+                with lock:
+                    received[f.path] = n
+
+            if not (os.path.isfile(tmp) and file_hashes.sha256_file(tmp) == f.sha256):
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                fetch_file(target, f, final, tmp, job, _progress)
+            _progress(f.size, f.size)
+            return tmp, final, f
+
+        report = job.wrap(on_progress)
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sync") as pool:
+            futures = [pool.submit(_fetch, f) for f in plan.fetch]
+            pending = set(futures)
+            try:
+                while pending:
+                    finished, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                    for fut in finished:
+                        fut.result()
+                    with lock:
+                        done = sum(received.values())
+                    report(done, total)
+            except BaseException:
+                for fut in pending:
+                    fut.cancel()
+                raise
+        return [fut.result() for fut in futures]
+
+    if plan.fetch:
+        if on_status:
+            on_status(f"Downloading {len(plan.fetch)} changed file(s)...")
+        staged = download_scheduler.run(_sync, url=target.url_for(plan.fetch[0]), label=f"sync {plan.version}")
+    else:
+        staged = []
+
+    if on_status:
+        on_status("Applying changed files...")
+    for tmp, final, f in staged:
+        _make_writable(final)
+        os.replace(tmp, final)
+        file_hashes.remember(final, f.sha256)
+    for path in plan.delete:
+        local = _target_path(realms_folder, path)
+        if os.path.isfile(local):
+            _make_writable(local)
+            os.remove(local)
+    file_hashes.save()
+    _save_local_manifest(realms_folder, target)
+    log.info("Synced %s to manifest %s: %s", realms_folder, plan.version, plan.summary())
+
+
+def fetch_file(
+    target: Manifest,
+    f: ManifestFile,
+    local: str,
+    dest: str,
+    job: download_scheduler.DownloadJob,
+    on_progress: ProgressCallback,
+) -> None:
+    """Write f to dest, rebuilt from local's matching blocks when possible, else downloaded whole; verified."""
+    if not _zsync(target.url_for(f), local, dest, f, job, on_progress):
+        _download(target.url_for(f), dest, f, job, on_progress)
+
+
+def _download(url: str, dest: str, f: ManifestFile, job: download_scheduler.DownloadJob, on_progress) -> None:
+    digest = ExpectedDigest("sha256", f.sha256)
+    urls = mirror_service.ranked_urls(url)
+    if f.size >= LARGE_FILE_BYTES:
+        download.download_segmented(
+            url,
+            dest,
+            resumable=True,
+            expected_digest=digest,
+            mirrors=urls,
+            limiter=job.limiter,
+            on_progress=on_progress,
+        )
+        return
+    download.download_to_file(
+        url, dest, expected_digest=digest, mirrors=urls, limiter=job.limiter, on_progress=on_progress
+    )
+
+
+def _zsync(url: str, local: str, dest: str, f: ManifestFile, job: download_scheduler.DownloadJob, on_progress) -> bool:
+    """Rebuild f from the local copy's matching blocks; False if not possible (download it whole)."""
+    if not (ZSYNC_UPDATES and f.zsync and os.path.isfile(local)):
+        return False
+    try:
+        zsync_service.zsync_file(
+            local,
+            url,
+            zsync_service.fetch_block_sums(f.zsync),
+            dest,
+            sha256=f.sha256,
+            mirrors=mirror_service.ranked_urls(url),
+            limiter=job.limiter,
+            on_progress=on_progress,
+        )
+    except (requests.RequestException, DownloadError, OSError) as e:
+        log.info("zsync of %s failed (%s); downloading it whole", f.path, e)
+        return False
+    return True
+
+
+def _same_digest(manifest: Manifest, f: ManifestFile) -> bool:
+    old = manifest.files.get(f.path)
+    return old is not None and old.sha256 == f.sha256 and old.size == f.size
+
+
+def _save_local_manifest(realms_folder: str, manifest: Manifest) -> None:
+    path = os.path.join(realms_folder, LOCAL_MANIFEST_NAME)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest.to_json(), fh)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Could not save %s: %s", path, e)
+
+
+def _target_path(realms_folder: str, rel: str) -> str:
+    root = os.path.abspath(realms_folder)
+    target = os.path.abspath(os.path.join(root, *rel.split("/")))
+    if os.path.commonpath([root, target]) != root or target == root:
+        raise InstallError(f"Unsafe path in manifest: {rel}")
+    return target
+
+
+def _make_writable(path: str) -> None:
+    """Clear a read-only flag (Windows) so the file can be replaced or removed."""
+    if os.path.exists(path) and not os.access(path, os.W_OK):
+        try:
+            os.chmod(path, stat.S_IWRITE)
+        except OSError:
+            pass
@@ -0,0 +1,152 @@
+"""Mirror selection: expand package URLs to equivalent endpoints and rank them."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+
+from ..constants import MIRROR_PROBE_TTL_S, PACKAGE_MIRROR_BASES
+from . import http_client
+
+
+log = logging.getLogger(__name__)
+
+# Bytes fetched per probe, and the transfer size used to turn latency and
+# throughput into a single "expected seconds" score.
+PROBE_SAMPLE_BYTES = 256 << 10
+SCORE_TRANSFER_BYTES = 8 << 20
+
+
+@dataclass(frozen=True)
+class MirrorProbe:
+    url: str
+    ok: bool
+    latency_s: float = 0.0  # time to response headers
+    throughput_bps: float = 0.0  # body bytes per second for the sample
+    error: str | None = None
+    probed_at: float = 0.0
+
+    @property
+    def score(self) -> float:
+        """Expected seconds for a typical transfer (lower is better)."""
+        if not self.ok:
+            return float("inf")
+        if self.throughput_bps <= 0:
+            return self.latency_s
+        return self.latency_s + SCORE_TRANSFER_BYTES / self.throughput_bps
+
+
+_lock = threading.Lock()
+_probes: dict[str, MirrorProbe] = {}  # keyed by host
+
+
+def candidate_urls(url: str, published: Sequence[str] = ()) -> list[str]:
+    """All URLs that should serve the same file as url.
+
+    Mirrors published in version.json win; otherwise url is rewritten onto every
+    base in ``PACKAGE_MIRROR_BASES`` that it starts with one of.
+    """
+    if published:
+        return list(dict.fromkeys([url, *published]))
+    for base in PACKAGE_MIRROR_BASES:
+        if url.startswith(base):
+            rel = url[len(base) :]
+            return list(dict.fromkeys([url, *(b + rel for b in PACKAGE_MIRROR_BASES)]))
+    return [url]
+
+
+def probe(url: str, *, timeout_s: float = 5.0) -> MirrorProbe:
+    """Measure latency and a short throughput sample with a ranged GET."""
+    start = time.perf_counter()
+    try:
+        headers = {"Range": f"bytes=0-{PROBE_SAMPLE_BYTES - 1}"}
+        with http_client.get(url, headers=headers, stream=True, timeout=timeout_s) as r:
+            r.raise_for_status()
+            latency = time.perf_counter() - start
+            body_start = time.perf_counter()
+            got = 0
+            for chunk in r.iter_content(chunk_size=1 << 14):
+                got += len(chunk)
+                if got >= PROBE_SAMPLE_BYTES:
+                    break
+            body_s = time.perf_counter() - body_start
+    except requests.RequestException as e:
+        result = MirrorProbe(url, False, error=str(e), probed_at=time.time())
+    else:
+        throughput = got / body_s if body_s > 0 and got else 0.0
+        result = MirrorProbe(url, True, latency, throughput, probed_at=time.time())
+
+    with _lock:
+        _probes[_host(url)] = result
+    log.info(
+        "Mirror probe %s: ok=%s latency=%.0f ms throughput=%.0f KiB/s",
+        url,
+        result.ok,
+        result.latency_s * 1000,
+        result.throughput_bps / 1024,
+    )
+    return result
+
+
+def probe_all(urls: Iterable[str], *, timeout_s: float = 5.0) -> list[MirrorProbe]:
+    """Probe urls concurrently; returns results best first."""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="mirror-probe") as pool:
+        results = list(pool.map(lambda u: probe(u, timeout_s=timeout_s), urls))
+    return sorted(results, key=lambda p: p.score)
+
+
+def probe_in_background(urls: Iterable[str]) -> threading.Thread:
+    """Start a startup probe so ranking is ready before the first download."""
+    urls = list(urls)
+    t = threading.Thread(target=probe_all, args=(urls,), name="mirror-probe", daemon=True)
+    t.start()
+    return t
+
+
+def ranked_urls(url: str, published: Sequence[str] = ()) -> list[str]:
+    """Candidate mirrors for url, fastest healthy host first.
+
+    Uses cached probe results per host (``MIRROR_PROBE_TTL_S``) and probes the
+    hosts it has no fresh result for. Unhealthy mirrors are moved to the end
+    rather than dropped, so the download can still try them as a last resort.
+    """
+    candidates = candidate_urls(url, published)
+    if len(candidates) == 1:
+        return candidates
+
+    now = time.time()
+    with _lock:
+        stale = [u for u in candidates if _fresh(_probes.get(_host(u)), now) is None]
+    if stale:
+        probe_all(stale)
+
+    with _lock:
+        scores = {u: _probes[_host(u)].score if _host(u) in _probes else float("inf") for u in candidates}
+    order = sorted(candidates, key=lambda u: (scores[u], candidates.index(u)))
+    log.info("Mirror order for %s: %s", url, order)
+    return order
+
+
+def last_probes() -> list[MirrorProbe]:
+    with _lock:
+        return sorted(_probes.values(), key=lambda p: p.score)
+
+
+def _fresh(p: MirrorProbe | None, now: float) -> MirrorProbe | None:
+    if p is None or now - p.probed_at > MIRROR_PROBE_TTL_S:
+        return None
+    return p
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
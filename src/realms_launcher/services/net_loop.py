@@ -0,0 +1,85 @@
+"""Single background asyncio loop for concurrent network work.
+
+Service functions expose ``async`` variants that run their blocking transport
+(the pooled ``http_client`` session) on a bounded executor, so version checks,
+news, package downloads and launcher-update checks can be awaited together in
+one event loop thread. Their sync counterparts go through ``call()`` and stay
+source-compatible for the Tk code.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from ..constants import NET_MAX_CONCURRENCY
+
+
+_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_executor: ThreadPoolExecutor | None = None
+_semaphore: asyncio.Semaphore | None = None
+_local = threading.local()
+
+
+def loop() -> asyncio.AbstractEventLoop:
+    """Return the shared loop, starting its thread on first use."""
+    global _loop, _thread, _executor, _semaphore
+    with _lock:
+        if _loop is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=NET_MAX_CONCURRENCY,
+                thread_name_prefix="net-worker",
+                initializer=_mark_worker,
+            )
+            _semaphore = asyncio.Semaphore(NET_MAX_CONCURRENCY)
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="net-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+
+def _mark_worker() -> None:
+    _local.worker = True
+
+
+def _on_network_thread() -> bool:
+    return getattr(_local, "worker", False) or threading.current_thread() is _thread
+
+
+def submit[T](coro: Coroutine[Any, Any, T]) -> Future[T]:
+    """Schedule coro on the loop from any thread and return a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, loop())
+
+
+def run[T](coro: Coroutine[Any, Any, T], *, timeout: float | None = None) -> T:
+    """Run coro on the loop and block until it finishes (not from the loop itself)."""
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("net_loop.run() called from the event loop thread; await instead")
+    return submit(coro).result(timeout)
+
+
+async def to_thread[T](fn: Callable[..., T], /, *args, **kwargs) -> T:
+    """Await a blocking call on the network executor, bounded by NET_MAX_CONCURRENCY."""
+    ev = loop()
+    assert _semaphore is not None
+    async with _semaphore:
+        return await ev.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def call[T](fn: Callable[..., T], /, *args, **kwargs) -> T:
+    """Sync entry point: run a blocking network call under the loop's concurrency limit.
+
+    Calls made from a network worker (e.g. a sync wrapper used inside an
+    already-scheduled job) run inline, so nested calls can never deadlock on
+    the concurrency limit.
+    """
+    if _on_network_thread():
+        return fn(*args, **kwargs)
+    return run(to_thread(fn, *args, **kwargs))
@@ -1,16 +1,40 @@
 from __future__ import annotations
 
-import time
-
 import requests
 
-from ..constants import NEWS_URL
+from ..constants import NEWS_MAX_AGE_S, NEWS_URL
+from . import http_cache, net_loop
+from .version_service import fetch_remote_version_info
+
+
+def fetch_news_html(url: str = NEWS_URL, *, timeout_s: float = 15.0, max_age_s: float = NEWS_MAX_AGE_S) -> str:
+    """Fetch latest news HTML, revalidated against the on-disk cache (ETag / Last-Modified).
+
+    For the default NEWS_URL the ``news_html`` bundled in version.json is used
+    when present (the version fetch is memoized and shared), so no separate
+    request is made.
+    """
+    return net_loop.call(_fetch_news_html, url, timeout_s=timeout_s, max_age_s=max_age_s)
+
 
+async def fetch_news_html_async(
+    url: str = NEWS_URL,
+    *,
+    timeout_s: float = 15.0,
+    max_age_s: float = NEWS_MAX_AGE_S,
+) -> str:
+    return await net_loop.to_thread(_fetch_news_html, url, timeout_s=timeout_s, max_age_s=max_age_s)
 
-def fetch_news_html(url: str = NEWS_URL, *, timeout_s: float = 15.0) -> str:
-    """Fetch latest news HTML (cache-busted)."""
-    r = requests.get(f"{url}?t={int(time.time())}", timeout=timeout_s)
-    if r.status_code == 200:
-        return r.text
-    return "<p>Failed to fetch news.</p>"
 
+def _fetch_news_html(url: str, *, timeout_s: float, max_age_s: float) -> str:
+    if url == NEWS_URL:
+        try:
+            bundled = fetch_remote_version_info(timeout_s=timeout_s).news_html
+        except (requests.RequestException, ValueError):
+            bundled = None
+        if bundled is not None:
+            return bundled
+    try:
+        return http_cache.fetch(url, max_age_s=max_age_s, timeout_s=timeout_s, allow_stale_on_error=True).text
+    except requests.HTTPError:
+        return "<p>Failed to fetch news.</p>"
@@ -0,0 +1,224 @@
+"""Content-addressed cache of downloaded package zips with LRU eviction."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections.abc import Iterable
+
+import requests
+
+from ..constants import PACKAGE_CACHE_MAX_BYTES
+from ..util.errors import DownloadError
+from ..util.runtime import app_data_dir
+from . import download
+
+
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+
+_lock = threading.Lock()
+
+
+def cache_dir() -> str:
+    return os.path.join(app_data_dir(), "cache", "packages")
+
+
+def lookup(
+    url: str,
+    *,
+    expected_digest: download.ExpectedDigest | None = None,
+    timeout_s: float = 10.0,
+) -> str | None:
+    """Path of a cached copy of url that still matches the server, else None.
+
+    With ``expected_digest`` (published in version.json) the entry is matched by
+    content hash and no request is made. Otherwise the server is probed and the
+    entry must have been stored from the same URL with the same size and
+    ETag / content SHA-1 / Last-Modified.
+    """
+    with _lock:
+        entries = _load_index()
+    if expected_digest is not None:
+        key = _digest_key(expected_digest)
+        entry = entries.get(key)
+    else:
+        try:
+            info = download.probe_url(url, timeout_s=timeout_s)
+        except (requests.RequestException, DownloadError) as e:
+            log.info("Package cache: cannot validate %s (%s)", url, e)
+            return None
+        key = _remote_key(url, info)
+        entry = entries.get(key) if key else None
+        if entry is not None and int(entry.get("size", -1)) != info.size:
+            entry = None
+
+    if entry is None:
+        return None
+    path = os.path.join(cache_dir(), entry["file"])
+    try:
+        if os.path.getsize(path) != int(entry["size"]):
+            raise OSError("size mismatch")
+    except OSError:
+        discard(path)
+        return None
+
+    with _lock:
+        entries = _load_index()
+        if key in entries:
+            entries[key]["last_used"] = time.time()
+            _save_index(entries)
+    log.info("Package cache hit for %s", url)
+    return path
+
+
+def store(
+    path: str,
+    url: str,
+    *,
+    expected_digest: download.ExpectedDigest | None = None,
+    max_bytes: int = PACKAGE_CACHE_MAX_BYTES,
+    timeout_s: float = 10.0,
+) -> str | None:
+    """Move a verified download into the cache; returns its new path.
+
+    The file is removed instead when caching is disabled, when it is larger than
+    ``max_bytes`` or when no key can be derived (no digest and no validator).
+    Least recently used entries are evicted to stay within ``max_bytes``.
+    """
+    key = None
+    if max_bytes > 0:
+        if expected_digest is not None:
+            key = _digest_key(expected_digest)
+        else:
+            try:
+                key = _remote_key(url, download.probe_url(url, timeout_s=timeout_s))
+            except (requests.RequestException, DownloadError) as e:
+                log.info("Package cache: not caching %s (%s)", url, e)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    if key is None or size > max_bytes:
+        _remove_quietly(path)
+        return None
+
+    root = cache_dir()
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".zip"
+    target = os.path.join(root, name)
+    # Move and index together: cleanup_leftovers removes unindexed files under the same lock.
+    with _lock:
+        try:
+            os.makedirs(root, exist_ok=True)
+            shutil.move(path, target)
+        except OSError as e:
+            log.warning("Package cache: could not store %s: %s", url, e)
+            _remove_quietly(path)
+            return None
+        entries = _load_index()
+        entries[key] = {"file": name, "url": url, "size": size, "last_used": time.time()}
+        _evict(entries, max_bytes)
+        _save_index(entries)
+    log.info("Cached %s (%d bytes) as %s", url, size, name)
+    return target if key in entries else None
+
+
+def discard(path: str) -> None:
+    """Drop a cached file, e.g. one that turned out to be corrupt."""
+    name = os.path.basename(path)
+    with _lock:
+        entries = _load_index()
+        for key in [k for k, e in entries.items() if e.get("file") == name]:
+            del entries[key]
+        _save_index(entries)
+    _remove_quietly(path)
+
+
+def clear() -> None:
+    with _lock:
+        shutil.rmtree(cache_dir(), ignore_errors=True)
+
+
+def total_size() -> int:
+    with _lock:
+        return sum(int(e.get("size", 0)) for e in _load_index().values())
+
+
+def cleanup_leftovers(directory: str, zip_names: Iterable[str]) -> None:
+    """Remove finished zips that a crashed run left in directory.
+
+    Only the given names are touched; resumable ``.part`` downloads are kept.
+    Files in the cache folder that the index does not know about are removed too.
+    """
+    for name in zip_names:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            log.info("Removing leftover %s", path)
+            _remove_quietly(path)
+
+    root = cache_dir()
+    with _lock:
+        known = {e["file"] for e in _load_index().values()} | {INDEX_NAME}
+        try:
+            names = os.listdir(root)
+        except OSError:
+            return
+        for name in names:
+            if name not in known:
+                _remove_quietly(os.path.join(root, name))
+
+
+def _digest_key(digest: download.ExpectedDigest) -> str:
+    return f"{digest.algorithm}:{digest.hexdigest.lower()}"
+
+
+def _remote_key(url: str, info: download.RemoteFileInfo) -> str | None:
+    validator = info.content_sha1 or info.validator
+    if not validator or info.size <= 0:
+        return None
+    return f"url:{url}|{info.size}|{validator}"
+
+
+def _evict(entries: dict[str, dict], max_bytes: int) -> None:
+    total = sum(int(e.get("size", 0)) for e in entries.values())
+    for key in sorted(entries, key=lambda k: float(entries[k].get("last_used", 0))):
+        if total <= max_bytes:
+            break
+        entry = entries.pop(key)
+        total -= int(entry.get("size", 0))
+        _remove_quietly(os.path.join(cache_dir(), entry["file"]))
+        log.info("Evicted cached package %s", entry.get("url"))
+
+
+def _load_index() -> dict[str, dict]:
+    try:
+        with open(os.path.join(cache_dir(), INDEX_NAME), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_index(entries: dict[str, dict]) -> None:
+    path = os.path.join(cache_dir(), INDEX_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Could not write package cache index: %s", e)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
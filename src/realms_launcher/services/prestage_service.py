@@ -0,0 +1,109 @@
+"""Background pre-download of a detected mod update into the package cache."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+
+from ..constants import PACKAGE_CACHE_MAX_BYTES, PRESTAGE_UPDATES
+from . import download, download_scheduler, mirror_service, package_cache, realms_install_service
+from .download_scheduler import Priority
+from .version_service import RemoteVersionInfo, fetch_remote_version_info
+
+
+log = logging.getLogger(__name__)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_cancel = threading.Event()
+_ready: set[str] = set()  # package URLs fully staged in this session
+
+
+def start(install_path: str, *, enabled: bool = PRESTAGE_UPDATES) -> threading.Thread | None:
+    """Start pre-staging the packages install_path needs, unless already running.
+
+    The download is a preemptible background ``download_scheduler`` job on a
+    single connection, written to the resumable ``.part`` file the install itself
+    would use: it continues across launcher restarts, pauses while an interactive
+    install runs, and that install picks up from the bytes already fetched. Finished
+    packages go into ``package_cache``, from where the install applies them
+    without downloading.
+    """
+    global _thread
+    if not enabled or not install_path or PACKAGE_CACHE_MAX_BYTES <= 0:
+        return None
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _cancel.clear()
+        _thread = threading.Thread(target=_run, args=(install_path,), name="prestage", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def cancel(*, timeout_s: float = 10.0) -> None:
+    """Stop a running pre-stage (its partial download is kept) and wait for it."""
+    with _lock:
+        t = _thread
+    if t is None or not t.is_alive():
+        return
+    _cancel.set()
+    t.join(timeout_s)
+
+
+def is_ready(url: str) -> bool:
+    return url in _ready
+
+
+def _run(install_path: str) -> None:
+    try:
+        info = fetch_remote_version_info()
+        realms_folder = os.path.join(install_path, "realms")
+        for url, label in realms_install_service.pending_packages(install_path, info):
+            _check_cancel(0, 0)
+            zip_path = realms_install_service.package_zip_path(realms_folder, label)
+            download_scheduler.run(
+                lambda job, url=url, zip_path=zip_path: _stage(job, url, zip_path, info),
+                url=url,
+                label=f"pre-stage {label}",
+                priority=Priority.BACKGROUND,
+                preemptible=True,
+            )
+    except _Cancelled:
+        log.info("Pre-staging paused")
+    except Exception as e:
+        # Best effort: the interactive install downloads whatever is missing.
+        log.warning("Pre-staging failed: %s", e)
+
+
+def _stage(job: download_scheduler.DownloadJob, url: str, zip_path: str, info: RemoteVersionInfo) -> None:
+    # Re-checked on every run: after a preemption the install may have used the partial already.
+    digest = info.expected_digest(url)
+    if package_cache.lookup(url, expected_digest=digest) is not None:
+        _ready.add(url)
+        return
+    log.info("Pre-staging %s", url)
+    download.download_segmented(
+        url,
+        zip_path,
+        segments=1,
+        resumable=True,
+        expected_digest=digest,
+        mirrors=mirror_service.ranked_urls(url, info.mirrors_for(url)),
+        limiter=job.limiter,
+        on_progress=job.wrap(_check_cancel),
+    )
+    if package_cache.store(zip_path, url, expected_digest=digest) is not None:
+        _ready.add(url)
+        log.info("Pre-staged %s", url)
+
+
+def _check_cancel(_received: int, _total: int) -> None:
+    if _cancel.is_set():
+        raise _Cancelled()
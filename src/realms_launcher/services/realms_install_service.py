@@ -4,25 +4,85 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 import json
+import logging
 import os
 from collections.abc import Callable
 
 import requests
 
 from ..constants import (
-    BASE_MOD_VERSION,
-    BASE_MOD_ZIP_URL,
-    FULL_MOD_ZIP_URL,
+    DELTA_UPDATES,
+    MANIFEST_SYNC,
+    STREAM_EXTRACT_PACKAGES,
     UPDATE_ZIP_URL,
 )
-from . import install_service
+from ..util.errors import InstallError
+from . import delta_service, install_service, manifest_service, mirror_service, package_cache, update_planner
+from .download import ExpectedDigest
 from .install_service import robust_copytree, robust_rmtree
-from .version_service import fetch_remote_version_info, is_lower_version
+from .update_planner import UpdatePlan
+from .version_service import DeltaInfo, RemoteVersionInfo, fetch_remote_version_info, is_lower_version
 
 
+log = logging.getLogger(__name__)
+
 StatusCallback = Callable[[str, str], None]  # (message, fg_color)
 ProgressCallback = Callable[[float], None]  # 0..100
 
+# Zips and the extraction folder written next to the install folder while a
+# package installs (see download_and_install_package).
+PACKAGE_ZIP_NAMES = ("base_mod.zip", "update.zip", "full_version.zip", delta_service.DELTA_ZIP_NAME)
+TEMP_EXTRACT_DIR_NAME = "temp_extraction"
+
+# version_label passed to download_and_install_package per planner package kind;
+# cumulative and incremental packages install as "update".
+_PACKAGE_LABELS = {"full": "full version", "base": "base mod"}
+
+
+# Map folders removed after every install (see delete_specific_folders).
+REMOVED_MAP_FOLDERS = (
+    # Adventure maps
+    "map mp alternate arthedain",
+    "map mp alternate dorwinion",
+    "map mp alternate durins folk",
+    "map mp alternate rhun",
+    "map mp alternate shadow and flame",
+    # Fortress maps
+    "map mp fortress abrakhan",
+    "map mp fortress amon sul",
+    "map mp fortress barrow of cargast",
+    "map mp fortress caras galadhon",
+    "map mp fortress carn dum",
+    "map mp fortress dimrill gate",
+    "map mp fortress dol amroth",
+    "map mp fortress dol guldur",
+    "map mp fortress durthang",
+    "map mp fortress edennogrod",
+    "map mp fortress edoras",
+    "map mp fortress esgaroth",
+    "map mp fortress fornost",
+    "map mp fortress framsburg",
+    "map mp fortress gundabad",
+    "map mp fortress halls of the elvenking",
+    "map mp fortress helms deep",
+    "map mp fortress hidar",
+    "map mp fortress hornburg",
+    "map mp fortress ironfoots halls",
+    "map mp fortress isengard",
+    "map mp fortress kingdom of erebor",
+    "map mp fortress last homely house",
+    "map mp fortress minas morgul",
+    "map mp fortress minas tirith",
+    "map mp fortress pelargir",
+    "map mp fortress the angle",
+    "map mp fortress the dwarf hold",
+    "map mp fortress thorins halls",
+    "map mp fortress umbar",
+    "map mp fortress wulfborg",
+)
+# The same folders as realms/-relative prefixes, left alone by file-level updates.
+REMOVED_MAP_PREFIXES = tuple(f"maps/{name}/" for name in REMOVED_MAP_FOLDERS)
+
 
 @dataclass(frozen=True)
 class InstallResult:
@@ -54,50 +114,9 @@ def delete_specific_folders(
     realms_folder = os.path.join(install_path, "realms")
     maps_folder = os.path.join(realms_folder, "maps")
 
-    map_folders_to_delete = [
-        # Adventure maps
-        "map mp alternate arthedain",
-        "map mp alternate dorwinion",
-        "map mp alternate durins folk",
-        "map mp alternate rhun",
-        "map mp alternate shadow and flame",
-        # Fortress maps
-        "map mp fortress abrakhan",
-        "map mp fortress amon sul",
-        "map mp fortress barrow of cargast",
-        "map mp fortress caras galadhon",
-        "map mp fortress carn dum",
-        "map mp fortress dimrill gate",
-        "map mp fortress dol amroth",
-        "map mp fortress dol guldur",
-        "map mp fortress durthang",
-        "map mp fortress edennogrod",
-        "map mp fortress edoras",
-        "map mp fortress esgaroth",
-        "map mp fortress fornost",
-        "map mp fortress framsburg",
-        "map mp fortress gundabad",
-        "map mp fortress halls of the elvenking",
-        "map mp fortress helms deep",
-        "map mp fortress hidar",
-        "map mp fortress hornburg",
-        "map mp fortress ironfoots halls",
-        "map mp fortress isengard",
-        "map mp fortress kingdom of erebor",
-        "map mp fortress last homely house",
-        "map mp fortress minas morgul",
-        "map mp fortress minas tirith",
-        "map mp fortress pelargir",
-        "map mp fortress the angle",
-        "map mp fortress the dwarf hold",
-        "map mp fortress thorins halls",
-        "map mp fortress umbar",
-        "map mp fortress wulfborg",
-    ]
-
     try:
         _status(on_status, "Performing post-installation cleanup...", "blue")
-        for map_folder in map_folders_to_delete:
+        for map_folder in REMOVED_MAP_FOLDERS:
             folder_path = os.path.join(maps_folder, map_folder)
             if os.path.exists(folder_path) and os.path.isdir(folder_path):
                 _status(on_status, f"Cleaning up: Removing {map_folder}...", "blue")
@@ -194,10 +213,19 @@ def download_and_install_package(
     version_label: str,
     version_number: str,
     *,
+    expected_digest: ExpectedDigest | None = None,
+    mirrors: tuple[str, ...] = (),
     on_status: StatusCallback | None = None,
     on_progress_pct: ProgressCallback | None = None,
 ) -> None:
-    """Download and install a specific package (realms base/update/full)."""
+    """Download and install a specific package (realms base/update/full).
+
+    ``mirrors`` are published alternative URLs; together with the endpoints in
+    ``PACKAGE_MIRROR_BASES`` they are ranked and used for failover.
+
+    Packages go through ``package_cache``, so a repair or reinstall of the same
+    package does not download it again.
+    """
     if version_label == "base mod":
         _status(on_status, f"Downloading Realms in Exile version {version_number}...", "blue")
     elif version_label == "full version":
@@ -206,8 +234,9 @@ def download_and_install_package(
         _status(on_status, f"Downloading {version_label} version {version_number}...", "blue")
 
     parent_dir = os.path.dirname(install_path)
-    zip_path = os.path.join(parent_dir, f"{version_label.replace(' ', '_')}.zip")
-    temp_dir = os.path.join(parent_dir, "temp_extraction")
+    zip_path = package_zip_path(install_path, version_label)
+    temp_dir = os.path.join(parent_dir, TEMP_EXTRACT_DIR_NAME)
+    cleanup_leftovers(parent_dir)
 
     _status(on_status, f"Installing {version_label}...", "blue")
 
@@ -221,6 +250,11 @@ def download_and_install_package(
         zip_path=zip_path,
         temp_extract_dir=temp_dir,
         prefer_folder="realms",
+        resumable=True,
+        streaming=STREAM_EXTRACT_PACKAGES,
+        expected_digest=expected_digest,
+        mirrors=mirror_service.ranked_urls(download_url, mirrors),
+        use_cache=True,
         on_progress=_on_progress,
     )
 
@@ -228,6 +262,215 @@ def download_and_install_package(
     _status(on_status, f"{version_label.capitalize()} version {version_number} installed successfully", "green")
 
 
+def update_with_deltas(
+    realms_folder: str,
+    local_version: str,
+    remote_info: RemoteVersionInfo,
+    chain: list[DeltaInfo],
+    *,
+    on_status: StatusCallback | None = None,
+    on_progress_pct: ProgressCallback | None = None,
+) -> bool:
+    """Bring realms/ from local_version through a chain of published deltas (see ``update_planner``).
+
+    Returns False (after reporting why) when applying it failed, in which case
+    the caller re-plans without deltas. realms_version.json is advanced after
+    every delta that applied cleanly and once the whole chain is in place.
+    """
+    if not chain or not DELTA_UPDATES:
+        return False
+
+    version_file = os.path.join(realms_folder, "realms_version.json")
+    parent_dir = os.path.dirname(realms_folder)
+    cleanup_leftovers(parent_dir)
+    target = chain[-1].to_version
+    _status(on_status, f"Patching from {local_version} to {target} ({len(chain)} step(s))...", "blue")
+
+    def _on_progress(received: int, total: int):
+        _progress(on_progress_pct, (received / total) * 100 if total else 0.0)
+
+    try:
+        delta_service.install_delta_chain(
+            realms_folder,
+            chain,
+            # update.zip holds the remote version, so it can only fill in a chain ending there.
+            full_file_url=UPDATE_ZIP_URL if target == remote_info.version else None,
+            work_dir=parent_dir,
+            skip=REMOVED_MAP_PREFIXES,
+            on_step=lambda d: _write_local_version_info(version_file, d.to_version, remote_info.required_aotr_version),
+            on_status=lambda msg: _status(on_status, msg, "blue"),
+            on_progress=_on_progress,
+        )
+    except Exception as e:
+        _status(on_status, f"Patching failed ({e}); downloading the full update instead.", "orange")
+        return False
+    _write_local_version_info(version_file, target, remote_info.required_aotr_version)
+    _status(on_status, f"Patched to version {target}", "green")
+    return True
+
+
+def sync_with_manifest(
+    realms_folder: str,
+    local_version: str,
+    remote_info: RemoteVersionInfo,
+    *,
+    verify: bool = False,
+    on_plan: Callable[[manifest_service.SyncPlan], bool] | None = None,
+    on_status: StatusCallback | None = None,
+    on_progress_pct: ProgressCallback | None = None,
+) -> bool:
+    """Bring realms/ to the remote version by downloading only missing or changed files.
+
+    Needs the remote version's manifest in version.json. Files the new version
+    drops are deleted when the manifest of local_version is known (kept in
+    realms/ from the last sync, or published). ``on_plan`` sees the computed plan
+    before anything changes and can decline it by returning False. Returns False
+    when no manifest is published, the plan was declined or the sync failed.
+    """
+    target_info = remote_info.manifests.get(remote_info.version) if MANIFEST_SYNC else None
+    if target_info is None:
+        return False
+    try:
+        _status(on_status, "Comparing installed files with the update...", "blue")
+        target = manifest_service.fetch_manifest(target_info)
+        previous = manifest_service.load_local_manifest(realms_folder)
+        if (previous is None or previous.version != local_version) and local_version in remote_info.manifests:
+            previous = manifest_service.fetch_manifest(remote_info.manifests[local_version])
+        plan = manifest_service.plan_sync(
+            realms_folder, target, previous=previous, skip=REMOVED_MAP_PREFIXES, verify=verify
+        )
+        log.info("Manifest sync %s -> %s: %s", local_version, target.version, plan.summary())
+        if on_plan is not None and not on_plan(plan):
+            return False
+
+        def _on_progress(received: int, total: int):
+            _progress(on_progress_pct, (received / total) * 100 if total else 0.0)
+
+        manifest_service.apply_sync(
+            realms_folder,
+            target,
+            plan,
+            on_status=lambda msg: _status(on_status, msg, "blue"),
+            on_progress=_on_progress,
+        )
+    except Exception as e:
+        _status(on_status, f"File sync failed ({e}); downloading the full update instead.", "orange")
+        return False
+    _status(on_status, f"Updated {len(plan.fetch)} file(s) to version {remote_info.version}", "green")
+    return True
+
+
+def package_zip_path(realms_folder: str, version_label: str) -> str:
+    """Where a package zip is downloaded to (next to the install folder)."""
+    return os.path.join(os.path.dirname(realms_folder), f"{version_label.replace(' ', '_')}.zip")
+
+
+def pending_packages(install_path: str, remote_info: RemoteVersionInfo) -> list[tuple[str, str]]:
+    """(url, version_label) of the packages ``install_or_update_realms`` would download now."""
+    version_file = os.path.join(install_path, "realms", "realms_version.json")
+    local_version, local_aotr_version = _read_local_version_info(version_file)
+    if local_aotr_version is not None and local_aotr_version != remote_info.required_aotr_version:
+        local_version = None
+    if local_version is not None and not is_lower_version(local_version, remote_info.version):
+        return []
+    plan = update_planner.plan_update(remote_info, _start_state(install_path, local_version, remote_info))
+    if plan is None or _prefers_manifest_sync(plan, remote_info):
+        return []  # nothing to fetch ahead; see sync_with_manifest
+    # Delta packages are small and read in place; see update_with_deltas.
+    return [(step.url, _PACKAGE_LABELS.get(step.kind, "update")) for step in plan.steps if step.kind != "delta"]
+
+
+def _start_state(install_path: str, local_version: str | None, remote_info: RemoteVersionInfo) -> str:
+    """Where ``update_planner`` starts: the installed version, else a copy of aotr/ when usable, else nothing."""
+    if local_version is not None:
+        return local_version
+    aotr_usable = remote_info.required_aotr_version == remote_info.current_aotr_version
+    if aotr_usable and os.path.isdir(os.path.join(install_path, "aotr")):
+        return update_planner.AOTR
+    return update_planner.EMPTY
+
+
+def _prefers_manifest_sync(plan: UpdatePlan, remote_info: RemoteVersionInfo) -> bool:
+    """Whether an existing install syncs changed files instead of downloading plan's zip packages."""
+    fresh = plan.start in (update_planner.AOTR, update_planner.EMPTY)
+    return MANIFEST_SYNC and not fresh and not plan.only_deltas and remote_info.version in remote_info.manifests
+
+
+def _apply_plan(
+    install_path: str,
+    plan: UpdatePlan,
+    remote_info: RemoteVersionInfo,
+    *,
+    on_status: StatusCallback | None = None,
+    on_progress_pct: ProgressCallback | None = None,
+) -> str:
+    """Install plan's packages in order and return the realms folder.
+
+    realms_version.json is written after every step. When a delta chain fails,
+    the rest of the way is re-planned without deltas from the version reached.
+    """
+    realms_folder = os.path.join(install_path, "realms")
+    version_file = os.path.join(realms_folder, "realms_version.json")
+    steps = list(plan.steps)
+    while steps:
+        step = steps.pop(0)
+        if step.kind == "delta":
+            chain = [step.delta]
+            while steps and steps[0].kind == "delta":
+                chain.append(steps.pop(0).delta)
+            if not update_with_deltas(
+                realms_folder,
+                step.from_state,
+                remote_info,
+                chain,
+                on_status=on_status,
+                on_progress_pct=on_progress_pct,
+            ):
+                reached = _read_local_version_info(version_file)[0] or step.from_state
+                replan = update_planner.plan_update(remote_info, reached, exclude=("delta",))
+                if replan is None:
+                    raise InstallError(f"No update package leads from {reached} to {remote_info.version}")
+                steps = list(replan.steps)
+            continue
+
+        label = _PACKAGE_LABELS.get(step.kind, "update")
+        if step.kind == "base":
+            _status(on_status, "Preparing installation from AOTR folder...", "blue")
+            realms_folder = prepare_realms_folder(install_path, on_status=on_status)
+        elif step.kind == "full":
+            # Ensure realms folder exists for extraction target
+            os.makedirs(realms_folder, exist_ok=True)
+        else:
+            _status(on_status, f"Updating from {step.from_state} to {step.to_version}...", "blue")
+        try:
+            download_and_install_package(
+                realms_folder,
+                step.url,
+                label,
+                step.to_version,
+                expected_digest=step.expected_digest,
+                mirrors=step.mirrors,
+                on_status=on_status,
+                on_progress_pct=on_progress_pct,
+            )
+        except requests.exceptions.HTTPError as e:
+            if label != "update" or e.response is None or e.response.status_code != 404:
+                raise
+            _status(on_status, "Update package not available on server, skipping.", "blue")
+            break
+        _write_local_version_info(version_file, step.to_version, remote_info.required_aotr_version)
+    return realms_folder
+
+
+def cleanup_leftovers(parent_dir: str) -> None:
+    """Remove the extraction folder and package zips a crashed install left behind."""
+    try:
+        robust_rmtree(os.path.join(parent_dir, TEMP_EXTRACT_DIR_NAME))
+        package_cache.cleanup_leftovers(parent_dir, PACKAGE_ZIP_NAMES)
+    except Exception:
+        pass
+
+
 def _read_local_version_info(version_file: str) -> tuple[str | None, str | None]:
     """Read local version and aotr_version from realms_version.json.
 
@@ -261,11 +504,15 @@ def install_or_update_realms(
 ) -> InstallResult:
     """Main workflow: check cloud AOTR versions, then install/update realms accordingly.
 
-    Decision logic (both AOTR version fields come from the cloud version.json):
-    - If required_aotr_version == current_aotr_version:
-        Lightweight path — copy aotr/ -> realms/, download base mod + update.
-    - If required_aotr_version != current_aotr_version:
-        Full version path — download a complete Realms package (includes AOTR files).
+    ``update_planner`` picks the chain of packages with the fewest bytes to
+    download from the local state (both AOTR version fields come from the cloud
+    version.json):
+    - Fresh install, required_aotr_version == current_aotr_version: start from a
+      copy of aotr/ (typically base mod + update), or the full package if cheaper.
+    - Fresh install otherwise: only the full package (includes AOTR files) applies.
+    - Existing install: deltas, incremental or cumulative updates from the local
+      version. A plan that needs zip packages is replaced by a per-file manifest
+      sync (``sync_with_manifest``) when one is published.
 
     For existing installations, if the local aotr_version differs from the cloud's
     required_aotr_version, treat as a fresh install (AOTR base has changed).
@@ -309,84 +556,39 @@ def install_or_update_realms(
             # Remove existing realms folder for a clean install
             robust_rmtree(realms_folder)
             is_fresh_install = True
+            local_version = None
 
-        if is_fresh_install:
-            if aotr_versions_match:
-                # --- Lightweight path: copy aotr -> realms, then base + update ---
-                _status(on_status, "Preparing installation from AOTR folder...", "blue")
-                realms_folder = prepare_realms_folder(install_path, on_status=on_status)
-
-                # Install base mod
-                _status(on_status, f"Installing base version {BASE_MOD_VERSION}...", "blue")
-                download_and_install_package(
-                    realms_folder,
-                    BASE_MOD_ZIP_URL,
-                    "base mod",
-                    BASE_MOD_VERSION,
-                    on_status=on_status,
-                    on_progress_pct=on_progress_pct,
-                )
-                _write_local_version_info(version_file, BASE_MOD_VERSION, required_aotr)
-
-                # Install update if available
-                if is_lower_version(BASE_MOD_VERSION, remote_version):
-                    _status(on_status, f"Base installed. Updating to version {remote_version}...", "blue")
-                    try:
-                        download_and_install_package(
-                            realms_folder,
-                            UPDATE_ZIP_URL,
-                            "update",
-                            remote_version,
-                            on_status=on_status,
-                            on_progress_pct=on_progress_pct,
-                        )
-                        _write_local_version_info(version_file, remote_version, required_aotr)
-                    except requests.exceptions.HTTPError as e:
-                        if e.response is not None and e.response.status_code == 404:
-                            _status(on_status, "Update package not available on server, skipping.", "blue")
-                        else:
-                            raise
-            else:
-                # --- Full version path: download complete Realms package ---
+        if not is_fresh_install and not is_lower_version(str(local_version), remote_version):
+            _status(on_status, f"Mod is already up to date ({local_version}).", "green")
+        else:
+            # 5. Plan the cheapest chain of packages and install it
+            if is_fresh_install and not aotr_versions_match:
                 _status(
                     on_status,
                     f"AOTR versions differ (required: {required_aotr}, current: {current_aotr}). "
                     f"Downloading full Realms package...",
                     "blue",
                 )
-                # Ensure realms folder exists for extraction target
-                os.makedirs(realms_folder, exist_ok=True)
-
-                download_and_install_package(
-                    realms_folder,
-                    FULL_MOD_ZIP_URL,
-                    "full version",
-                    remote_version,
+            start = _start_state(install_path, local_version, remote_info)
+            plan = update_planner.plan_update(remote_info, start)
+            if plan is None:
+                raise InstallError(f"No update package leads from {update_planner.state_label(start)} to {remote_version}")
+            if _prefers_manifest_sync(plan, remote_info) and sync_with_manifest(
+                realms_folder,
+                str(local_version),
+                remote_info,
+                on_status=on_status,
+                on_progress_pct=on_progress_pct,
+            ):
+                _write_local_version_info(version_file, remote_version, required_aotr)
+            else:
+                realms_folder = _apply_plan(
+                    install_path,
+                    plan,
+                    remote_info,
                     on_status=on_status,
                     on_progress_pct=on_progress_pct,
                 )
-                _write_local_version_info(version_file, remote_version, required_aotr)
-        else:
-            # --- Existing install: apply update overlay ---
-            if is_lower_version(str(local_version), remote_version):
-                _status(on_status, f"Updating from {local_version} to {remote_version}...", "blue")
-                try:
-                    download_and_install_package(
-                        realms_folder,
-                        UPDATE_ZIP_URL,
-                        "update",
-                        remote_version,
-                        on_status=on_status,
-                        on_progress_pct=on_progress_pct,
-                    )
-                    _write_local_version_info(version_file, remote_version, required_aotr)
-                except requests.exceptions.HTTPError as e:
-                    if e.response is not None and e.response.status_code == 404:
-                        _status(on_status, "Update package not available on server, skipping.", "blue")
-                    else:
-                        raise
-            else:
-                _status(on_status, f"Mod is already up to date ({local_version}).", "green")
 
         _status(on_status, "Mod installed successfully!", "green")
         return InstallResult(
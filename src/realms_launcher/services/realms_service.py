@@ -5,6 +5,7 @@ import json
 import os
 from typing import Literal
 
+from . import net_loop
 from .version_service import fetch_remote_version_info
 
 
@@ -47,6 +48,11 @@ def _local_version_info(version_file: str) -> tuple[str | None, str | None]:
         return None, None
 
 
+async def get_mod_status_async(install_path: str) -> ModStatus:
+    """Awaitable ``get_mod_status`` for use on the network loop."""
+    return await net_loop.to_thread(get_mod_status, install_path)
+
+
 def get_mod_status(install_path: str) -> ModStatus:
     """Compute mod install/update status without touching UI.
 
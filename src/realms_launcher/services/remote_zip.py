@@ -0,0 +1,158 @@
+"""Seekable read-only file over HTTP Range requests, for opening remote ZIPs in place."""
+
+from __future__ import annotations
+
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+import requests
+
+from ..util.errors import DownloadError
+from . import bandwidth, download, http_client
+from .bandwidth import TokenBucket
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 256 << 10
+DEFAULT_CACHE_BYTES = 64 << 20
+
+
+class RemoteFile(io.RawIOBase):
+    """Random-access view of a remote file that ``zipfile.ZipFile`` can open directly.
+
+    Data is fetched in aligned blocks kept in an LRU cache. A read that needs
+    several missing blocks fetches each contiguous run with a single Range
+    request, and ``prefetch()`` loads a whole byte range the same way, so the
+    bytes for many small members arrive in a few requests.
+
+    The object identity (size and ETag) is pinned at open; a server reply for a
+    different object raises ``DownloadError`` instead of mixing content.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        timeout_s: float = 30.0,
+        limiter: TokenBucket | None = None,
+    ):
+        super().__init__()
+        info = download.probe_url(url, timeout_s=timeout_s, max_age_s=download.PROBE_REUSE_S)
+        if not info.accepts_ranges or info.size <= 0:
+            raise DownloadError(f"{url} does not support Range requests")
+        self.url = url
+        self.info = info
+        self.block_size = block_size
+        self.max_blocks = max(2, cache_bytes // block_size)
+        self.timeout_s = timeout_s
+        self.limiter = limiter
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._pos = 0
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self.info.size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        want = min(len(view), self.size - self._pos)
+        n = 0
+        with self._lock:
+            while n < want:
+                # At most a cache-full of blocks per pass.
+                first = (self._pos + n) // self.block_size
+                last = min((self._pos + want - 1) // self.block_size, first + self.max_blocks - 1)
+                self._load(first, last)
+                for index in range(first, last + 1):
+                    start = self._pos + n - index * self.block_size
+                    piece = self._blocks[index][start : start + want - n]
+                    view[n : n + len(piece)] = piece
+                    n += len(piece)
+        self._pos += n
+        return n
+
+    def prefetch(self, start: int, end: int) -> None:
+        """Load bytes start..end (exclusive) into the cache with as few requests as possible."""
+        end = min(end, self.size)
+        if end <= start:
+            return
+        with self._lock:
+            self._load(start // self.block_size, (end - 1) // self.block_size)
+
+    def _load(self, first: int, last: int) -> None:
+        """Fetch missing blocks first..last, one request per contiguous missing run."""
+        # Only as many blocks as the cache can hold are loaded at a time.
+        last = min(last, first + self.max_blocks - 1)
+        run_start = None
+        for index in range(first, last + 2):
+            missing = index <= last and index not in self._blocks
+            if missing and run_start is None:
+                run_start = index
+            elif not missing and run_start is not None:
+                self._fetch_blocks(run_start, index - 1)
+                run_start = None
+        for index in range(first, last + 1):
+            self._blocks.move_to_end(index)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def _fetch_blocks(self, first: int, last: int) -> None:
+        start = first * self.block_size
+        end = min(self.size, (last + 1) * self.block_size) - 1
+        data = self._get_range(start, end)
+        for index in range(first, last + 1):
+            offset = index * self.block_size - start
+            self._blocks[index] = data[offset : offset + self.block_size]
+
+    def _get_range(self, start: int, end: int) -> bytes:
+        headers = {"Range": f"bytes={start}-{end}"}
+        for attempt in range(3):
+            try:
+                with http_client.get(self.url, headers=headers, stream=True, timeout=self.timeout_s) as r:
+                    r.raise_for_status()
+                    etag = r.headers.get("ETag")
+                    if r.status_code != 206 or not r.headers.get("Content-Range", "").startswith(f"bytes {start}-"):
+                        raise DownloadError(f"Server ignored range request for bytes {start}-{end}")
+                    if self.info.etag and etag and etag != self.info.etag:
+                        raise DownloadError(f"{self.url} changed while it was being read")
+                    chunks = []
+                    for chunk in r.iter_content(chunk_size=1 << 16):
+                        bandwidth.throttle(len(chunk), self.limiter)
+                        chunks.append(chunk)
+                    data = b"".join(chunks)
+            except requests.RequestException as e:
+                if attempt == 2:
+                    raise
+                log.warning("Range %d-%d of %s failed (%s); retrying", start, end, self.url, e)
+                continue
+            if len(data) != end - start + 1:
+                raise DownloadError(f"Short range read for bytes {start}-{end} of {self.url}")
+            self.requests += 1
+            self.bytes_fetched += len(data)
+            return data
+        raise DownloadError(f"Range {start}-{end} of {self.url} failed")
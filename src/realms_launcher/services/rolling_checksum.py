@@ -0,0 +1,62 @@
+"""rsync-style weak rolling checksum and strong block hash, for block matching."""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from itertools import accumulate
+
+
+MOD = 1 << 16
+STRONG_DIGEST_SIZE = 16
+
+
+def strong_hash(block: bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=STRONG_DIGEST_SIZE).digest()
+
+
+def weak_checksum(block: bytes) -> int:
+    return _pack(sum(block) % MOD, sum(accumulate(block)) % MOD)
+
+
+class RollingChecksum:
+    """Weak checksum of a fixed-size window that slides one byte at a time in O(1).
+
+    ``a`` is the byte sum and ``b`` the sum of the prefix sums (each byte weighted
+    by its distance from the window end), both mod 2**16, as in rsync.
+    """
+
+    __slots__ = ("a", "b", "size")
+
+    def __init__(self, window: bytes):
+        self.size = len(window)
+        self.a = sum(window) % MOD
+        self.b = sum(accumulate(window)) % MOD
+
+    @property
+    def value(self) -> int:
+        return _pack(self.a, self.b)
+
+    def roll(self, out_byte: int, in_byte: int) -> int:
+        """Drop out_byte from the front of the window, append in_byte; returns the new value."""
+        self.a = (self.a - out_byte + in_byte) % MOD
+        self.b = (self.b - self.size * out_byte + self.a) % MOD
+        return _pack(self.a, self.b)
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[bytes | mmap.mmap]:
+    """Read-only, sliceable view of a file without loading it (empty files give b"")."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            yield m
+
+
+def _pack(a: int, b: int) -> int:
+    return (b << 16) | a
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from . import net_loop
+from .news_service import fetch_news_html_async
+from .version_service import RemoteVersionInfo, fetch_remote_version_info_async
+
+
+@dataclass(frozen=True)
+class StartupMetadata:
+    version_info: RemoteVersionInfo | None = None
+    news_html: str | None = None
+    version_error: str | None = None
+    news_error: str | None = None
+
+
+async def fetch_startup_metadata() -> StartupMetadata:
+    """Fetch remote version info and news concurrently."""
+    info, news = await asyncio.gather(
+        fetch_remote_version_info_async(),
+        fetch_news_html_async(),
+        return_exceptions=True,
+    )
+    return StartupMetadata(
+        version_info=info if isinstance(info, RemoteVersionInfo) else None,
+        news_html=news if isinstance(news, str) else None,
+        version_error=str(info) if isinstance(info, BaseException) else None,
+        news_error=str(news) if isinstance(news, BaseException) else None,
+    )
+
+
+def prefetch_startup_metadata() -> Future[StartupMetadata]:
+    """Start the startup fetches on the network loop without blocking the caller."""
+    return net_loop.submit(fetch_startup_metadata())
+
+
+def wait_for(future: Future[StartupMetadata] | None, timeout_s: float = 20.0) -> StartupMetadata | None:
+    """Result of a prefetch, or None if there is none or it did not finish in time."""
+    if future is None:
+        return None
+    try:
+        return future.result(timeout_s)
+    except Exception:
+        return None
@@ -0,0 +1,237 @@
+"""Cheapest chain of published packages from the local install state to the target version.
+
+Every package that moves an install forward is an edge in a small graph whose
+nodes are install states: a mod version, ``AOTR`` (no mod yet, but a local
+``aotr/`` folder of the required version to copy) or ``EMPTY`` (nothing usable).
+
+- ``full``: complete package including the AOTR files; applies to any state.
+- ``base``: the base mod, installed over a copy of ``aotr/``.
+- ``cumulative``: overlay bringing any version since its ``from`` to its ``to``.
+- ``incremental``: overlay from exactly one version to the next.
+- ``delta``: binary patch package (see ``delta_service``).
+
+Edges weigh their download size; packages already in ``package_cache`` weigh
+nothing. ``plan_update`` runs Dijkstra over the graph. A package whose size is
+neither published nor learnt from a probe weighs an estimate: a share of the
+full package's size by kind (``UNKNOWN_SIZE_SHARE``).
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass
+
+import requests
+
+from ..constants import BASE_MOD_VERSION, BASE_MOD_ZIP_URL, DELTA_UPDATES, FULL_MOD_ZIP_URL, UPDATE_ZIP_URL
+from ..util.errors import DownloadError
+from . import download, package_cache
+from .download import ExpectedDigest
+from .version_service import DeltaInfo, RemoteVersionInfo, UpdatePackage, is_lower_version
+
+
+log = logging.getLogger(__name__)
+
+EMPTY = "<empty>"
+AOTR = "<aotr>"
+
+# Share of the full package's size assumed for a package of unknown size, so an
+# unsized overlay still beats a full download while a sized one can be compared.
+UNKNOWN_SIZE_SHARE = {"full": 1.0, "base": 0.5, "cumulative": 0.25, "incremental": 0.1, "delta": 0.05}
+# Full package size assumed when that is not published either.
+FULL_SIZE_GUESS = 4 << 30
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    kind: str
+    from_state: str
+    to_version: str
+    url: str
+    size: int | None  # bytes to download: 0 when cached, None when unknown
+    expected_digest: ExpectedDigest | None = None
+    mirrors: tuple[str, ...] = ()
+    delta: DeltaInfo | None = None  # for kind "delta"
+
+
+@dataclass(frozen=True)
+class UpdatePlan:
+    start: str
+    target: str
+    steps: tuple[PlanStep, ...]
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes to download; packages of unknown size count as 0."""
+        return sum(s.size or 0 for s in self.steps)
+
+    @property
+    def unknown_sizes(self) -> int:
+        return sum(1 for s in self.steps if s.size is None)
+
+    @property
+    def only_deltas(self) -> bool:
+        return bool(self.steps) and all(s.kind == "delta" for s in self.steps)
+
+    def describe(self) -> str:
+        steps = ", ".join(f"{s.kind} {s.to_version} ({_mib(s.size)})" for s in self.steps) or "nothing to do"
+        unknown = f" + {self.unknown_sizes} package(s) of unknown size" if self.unknown_sizes else ""
+        return f"{state_label(self.start)} -> {self.target}: {steps}; {_mib(self.total_bytes)}{unknown}"
+
+
+def package_graph(remote_info: RemoteVersionInfo) -> list[UpdatePackage]:
+    """Zip packages published for remote_info: its ``updates`` list plus the built-in packages.
+
+    The built-in full, base and cumulative packages (constants.py, sized from
+    ``packages`` in version.json) are added unless ``updates`` lists their URLs,
+    so a version.json without ``updates`` plans the same way as before: the
+    cumulative update applies to any older install.
+    """
+    graph = list(remote_info.updates)
+    listed = {p.url for p in graph}
+    builtin = [
+        UpdatePackage("full", remote_info.version, FULL_MOD_ZIP_URL),
+        UpdatePackage("base", BASE_MOD_VERSION, BASE_MOD_ZIP_URL),
+        UpdatePackage("cumulative", remote_info.version, UPDATE_ZIP_URL),
+    ]
+    for pkg in builtin:
+        if pkg.url in listed:
+            continue
+        info = remote_info.package_for(pkg.url)
+        graph.append(
+            UpdatePackage(
+                pkg.kind,
+                pkg.to_version,
+                pkg.url,
+                from_version=pkg.from_version,
+                size=info.size if info else None,
+                sha256=info.sha256 if info else None,
+                mirrors=remote_info.mirrors_for(pkg.url),
+            )
+        )
+    return graph
+
+
+def plan_update(
+    remote_info: RemoteVersionInfo,
+    start: str,
+    *,
+    exclude: tuple[str, ...] = (),
+    probe_sizes: bool = True,
+) -> UpdatePlan | None:
+    """Fewest-bytes plan from start (a version, ``AOTR`` or ``EMPTY``) to remote_info.version.
+
+    ``exclude`` drops package kinds from the graph (e.g. ``("delta",)`` after a
+    patch failed). ``probe_sizes`` asks the server for the size of packages that
+    version.json does not size. Returns None when no chain of packages leads to
+    the target.
+    """
+    target = remote_info.version
+    packages = [p for p in package_graph(remote_info) if p.kind not in exclude]
+    deltas = list(remote_info.deltas) if DELTA_UPDATES and "delta" not in exclude else []
+    sizes = _SizeResolver(remote_info, probe_sizes)
+    full_size = max((p.size for p in packages if p.kind == "full" and p.size), default=FULL_SIZE_GUESS)
+
+    def _cost(step: PlanStep) -> int:
+        if step.size is not None:
+            return step.size
+        return int(full_size * UNKNOWN_SIZE_SHARE.get(step.kind, 1.0))
+
+    def _edges(state: str):
+        for p in packages:
+            if _applies(p, state):
+                yield PlanStep(
+                    p.kind,
+                    state,
+                    p.to_version,
+                    p.url,
+                    sizes.size_of(p.url, p.size, p.expected_digest),
+                    expected_digest=p.expected_digest or remote_info.expected_digest(p.url),
+                    mirrors=p.mirrors or remote_info.mirrors_for(p.url),
+                )
+        for d in deltas:
+            if d.from_version == state:
+                size = sizes.size_of(d.url, d.size, d.expected_digest)
+                yield PlanStep("delta", state, d.to_version, d.url, size, d.expected_digest, d.mirrors, delta=d)
+
+    best: dict[str, int] = {start: 0}
+    via: dict[str, PlanStep] = {}
+    order = itertools.count()
+    queue: list[tuple[int, int, str]] = [(0, next(order), start)]
+    done: set[str] = set()
+    while queue:
+        cost, _n, state = heapq.heappop(queue)
+        if state in done:
+            continue
+        done.add(state)
+        if state == target:
+            break
+        for step in _edges(state):
+            new = cost + _cost(step)
+            if step.to_version not in best or new < best[step.to_version]:
+                best[step.to_version] = new
+                via[step.to_version] = step
+                heapq.heappush(queue, (new, next(order), step.to_version))
+
+    if target not in done:
+        return None
+    steps: list[PlanStep] = []
+    state = target
+    while state != start:
+        steps.append(via[state])
+        state = via[state].from_state
+    plan = UpdatePlan(start, target, tuple(reversed(steps)))
+    log.info("Update plan %s", plan.describe())
+    return plan
+
+
+class _SizeResolver:
+    """Download cost per package URL, resolved at most once per plan."""
+
+    def __init__(self, remote_info: RemoteVersionInfo, probe: bool):
+        self.remote_info = remote_info
+        self.probe = probe
+        self.sizes: dict[str, int | None] = {}
+
+    def size_of(self, url: str, published: int | None, digest: ExpectedDigest | None) -> int | None:
+        if url not in self.sizes:
+            self.sizes[url] = self._resolve(url, published, digest or self.remote_info.expected_digest(url))
+        return self.sizes[url]
+
+    def _resolve(self, url: str, published: int | None, digest: ExpectedDigest | None) -> int | None:
+        if package_cache.lookup(url, expected_digest=digest) is not None:
+            return 0
+        if published is None:
+            info = self.remote_info.package_for(url)
+            published = info.size if info else None
+        if published is not None or not self.probe:
+            return published
+        try:
+            return download.probe_url(url, max_age_s=download.PROBE_REUSE_S).size
+        except (requests.RequestException, DownloadError) as e:
+            log.info("Update plan: size of %s unknown (%s)", url, e)
+            return None
+
+
+def _applies(pkg: UpdatePackage, state: str) -> bool:
+    """Whether pkg can be installed on state and moves it forward."""
+    fresh = state in (AOTR, EMPTY)
+    if pkg.kind == "full":
+        return fresh or is_lower_version(state, pkg.to_version)
+    if pkg.kind == "base":
+        return state == AOTR
+    if fresh or not is_lower_version(state, pkg.to_version):
+        return False
+    if pkg.kind == "cumulative":
+        return pkg.from_version is None or not is_lower_version(state, pkg.from_version)
+    return pkg.from_version == state
+
+
+def state_label(state: str) -> str:
+    return {AOTR: "AOTR only", EMPTY: "nothing installed"}.get(state, state)
+
+
+def _mib(size: int | None) -> str:
+    return "? MiB" if size is None else f"{size / (1 << 20):.1f} MiB"
@@ -7,7 +7,8 @@ def write_updater_ps1(ps1_path: str) -> None:
     """
     PowerShell updater with detailed logging:
       - Waits for main process (PID) to exit
-      - Copies staged -> target via robocopy with retries
+      - Copies staged -> target via robocopy with retries (only the files named
+        in FileList, one relative path per line, when one is given)
       - Logs every step to LogPath
       - Cleans up staged dir
       - Relaunches the launcher with proper working directory
@@ -20,7 +21,8 @@ param(
     [string]$RelaunchPath,
     [string]$RelaunchArgs,
     [string]$RelaunchCwd,
-    [string]$LogPath
+    [string]$LogPath,
+    [string]$FileList
 )
 
 # Ensure parent folder exists (esp. if redirected elsewhere)
@@ -72,6 +74,7 @@ Write-Log "MainPid=$MainPid"
 Write-Log "RelaunchPath=$RelaunchPath"
 Write-Log "RelaunchArgs=$RelaunchArgs"
 Write-Log "RelaunchCwd=$RelaunchCwd"
+Write-Log "FileList=$FileList"
 Write-Log "PSVersion=$($PSVersionTable.PSVersion)"
 
 # Wait for main process to exit (best effort)
@@ -123,7 +126,34 @@ function Copy-With-Retry {
     return $false
 }
 
-$ok = Copy-With-Retry -src $StagedDir -dst $TargetDir
+# Differential update: copy exactly the listed files, each with robocopy's own retries
+function Copy-Listed {
+    param([string]$src, [string]$dst, [string]$list)
+    $files = @(Get-Content -LiteralPath $list -Encoding UTF8 | Where-Object { $_ })
+    Write-Log "Copying $($files.Count) changed file(s)"
+    if ($RelaunchPath) {
+        $unlocked = Wait-Unlocked -Path $RelaunchPath -TimeoutMs 15000
+        Write-Log "Unlock wait result = $unlocked"
+    }
+    foreach ($rel in $files) {
+        $from = Split-Path -Parent (Join-Path $src $rel)
+        $to = Split-Path -Parent (Join-Path $dst $rel)
+        $name = Split-Path -Leaf $rel
+        robocopy "$from" "$to" "$name" /R:10 /W:1 /NFL /NDL /NJH /NJS /NP | Out-Null
+        $code = $LASTEXITCODE
+        if ($code -gt 7) {
+            Write-Log "robocopy of $rel failed, exit code = $code"
+            return $false
+        }
+    }
+    return $true
+}
+
+if ($FileList -and (Test-Path -LiteralPath $FileList)) {
+    $ok = Copy-Listed -src $StagedDir -dst $TargetDir -list $FileList
+} else {
+    $ok = Copy-With-Retry -src $StagedDir -dst $TargetDir
+}
 
 if (-not $ok) {
     Write-Log "robocopy failed; attempting fallback copy"
@@ -190,6 +220,7 @@ def write_updater_cmd(cmd_path: str) -> None:
         "set RelaunchArgs=%~5",
         "set RelaunchCwd=%~6",
         "set LogPath=%~7",
+        "set FileList=%~8",
         "",
         "if \"%LogPath%\"==\"\" set LogPath=%TEMP%\\realms_launcher_update_cmd.log",
         "call :log ==== CMD Updater started ====",
@@ -199,6 +230,7 @@ def write_updater_cmd(cmd_path: str) -> None:
         "call :log RelaunchPath=%RelaunchPath%",
         "call :log RelaunchArgs=%RelaunchArgs%",
         "call :log RelaunchCwd=%RelaunchCwd%",
+        "call :log FileList=%FileList%",
         "",
         "REM wait for pid to exit (best effort)",
         "if not \"%MainPid%\"==\"\" (",
@@ -210,6 +242,9 @@ def write_updater_cmd(cmd_path: str) -> None:
         ")",
         ":pid_done",
         "",
+        "REM differential update: copy only the listed files",
+        "if not \"%FileList%\"==\"\" if exist \"%FileList%\" goto :copy_list",
+        "",
         "REM robocopy copy from staged to target (NOT /MIR — that would",
         "REM purge unrelated files if the launcher sits inside the game folder)",
         "set tries=0",
@@ -224,6 +259,12 @@ def write_updater_cmd(cmd_path: str) -> None:
         "timeout /t 1 /nobreak >nul",
         "goto :copy_try",
         "",
+        ":copy_list",
+        "set failed=0",
+        "for /f \"usebackq delims=\" %%f in (\"%FileList%\") do call :copy_one \"%%f\"",
+        "if \"%failed%\"==\"0\" goto :copy_ok",
+        "goto :copy_fail",
+        "",
         ":copy_ok",
         "call :log Copy succeeded",
         "goto :cleanup",
@@ -262,6 +303,17 @@ def write_updater_cmd(cmd_path: str) -> None:
         "call :log ==== CMD Updater finished ====",
         "exit /b 0",
         "",
+        ":copy_one",
+        "REM robocopy <dir> <dir> <name>; the trailing dot keeps a quoted path from ending in a backslash",
+        "for %%g in (\"%StagedDir%\\%~1\") do set src=%%~dpg",
+        "for %%g in (\"%TargetDir%\\%~1\") do set dst=%%~dpg",
+        "robocopy \"!src!.\" \"!dst!.\" \"%~nx1\" /R:10 /W:1 /NFL /NDL /NJH /NJS /NP",
+        "if errorlevel 8 (",
+        "  set failed=1",
+        "  call :log robocopy of %~1 failed",
+        ")",
+        "exit /b 0",
+        "",
         ":log",
         ">> \"%LogPath%\" echo [%date% %time%] %*",
         "exit /b 0",
@@ -1,10 +1,93 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import posixpath
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
 
-import requests
+from ..constants import MOD_INFO_URL, VERSION_INFO_MAX_AGE_S, VERSION_INFO_TTL_S
+from . import http_cache, net_loop
+from .download import ExpectedDigest
 
-from ..constants import MOD_INFO_URL
+
+# Digest algorithms accepted in version.json, strongest first.
+DIGEST_ALGORITHMS = ("sha256", "blake2b")
+
+# Package kinds accepted in the ``updates`` list of version.json.
+UPDATE_KINDS = ("full", "base", "cumulative", "incremental")
+
+
+@dataclass(frozen=True)
+class PackageInfo:
+    """Published metadata for one downloadable file, keyed by its file name."""
+
+    name: str
+    size: int | None = None
+    sha256: str | None = None
+    blake2b: str | None = None
+    mirrors: tuple[str, ...] = ()  # equivalent full URLs, in publisher preference order
+
+    @property
+    def expected_digest(self) -> ExpectedDigest | None:
+        for algorithm in DIGEST_ALGORITHMS:
+            value = getattr(self, algorithm)
+            if value:
+                return ExpectedDigest(algorithm, value)
+        return None
+
+
+@dataclass(frozen=True)
+class DeltaInfo:
+    """Published binary delta package turning one mod version into another."""
+
+    from_version: str
+    to_version: str
+    url: str
+    size: int | None = None
+    sha256: str | None = None
+    mirrors: tuple[str, ...] = ()
+
+    @property
+    def expected_digest(self) -> ExpectedDigest | None:
+        return ExpectedDigest("sha256", self.sha256) if self.sha256 else None
+
+
+@dataclass(frozen=True)
+class UpdatePackage:
+    """Published zip package in the update graph (see ``update_planner``).
+
+    ``kind`` is one of ``UPDATE_KINDS``. ``from_version`` is the exact version an
+    incremental package applies to, the oldest version a cumulative one applies
+    to (None: any), and unused for full and base packages.
+    """
+
+    kind: str
+    to_version: str
+    url: str
+    from_version: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    mirrors: tuple[str, ...] = ()
+
+    @property
+    def expected_digest(self) -> ExpectedDigest | None:
+        return ExpectedDigest("sha256", self.sha256) if self.sha256 else None
+
+
+@dataclass(frozen=True)
+class ManifestInfo:
+    """Published per-file manifest of one mod or launcher version (see ``manifest_service``)."""
+
+    version: str
+    url: str
+    size: int | None = None
+    sha256: str | None = None
+
+    @property
+    def expected_digest(self) -> ExpectedDigest | None:
+        return ExpectedDigest("sha256", self.sha256) if self.sha256 else None
 
 
 @dataclass(frozen=True)
@@ -13,24 +96,248 @@ class RemoteVersionInfo:
     launcher_version: str = "0.0.0"
     required_aotr_version: str = "0.0.0"
     current_aotr_version: str = "0.0.0"
+    packages: dict[str, PackageInfo] = field(default_factory=dict)
+    # Optional bundle fields: news and mirror bases in the same document, so
+    # startup needs a single (conditional) request.
+    news_html: str | None = None
+    mirror_bases: tuple[str, ...] = ()
+    deltas: tuple[DeltaInfo, ...] = ()
+    manifests: dict[str, ManifestInfo] = field(default_factory=dict)  # by version
+    updates: tuple[UpdatePackage, ...] = ()
+    launcher_manifest: ManifestInfo | None = None  # files of launcher_version, for differential updates
+
+    def package_for(self, url: str) -> PackageInfo | None:
+        """Look up package metadata by the file name at the end of url."""
+        return self.packages.get(posixpath.basename(urlsplit(url).path))
+
+    def expected_digest(self, url: str) -> ExpectedDigest | None:
+        pkg = self.package_for(url)
+        return pkg.expected_digest if pkg else None
+
+    def mirrors_for(self, url: str) -> tuple[str, ...]:
+        """Published mirrors for url: the package's own list, else url's file name under each mirror base."""
+        pkg = self.package_for(url)
+        if pkg and pkg.mirrors:
+            return pkg.mirrors
+        name = posixpath.basename(urlsplit(url).path)
+        return tuple(base + name for base in self.mirror_bases) if name else ()
+
+
+_memo_lock = threading.Lock()
+_memo: dict[str, tuple[float, RemoteVersionInfo]] = {}  # url -> (monotonic time, info)
+_in_flight: dict[str, Future[RemoteVersionInfo]] = {}
 
 
 def fetch_remote_version_info(
     url: str = MOD_INFO_URL,
     *,
     timeout_s: float = 15.0,
+    max_age_s: float = VERSION_INFO_MAX_AGE_S,
+    ttl_s: float = VERSION_INFO_TTL_S,
+    force_refresh: bool = False,
 ) -> RemoteVersionInfo:
-    r = requests.get(url, timeout=timeout_s)
-    r.raise_for_status()
+    """Remote version.json, memoized for ``ttl_s`` with single-flight fetching.
+
+    Concurrent callers share one in-flight request and callers within the TTL
+    get the cached result. ``force_refresh`` skips the memo (it still joins a
+    request that is already in flight). Failures are not memoized.
+    """
+    return net_loop.call(
+        _memoized_version_info,
+        url,
+        timeout_s=timeout_s,
+        max_age_s=max_age_s,
+        ttl_s=ttl_s,
+        force_refresh=force_refresh,
+    )
+
+
+async def fetch_remote_version_info_async(
+    url: str = MOD_INFO_URL,
+    *,
+    timeout_s: float = 15.0,
+    max_age_s: float = VERSION_INFO_MAX_AGE_S,
+    ttl_s: float = VERSION_INFO_TTL_S,
+    force_refresh: bool = False,
+) -> RemoteVersionInfo:
+    return await net_loop.to_thread(
+        _memoized_version_info,
+        url,
+        timeout_s=timeout_s,
+        max_age_s=max_age_s,
+        ttl_s=ttl_s,
+        force_refresh=force_refresh,
+    )
+
+
+def invalidate_version_info(url: str | None = None) -> None:
+    """Drop memoized version info (for url, or all) so the next call fetches again."""
+    with _memo_lock:
+        if url is None:
+            _memo.clear()
+        else:
+            _memo.pop(url, None)
+
+
+def _memoized_version_info(
+    url: str, *, timeout_s: float, max_age_s: float, ttl_s: float, force_refresh: bool
+) -> RemoteVersionInfo:
+    with _memo_lock:
+        cached = _memo.get(url)
+        if not force_refresh and cached is not None and time.monotonic() - cached[0] < ttl_s:
+            return cached[1]
+        flight = _in_flight.get(url)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[url] = Future()
+    if not leader:
+        return flight.result()
+
+    try:
+        info = _fetch_remote_version_info(url, timeout_s=timeout_s, max_age_s=max_age_s)
+    except BaseException as e:
+        with _memo_lock:
+            del _in_flight[url]
+        flight.set_exception(e)
+        raise
+    with _memo_lock:
+        _memo[url] = (time.monotonic(), info)
+        del _in_flight[url]
+    flight.set_result(info)
+    return info
+
+
+def _fetch_remote_version_info(url: str, *, timeout_s: float, max_age_s: float) -> RemoteVersionInfo:
+    r = http_cache.fetch(url, max_age_s=max_age_s, timeout_s=timeout_s)
     data = r.json() or {}
     return RemoteVersionInfo(
         version=str(data.get("version", "0.0.0")),
         launcher_version=str(data.get("launcher_version", "0.0.0")),
         required_aotr_version=str(data.get("required_aotr_version", "0.0.0")),
         current_aotr_version=str(data.get("current_aotr_version", "0.0.0")),
+        packages=_parse_packages(data.get("packages")),
+        news_html=data["news_html"] if isinstance(data.get("news_html"), str) else None,
+        mirror_bases=_parse_mirror_bases(data.get("mirror_bases")),
+        deltas=_parse_deltas(data.get("deltas")),
+        manifests=_parse_manifests(data.get("manifests")),
+        updates=_parse_updates(data.get("updates")),
+        launcher_manifest=_parse_manifest_info(
+            str(data.get("launcher_version", "0.0.0")),
+            data.get("launcher_manifest"),
+        ),
     )
 
 
+def _parse_packages(raw) -> dict[str, PackageInfo]:
+    """Parse the optional ``packages`` map: ``{"realms.zip": {"size": .., "sha256": .., "mirrors": [..]}}``."""
+    packages: dict[str, PackageInfo] = {}
+    if not isinstance(raw, dict):
+        return packages
+    for name, entry in raw.items():
+        if not isinstance(entry, dict):
+            continue
+        try:
+            size = int(entry["size"]) if entry.get("size") is not None else None
+        except (TypeError, ValueError):
+            size = None
+        packages[str(name)] = PackageInfo(
+            name=str(name),
+            size=size,
+            sha256=safe_get_json_value(entry, "sha256") or None,
+            blake2b=safe_get_json_value(entry, "blake2b") or None,
+            mirrors=tuple(str(u) for u in entry.get("mirrors") or () if u),
+        )
+    return packages
+
+
+def _parse_deltas(raw) -> tuple[DeltaInfo, ...]:
+    """Parse the optional ``deltas`` list: ``[{"from": .., "to": .., "url": .., "size": .., "sha256": ..}]``."""
+    deltas: list[DeltaInfo] = []
+    if not isinstance(raw, list):
+        return ()
+    for entry in raw:
+        if not isinstance(entry, dict) or not entry.get("from") or not entry.get("to") or not entry.get("url"):
+            continue
+        try:
+            size = int(entry["size"]) if entry.get("size") is not None else None
+        except (TypeError, ValueError):
+            size = None
+        deltas.append(
+            DeltaInfo(
+                from_version=str(entry["from"]),
+                to_version=str(entry["to"]),
+                url=str(entry["url"]),
+                size=size,
+                sha256=safe_get_json_value(entry, "sha256") or None,
+                mirrors=tuple(str(u) for u in entry.get("mirrors") or () if u),
+            )
+        )
+    return tuple(deltas)
+
+
+def _parse_updates(raw) -> tuple[UpdatePackage, ...]:
+    """Parse the optional ``updates`` list: ``[{"kind": .., "from": .., "to": .., "url": .., "size": ..}]``."""
+    updates: list[UpdatePackage] = []
+    if not isinstance(raw, list):
+        return ()
+    for entry in raw:
+        if not isinstance(entry, dict) or entry.get("kind") not in UPDATE_KINDS:
+            continue
+        if not entry.get("to") or not entry.get("url"):
+            continue
+        if entry["kind"] == "incremental" and not entry.get("from"):
+            continue
+        try:
+            size = int(entry["size"]) if entry.get("size") is not None else None
+        except (TypeError, ValueError):
+            size = None
+        updates.append(
+            UpdatePackage(
+                kind=str(entry["kind"]),
+                to_version=str(entry["to"]),
+                url=str(entry["url"]),
+                from_version=str(entry["from"]) if entry.get("from") else None,
+                size=size,
+                sha256=safe_get_json_value(entry, "sha256") or None,
+                mirrors=tuple(str(u) for u in entry.get("mirrors") or () if u),
+            )
+        )
+    return tuple(updates)
+
+
+def _parse_manifests(raw) -> dict[str, ManifestInfo]:
+    """Parse the optional ``manifests`` map: ``{"0.8.6": {"url": .., "size": .., "sha256": ..}}``."""
+    manifests: dict[str, ManifestInfo] = {}
+    if not isinstance(raw, dict):
+        return manifests
+    for version, entry in raw.items():
+        info = _parse_manifest_info(str(version), entry)
+        if info is not None:
+            manifests[info.version] = info
+    return manifests
+
+
+def _parse_manifest_info(version: str, entry) -> ManifestInfo | None:
+    if not isinstance(entry, dict) or not entry.get("url"):
+        return None
+    try:
+        size = int(entry["size"]) if entry.get("size") is not None else None
+    except (TypeError, ValueError):
+        size = None
+    return ManifestInfo(
+        version=version,
+        url=str(entry["url"]),
+        size=size,
+        sha256=safe_get_json_value(entry, "sha256") or None,
+    )
+
+
+def _parse_mirror_bases(raw) -> tuple[str, ...]:
+    if not isinstance(raw, list):
+        return ()
+    return tuple(b if b.endswith("/") else b + "/" for b in (str(x) for x in raw if x))
+
+
 def is_latest_newer(current_version: str, latest_version: str) -> bool:
     """True if latest_version > current_version (numeric compare)."""
     return _compare_versions(current_version, latest_version) < 0
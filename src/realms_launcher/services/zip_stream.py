@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import io
+import logging
+import os
+import shutil
+import stat
+import struct
+import threading
+from collections.abc import Callable
+from zipfile import ZipFile, ZipInfo
+
+import requests
+
+from ..util.errors import DownloadError, InstallError
+from . import bandwidth, download, http_client
+from .bandwidth import TokenBucket
+
+
+ProgressCallback = Callable[[int, int], None]  # received, total
+
+log = logging.getLogger(__name__)
+
+# Initial tail request; grown to cover the central directory when needed.
+TAIL_PROBE_SIZE = 64 << 10
+
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIG = b"PK\x05\x06"
+_EOCD64_LOCATOR = struct.Struct("<4sLQL")
+_EOCD64_LOCATOR_SIG = b"PK\x06\x07"
+_EOCD64 = struct.Struct("<4sQ2H2L4Q")
+
+
+class _SplicedFile(io.RawIOBase):
+    """Read-only view of a ZIP being downloaded.
+
+    Offsets inside the (already fetched) tail are served from memory, everything
+    before it from the partially written file on disk. ``ZipFile`` therefore sees
+    the complete archive long before the body has finished downloading.
+    """
+
+    def __init__(self, part_path: str, size: int, tail_start: int, tail: bytes):
+        self._f = open(part_path, "rb")
+        self._size = size
+        self._tail_start = tail_start
+        self._tail = tail
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        n = 0
+        while n < len(view) and self._pos < self._size:
+            want = len(view) - n
+            if self._pos >= self._tail_start:
+                i = self._pos - self._tail_start
+                data = self._tail[i : i + want]
+            else:
+                self._f.seek(self._pos)
+                data = self._f.read(min(want, self._tail_start - self._pos))
+            if not data:
+                break
+            view[n : n + len(data)] = data
+            n += len(data)
+            self._pos += len(data)
+        return n
+
+    def close(self) -> None:
+        try:
+            self._f.close()
+        finally:
+            super().close()
+
+
+def stream_install_zip(
+    url: str,
+    zip_path: str,
+    dest_dir: str,
+    *,
+    prefer_folder: str | None = None,
+    chunk_size: int = 1 << 16,
+    timeout_s: float = 30.0,
+    max_retries: int = 3,
+    expected_digest: download.ExpectedDigest | None = None,
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> bool:
+    """Download a ZIP and extract each member into dest_dir as soon as it has arrived.
+
+    The central directory is fetched first with a tail Range request; the body
+    then streams sequentially into zip_path while a worker thread extracts every
+    member whose bytes are complete, so extraction overlaps the download.
+
+    Returns False (having downloaded nothing) when the server does not support
+    Range requests, so the caller can fall back to download-then-extract.
+
+    ``expected_digest`` is checked over the same streamed chunks; since extraction
+    overlaps the download, a mismatch can only be reported once the stream ends.
+    """
+    info = download.probe_url(url, timeout_s=timeout_s)
+    if not info.accepts_ranges or info.size <= 0:
+        return False
+
+    tail_start, tail = _fetch_central_directory(url, info.size, timeout_s)
+
+    with open(zip_path, "wb") as f:
+        f.truncate(info.size)
+    hasher = download._StreamingHasher(expected_digest) if expected_digest else None
+
+    view = _SplicedFile(zip_path, info.size, tail_start, tail)
+    try:
+        zf = ZipFile(view, "r")
+        members = sorted(zf.infolist(), key=lambda m: m.header_offset)
+        root = member_root([m.filename for m in members], prefer_folder)
+
+        watermark = 0
+        cond = threading.Condition()
+        failed = threading.Event()
+        errors: list[BaseException] = []
+
+        def _extract_all() -> None:
+            try:
+                for i, member in enumerate(members):
+                    end = members[i + 1].header_offset if i + 1 < len(members) else tail_start
+                    with cond:
+                        while watermark < min(end, tail_start) and not failed.is_set():
+                            cond.wait()
+                    if failed.is_set():
+                        return
+                    extract_member(zf, member, root, dest_dir)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+
+        worker = threading.Thread(target=_extract_all, name="zip-stream-extract", daemon=True)
+        worker.start()
+        try:
+            received = len(tail)
+            attempt = 0
+            while watermark < tail_start and not failed.is_set():
+                # Reconnects (after a stall or a dropped connection) continue at the watermark.
+                headers = {"Range": f"bytes={watermark}-{tail_start - 1}"}
+                try:
+                    with http_client.get(url, headers=headers, stream=True, timeout=timeout_s) as r, open(
+                        zip_path, "r+b"
+                    ) as out:
+                        r.raise_for_status()
+                        if r.status_code != 206 or not r.headers.get("Content-Range", "").startswith(
+                            f"bytes {watermark}-"
+                        ):
+                            raise DownloadError(f"Server ignored range request for bytes {watermark}-{tail_start - 1}")
+                        out.seek(watermark)
+                        watchdog = download._ThroughputWatchdog(url, limiter=limiter)
+                        for chunk in r.iter_content(chunk_size=chunk_size):
+                            if failed.is_set():
+                                break
+                            chunk = chunk[: tail_start - watermark]
+                            if not chunk:
+                                continue
+                            watchdog.feed(len(chunk), watermark)
+                            bandwidth.throttle(len(chunk), limiter)
+                            out.write(chunk)
+                            out.flush()
+                            if hasher is not None:
+                                hasher.feed(watermark, chunk)
+                            received += len(chunk)
+                            with cond:
+                                watermark += len(chunk)
+                                cond.notify_all()
+                            if on_progress is not None:
+                                on_progress(received, info.size)
+                            if watermark >= tail_start:
+                                break
+                    if watermark < tail_start and not failed.is_set():
+                        raise DownloadError(f"Connection closed early at byte {watermark}")
+                except (requests.RequestException, DownloadError) as e:
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise
+                    log.warning("Streaming %s failed at byte %d (%s); reconnecting", url, watermark, e)
+            if watermark < tail_start and not failed.is_set():
+                raise DownloadError(f"Download ended early at byte {watermark} of {tail_start}")
+            # The tail is already in memory; write it so zip_path ends up complete.
+            with open(zip_path, "r+b") as out:
+                out.seek(tail_start)
+                out.write(tail)
+            if hasher is not None:
+                hasher.feed(tail_start, tail)
+                hasher.verify(url)
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            with cond:
+                cond.notify_all()
+            worker.join()
+        if errors:
+            raise errors[0]
+        zf.close()
+    finally:
+        view.close()
+    return True
+
+
+def member_root(names: list[str], prefer_folder: str | None) -> str:
+    """Archive prefix whose contents are overlaid, mirroring the extract-then-copy rules.
+
+    Prefers the shallowest folder named ``prefer_folder``; otherwise descends into
+    a single top-level directory.
+    """
+    dirs: set[str] = set()
+    for name in names:
+        parts = name.rstrip("/").split("/")
+        limit = len(parts) if name.endswith("/") else len(parts) - 1
+        for i in range(1, limit + 1):
+            dirs.add("/".join(parts[:i]))
+
+    if prefer_folder:
+        matches = [d for d in dirs if d.rsplit("/", 1)[-1] == prefer_folder]
+        if matches:
+            return min(matches, key=lambda d: (d.count("/"), d)) + "/"
+
+    top = {name.split("/", 1)[0] for name in names}
+    if len(top) == 1:
+        only = next(iter(top))
+        if only in dirs:
+            return only + "/"
+    return ""
+
+
+def extract_member(zf: ZipFile, member: ZipInfo, root: str, dest_dir: str) -> None:
+    """Write member into dest_dir relative to root (see ``member_root``); members outside root are skipped."""
+    if not member.filename.startswith(root):
+        return
+    rel = member.filename[len(root) :]
+    if not rel:
+        return
+
+    dest_root = os.path.abspath(dest_dir)
+    target = os.path.abspath(os.path.join(dest_root, *rel.rstrip("/").split("/")))
+    if os.path.commonpath([dest_root, target]) != dest_root:
+        raise InstallError(f"Unsafe path in archive: {member.filename}")
+
+    if member.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        try:
+            os.chmod(target, stat.S_IWRITE)
+        except OSError:
+            pass
+    with zf.open(member) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    log.debug("Extracted %s", rel)
+
+
+def _fetch_central_directory(url: str, size: int, timeout_s: float) -> tuple[int, bytes]:
+    """Return (offset, bytes) of the archive tail holding the central directory."""
+    want = min(size, TAIL_PROBE_SIZE)
+    while True:
+        start = size - want
+        tail = _get_range(url, start, size - 1, timeout_s)
+        cd_start = _central_directory_offset(tail, start)
+        if cd_start is not None and cd_start >= start:
+            return start, tail
+        if want >= size:
+            raise InstallError("Not a ZIP archive (end of central directory not found)")
+        # The central directory (or ZIP64 record) begins before the probed tail.
+        want = min(size, max(want * 4, size - cd_start if cd_start is not None else 0))
+
+
+def _get_range(url: str, start: int, end: int, timeout_s: float) -> bytes:
+    r = http_client.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=timeout_s)
+    r.raise_for_status()
+    if r.status_code != 206:
+        raise DownloadError(f"Server ignored range request for bytes {start}-{end}")
+    return r.content
+
+
+def _central_directory_offset(tail: bytes, tail_start: int) -> int | None:
+    """Absolute offset of the first byte the central directory parse needs."""
+    pos = tail.rfind(_EOCD_SIG)
+    if pos < 0 or pos + _EOCD.size > len(tail):
+        return None
+    fields = _EOCD.unpack_from(tail, pos)
+    cd_offset = fields[6]
+    if cd_offset != 0xFFFFFFFF:
+        return cd_offset
+
+    loc = pos - _EOCD64_LOCATOR.size
+    if loc < 0:
+        # ZIP64 locator lies just before the EOCD; ask for a larger tail.
+        return tail_start - _EOCD64_LOCATOR.size
+    sig, _disk, eocd64_offset, _disks = _EOCD64_LOCATOR.unpack_from(tail, loc)
+    if sig != _EOCD64_LOCATOR_SIG:
+        return None
+    rel = eocd64_offset - tail_start
+    if rel < 0:
+        return eocd64_offset
+    cd64_offset = _EOCD64.unpack_from(tail, rel)[9]
+    return min(cd64_offset, eocd64_offset)
@@ -0,0 +1,253 @@
+"""zsync-style updates of large files: reuse matching blocks of the local copy, fetch the rest.
+
+The publisher ships a block-sums file next to each large file: a header with the
+file size and block size, then a weak rolling checksum and a strong hash per
+block (see ``compute_block_sums``). The launcher scans its existing copy with a
+rolling checksum, so blocks that merely moved are found too, copies every
+matching block into a new file next to the old one and fetches only the missing
+blocks with Range requests. The result is verified against the published
+digest before it replaces the old file.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from ..util.errors import DownloadError, IntegrityError
+from . import download, file_hashes, http_client
+from .bandwidth import TokenBucket
+from .rolling_checksum import STRONG_DIGEST_SIZE, RollingChecksum, map_file, strong_hash, weak_checksum
+
+
+log = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], None]  # bytes in place, file size
+
+SUMS_MAGIC = b"RLZSYNC1"
+_HEADER = struct.Struct("<8sQI")  # magic, file size, block size
+_BLOCK = struct.Struct(f"<I{STRONG_DIGEST_SIZE}s")  # weak checksum, strong hash
+
+DEFAULT_BLOCK_SIZE = 64 << 10
+
+# Byte-by-byte rolling in Python is slow; past this many rolled bytes the scan
+# only tests block-sized steps (a local file that bears no resemblance to the
+# new one is then given up on quickly instead of scanned in full).
+MAX_ROLL_BYTES = 4 << 20
+
+# Assembled file next to the original until it is verified.
+NEW_SUFFIX = ".zsync-new"
+
+
+@dataclass(frozen=True)
+class BlockSums:
+    file_size: int
+    block_size: int
+    weak: tuple[int, ...]
+    strong: tuple[bytes, ...]
+
+    def block_range(self, index: int) -> tuple[int, int]:
+        """Inclusive byte range of block index in the target file."""
+        start = index * self.block_size
+        return start, min(self.file_size, start + self.block_size) - 1
+
+
+@dataclass(frozen=True)
+class ZsyncResult:
+    reused_bytes: int
+    fetched_bytes: int
+
+
+def compute_block_sums(path: str, *, block_size: int = DEFAULT_BLOCK_SIZE) -> BlockSums:
+    weak: list[int] = []
+    strong: list[bytes] = []
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            weak.append(weak_checksum(block))
+            strong.append(strong_hash(block))
+            size += len(block)
+    return BlockSums(size, block_size, tuple(weak), tuple(strong))
+
+
+def dump_block_sums(sums: BlockSums) -> bytes:
+    parts = [_HEADER.pack(SUMS_MAGIC, sums.file_size, sums.block_size)]
+    parts.extend(_BLOCK.pack(w, s) for w, s in zip(sums.weak, sums.strong))
+    return b"".join(parts)
+
+
+def load_block_sums(data: bytes) -> BlockSums:
+    try:
+        magic, size, block_size = _HEADER.unpack_from(data)
+    except struct.error as e:
+        raise DownloadError("Truncated block sums") from e
+    count = -(-size // block_size) if block_size else -1
+    if magic != SUMS_MAGIC or count < 0 or len(data) != _HEADER.size + count * _BLOCK.size:
+        raise DownloadError("Invalid block sums")
+    blocks = [_BLOCK.unpack_from(data, _HEADER.size + i * _BLOCK.size) for i in range(count)]
+    return BlockSums(size, block_size, tuple(w for w, _s in blocks), tuple(s for _w, s in blocks))
+
+
+def fetch_block_sums(url: str, *, timeout_s: float = 30.0) -> BlockSums:
+    r = http_client.get(url, timeout=timeout_s)
+    r.raise_for_status()
+    return load_block_sums(r.content)
+
+
+def match_blocks(local_path: str, sums: BlockSums, *, max_roll_bytes: int = MAX_ROLL_BYTES) -> dict[int, int]:
+    """Map target block index -> offset of identical bytes in local_path.
+
+    After a match the scan jumps a whole block ahead, so runs of unchanged or
+    shifted data are checked a block at a time; only unmatched regions are
+    rolled byte by byte (up to ``max_roll_bytes`` in total). The final, shorter
+    block is only looked for at its own offset.
+    """
+    block = sums.block_size
+    full_blocks = sums.file_size // block
+    index: dict[int, list[int]] = {}
+    for i in range(full_blocks):
+        index.setdefault(sums.weak[i], []).append(i)
+
+    found: dict[int, int] = {}
+    with map_file(local_path) as local:
+        n = len(local)
+        pos = rolled = 0
+        roll: RollingChecksum | None = None
+        value = 0
+        while pos + block <= n and len(found) < full_blocks:
+            if roll is None:
+                roll = RollingChecksum(local[pos : pos + block])
+                value = roll.value
+            candidates = index.get(value)
+            if candidates:
+                digest = strong_hash(local[pos : pos + block])
+                hits = [i for i in candidates if sums.strong[i] == digest]
+                if hits:
+                    for i in hits:
+                        found.setdefault(i, pos)
+                    pos += block
+                    roll = None
+                    continue
+            if rolled >= max_roll_bytes:
+                pos += block
+                roll = None
+                continue
+            if pos + block >= n:
+                break
+            value = roll.roll(local[pos], local[pos + block])
+            pos += 1
+            rolled += 1
+
+        tail = sums.file_size - full_blocks * block
+        if tail:
+            start = full_blocks * block
+            if start + tail <= n and strong_hash(local[start : start + tail]) == sums.strong[full_blocks]:
+                found[full_blocks] = start
+    return found
+
+
+def zsync_file(
+    local_path: str,
+    url: str,
+    sums: BlockSums,
+    dest_path: str,
+    *,
+    sha256: str,
+    mirrors: Sequence[str] = (),
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> ZsyncResult:
+    """Assemble url's file at dest_path from local_path's matching blocks plus Range fetches.
+
+    Raises ``IntegrityError`` (and removes dest_path) when the result does not
+    match sha256; the caller then downloads the file whole.
+    """
+    found = match_blocks(local_path, sums)
+    blocks = -(-sums.file_size // sums.block_size)
+    reused = 0
+    with open(local_path, "rb") as src, open(dest_path, "wb") as out:
+        out.truncate(sums.file_size)
+        for i, offset in sorted(found.items()):
+            start, end = sums.block_range(i)
+            src.seek(offset)
+            out.seek(start)
+            out.write(src.read(end - start + 1))
+            reused += end - start + 1
+
+    ranges: list[tuple[int, int]] = []
+    for i in range(blocks):
+        if i in found:
+            continue
+        start, end = sums.block_range(i)
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    fetched = sum(end - start + 1 for start, end in ranges)
+    log.info(
+        "zsync %s: reusing %d of %d bytes, fetching %d in %d range(s)",
+        os.path.basename(local_path),
+        reused,
+        sums.file_size,
+        fetched,
+        len(ranges),
+    )
+
+    def _progress(received: int, _total: int) -> None:
+        if on_progress is not None:
+            on_progress(reused + received, sums.file_size)
+
+    try:
+        download.download_ranges(
+            url,
+            dest_path,
+            ranges,
+            expected_size=sums.file_size,
+            mirrors=mirrors,
+            limiter=limiter,
+            on_progress=_progress,
+        )
+        actual = file_hashes.sha256_file(dest_path)
+        if actual != sha256.lower():
+            raise IntegrityError(f"sha256 mismatch for {url} assembled from {local_path}: got {actual}")
+    except BaseException:
+        _remove_quietly(dest_path)
+        raise
+    return ZsyncResult(reused, fetched)
+
+
+def update_file(
+    local_path: str,
+    url: str,
+    sums_url: str,
+    *,
+    sha256: str,
+    mirrors: Sequence[str] = (),
+    limiter: TokenBucket | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> ZsyncResult:
+    """Bring local_path to the published version in place: assemble next to it, verify, swap."""
+    tmp = local_path + NEW_SUFFIX
+    result = zsync_file(
+        local_path,
+        url,
+        fetch_block_sums(sums_url),
+        tmp,
+        sha256=sha256,
+        mirrors=mirrors,
+        limiter=limiter,
+        on_progress=on_progress,
+    )
+    os.replace(tmp, local_path)
+    file_hashes.remember(local_path, sha256.lower())
+    return result
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from tkinter import messagebox
 
-from ...constants import LAUNCHER_VERSION, LAUNCHER_ZIP_URL
-from ...services import launcher_update_service
-from ...services.version_service import fetch_remote_version_info, is_latest_newer
+from ...constants import LAUNCHER_VERSION
+from ...services import launcher_update_service, startup_service
+from ...services.version_service import RemoteVersionInfo, fetch_remote_version_info, is_latest_newer
 
 
 class LauncherUpdateMixin:
@@ -12,7 +12,8 @@ class LauncherUpdateMixin:
 
     def check_launcher_update(self) -> None:
         try:
-            info = fetch_remote_version_info()
+            meta = startup_service.wait_for(getattr(self, "startup_metadata", None))
+            info = meta.version_info if meta is not None and meta.version_info else fetch_remote_version_info()
             latest_launcher_version = info.launcher_version
 
             if is_latest_newer(LAUNCHER_VERSION, latest_launcher_version):
@@ -21,11 +22,11 @@ class LauncherUpdateMixin:
                     f"A new launcher version ({latest_launcher_version}) is available. Download and apply now?",
                 )
                 if user_choice:
-                    self.update_launcher()
+                    self.update_launcher(info)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to check for launcher updates: {e}")
 
-    def update_launcher(self) -> None:
+    def update_launcher(self, info: RemoteVersionInfo | None = None) -> None:
         self.set_ani_cursor(self)  # type: ignore[arg-type]
         self.set_ani_cursor(self.bg_canvas)  # type: ignore[attr-defined]
 
@@ -43,15 +44,21 @@ class LauncherUpdateMixin:
                 self.progress["value"] = pct  # type: ignore[attr-defined]
                 self.update()  # type: ignore[attr-defined]
 
-            staged_dir = launcher_update_service.download_and_stage_zip(
-                LAUNCHER_ZIP_URL,
+            staged = launcher_update_service.stage_launcher_update(
+                info,
                 on_status=_on_status,
                 on_progress_pct=_on_progress,
             )
+            if staged is None:
+                self.status_label.config(text="Launcher files are already up to date.", fg="green")  # type: ignore[attr-defined]
+                self.exit_update_mode()
+                return
+            staged_dir, file_list = staged
 
             launcher_update_service.spawn_updater_and_quit(
                 staged_dir=staged_dir,
                 quit_callback=lambda: self.after(300, self._quit_for_update),  # type: ignore[attr-defined]
+                file_list=file_list,
                 on_status=_on_status,
             )
         except Exception as e:
@@ -3,14 +3,25 @@ from __future__ import annotations
 import os
 from tkinter import filedialog, messagebox
 
-from ...constants import BASE_MOD_VERSION
-from ...services import news_service, realms_service, settings_service
+from ...constants import BASE_MOD_VERSION, BASE_MOD_ZIP_URL, PREWARM_PROBE_NEXT_PACKAGE, UPDATE_ZIP_URL
+from ...services import (
+    download,
+    mirror_service,
+    news_service,
+    prestage_service,
+    realms_service,
+    settings_service,
+    startup_service,
+)
 
 
 class StateMixin:
     """Settings persistence + mod status checks + some UI state transitions."""
 
     def fetch_news(self) -> str:
+        meta = startup_service.wait_for(getattr(self, "startup_metadata", None))
+        if meta is not None and meta.news_html is not None:
+            return meta.news_html
         try:
             return news_service.fetch_news_html()
         except Exception as e:
@@ -132,6 +143,7 @@ class StateMixin:
             self.hide_uninstall_button()
             self.show_folder_button()
             self.language_dropdown.config(state="disabled")  # type: ignore[attr-defined]
+            self._probe_next_package(BASE_MOD_ZIP_URL)
         elif status.state == "update_available":
             self.status_label.config(  # type: ignore[attr-defined]
                 text=f"Update available: {remote_version} (Installed: {local_version})",
@@ -145,6 +157,8 @@ class StateMixin:
             self.show_uninstall_button()
             self.hide_folder_button()
             self.language_dropdown.config(state="readonly")  # type: ignore[attr-defined]
+            prestage_service.start(install_path)
+            self._probe_next_package(UPDATE_ZIP_URL)
         else:
             self.status_label.config(  # type: ignore[attr-defined]
                 text=f"Mod is up-to-date ({local_version}).",
@@ -157,6 +171,11 @@ class StateMixin:
             self.hide_folder_button()
             self.language_dropdown.config(state="readonly")  # type: ignore[attr-defined]
 
+    def _probe_next_package(self, url: str) -> None:
+        """Learn size and Range support of the likely next download while the user is idle."""
+        if PREWARM_PROBE_NEXT_PACKAGE:
+            download.probe_in_background(mirror_service.candidate_urls(url))
+
     def _set_retry_state(self, msg: str) -> None:
         self.status_label.config(text=msg, fg="red")  # type: ignore[attr-defined]
         self.download_button.config(text="Retry", state="normal")  # type: ignore[attr-defined]
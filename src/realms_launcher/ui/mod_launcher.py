@@ -5,7 +5,8 @@ from __future__ import annotations
 import sys
 import tkinter as tk
 
-from ..services import admin_service
+from ..constants import BASE_MOD_ZIP_URL, DOWNLOAD_SEGMENTS, HTTP_KEEP_WARM_S
+from ..services import admin_service, http_client, mirror_service, startup_service
 from .mixins.actions_mixin import ActionsMixin
 from .mixins.admin_mixin import AdminMixin
 from .mixins.button_visibility_mixin import ButtonVisibilityMixin
@@ -44,12 +45,22 @@ class ModLauncher(
         self.language = tk.StringVar()
         self.language.set("english")
 
+        # Version info and news are fetched together on the network loop while
+        # the window is built; the news panel and update check pick them up.
+        self.startup_metadata = startup_service.prefetch_startup_metadata()
+
         self.create_background()
         self.create_banner()
         self.create_top_buttons()
         self.create_news_section()
         self.create_bottom_section()
 
+        # Rank the package mirrors and open warm connections to them (one per
+        # download segment) in the background while the UI settles.
+        package_urls = mirror_service.candidate_urls(BASE_MOD_ZIP_URL)
+        mirror_service.probe_in_background(package_urls)
+        http_client.prewarm(package_urls, connections=DOWNLOAD_SEGMENTS, keep_warm_s=HTTP_KEEP_WARM_S)
+
         self.after(100, self.load_last_folder)
         self.check_launcher_update()
 
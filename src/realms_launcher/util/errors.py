@@ -9,10 +9,22 @@ class DownloadError(LauncherError):
     pass
 
 
+class IntegrityError(DownloadError):
+    """Downloaded bytes do not match the published digest."""
+
+
+class StallError(DownloadError):
+    """A transfer stayed below the minimum throughput for the whole stall window."""
+
+
 class InstallError(LauncherError):
     pass
 
 
+class PatchError(InstallError):
+    """A delta patch is malformed or does not apply to the local file."""
+
+
 class UpdateError(LauncherError):
     pass
 
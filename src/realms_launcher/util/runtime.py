@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import subprocess
 import sys
+import tempfile
 
 
 def is_frozen() -> bool:
@@ -17,6 +18,14 @@ def launcher_dir() -> str:
     return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 
+def app_data_dir() -> str:
+    """Per-user launcher data folder (``%LOCALAPPDATA%/RealmsLauncher``, fallback ``%TEMP%``)."""
+    base = os.environ.get("LOCALAPPDATA")
+    if base:
+        return os.path.join(base, "RealmsLauncher")
+    return os.path.join(tempfile.gettempdir(), "realms_launcher")
+
+
 def launcher_path() -> str:
     return sys.executable if is_frozen() else os.path.abspath(sys.argv[0])
 